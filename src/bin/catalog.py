@@ -0,0 +1,188 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from termcolor import colored
+
+from definition import CATALOG_RELOAD_INTERVAL
+from excel_lookup import get_file_signature
+
+Price = Union[int, float]
+
+
+class Catalog:
+    """Product catalog (e.g. "product_catalog.json" or "sports_catalog.json"), indexed for constant-time lookups.
+
+    The JSON file maps item IDs to items `{"name": ..., "price": ...}`. It is
+    read and validated once, and indexed by item ID and by item name. The file
+    is read again when its modification time or size changes, which is checked
+    at most every `reload_interval` seconds, so that lookups stay cheap. If the
+    changed file cannot be loaded (e.g. while it is being saved), the last valid
+    catalog is kept and the file is read again at the next check.
+
+    Prices of many items can be looked up at once as a NumPy vector (see
+    `get_prices` and `get_total`). NumPy is only imported on the first bulk
+    lookup.
+
+    Usage:
+        catalog = Catalog(SPORTS_CATALOG_PATH)
+        price = catalog.get_price("Pétanque")
+        total = catalog.get_total(name_list, quantity_list)
+
+    :param path: Path to the JSON catalog file.
+    :param reload_interval: Minimum time between two checks of the file for changes [s].
+    :raises ValueError: If the catalog is not valid when first loaded (see `validate`).
+    """
+    def __init__(self, path: Path, reload_interval: float = CATALOG_RELOAD_INTERVAL) -> None:
+        self.path = Path(path)
+        self.reload_interval = reload_interval
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_time = 0.0
+        self._load()
+
+    def _load(self) -> None:
+        """Read, validate and index the catalog file.
+
+        :return: None.
+        """
+        signature = get_file_signature(self.path)
+        with open(self.path, "r", encoding="utf-8") as file:
+            item_dict = json.load(file)
+        self.validate(item_dict, source=self.path.name)
+        self._item_dict: Dict[str, Dict[str, Any]] = item_dict
+        self._name_list: List[str] = [item["name"] for item in item_dict.values()]
+        self._price_by_name: Dict[str, Price] = {item["name"]: item["price"] for item in item_dict.values()}
+        self._index_by_name: Dict[str, int] = {name: index for index, name in enumerate(self._name_list)}
+        self._price_vector = None  # built on the first bulk lookup (see `price_vector`)
+        self._signature = signature
+        self._checked_time = time.monotonic()
+
+    @staticmethod
+    def validate(item_dict: Any, source: str = "catalog") -> None:
+        """Check that a catalog maps item IDs to items with a unique name and a non-negative price.
+
+        :param item_dict: The parsed catalog.
+        :param source: Name of the catalog (used in error messages).
+        :return: None.
+        :raises ValueError: If the catalog is not valid.
+        """
+        if not isinstance(item_dict, dict) or not item_dict:
+            raise ValueError(f"Catalog '{source}' must be a non-empty object mapping item IDs to items.")
+        seen_name_set = set()
+        for item_id, item in item_dict.items():
+            if not isinstance(item, dict) or not {"name", "price"} <= set(item):
+                raise ValueError(f"Item '{item_id}' of catalog '{source}' must have a name and a price.")
+            name, price = item["name"], item["price"]
+            if not isinstance(name, str) or not name.strip():
+                raise ValueError(f"Item '{item_id}' of catalog '{source}' has no name.")
+            if name in seen_name_set:
+                raise ValueError(f"Item name '{name}' appears more than once in catalog '{source}'.")
+            seen_name_set.add(name)
+            if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+                raise ValueError(f"Item '{name}' of catalog '{source}' has an invalid price ({price!r}).")
+
+    def refresh(self) -> bool:
+        """Read the catalog file again if it has changed since it was loaded.
+
+        :return reloaded: Whether the catalog has been reloaded.
+        """
+        now = time.monotonic()
+        if now - self._checked_time < self.reload_interval:
+            return False
+        self._checked_time = now
+        try:
+            if get_file_signature(self.path) == self._signature:
+                return False
+            self._load()
+        except (OSError, ValueError) as e:
+            # E.g. file half-saved by an editor: keep the last valid catalog until the next check
+            print(colored("Warning!", "yellow"), f"Catalog '{self.path.name}' could not be reloaded ({e}), the previous version is kept.")
+            return False
+        return True
+
+    @property
+    def item_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Items of the catalog by item ID."""
+        self.refresh()
+        return self._item_dict
+
+    @property
+    def name_list(self) -> List[str]:
+        """Item names, in catalog order."""
+        self.refresh()
+        return self._name_list
+
+    @property
+    def price_vector(self):
+        """Item prices as a NumPy vector, in catalog order."""
+        self.refresh()
+        if self._price_vector is None:
+            import numpy as np
+
+            self._price_vector = np.array([self._price_by_name[name] for name in self._name_list])
+        return self._price_vector
+
+    def __contains__(self, name: str) -> bool:
+        self.refresh()
+        return name in self._price_by_name
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._name_list)
+
+    def get_item(self, item_id: Union[str, int]) -> Dict[str, Any]:
+        """Get an item by ID.
+
+        :param item_id: ID of the item (e.g. "7").
+        :return item: The item (keys "name" and "price").
+        :raises KeyError: If there is no item with this ID.
+        """
+        self.refresh()
+        try:
+            return self._item_dict[str(item_id)]
+        except KeyError:
+            raise KeyError(f"No item '{item_id}' in catalog '{self.path.name}'.") from None
+
+    def get_price(self, name: str) -> Price:
+        """Get the price of an item by name.
+
+        :param name: Name of the item (e.g. "Pétanque").
+        :return price: The price of the item [CHF].
+        :raises KeyError: If there is no item with this name.
+        """
+        self.refresh()
+        try:
+            return self._price_by_name[name]
+        except KeyError:
+            raise KeyError(f"No item '{name}' in catalog '{self.path.name}'.") from None
+
+    def get_prices(self, name_list: Iterable[str]):
+        """Get the prices of several items at once.
+
+        :param name_list: Names of the items (may repeat).
+        :return price_vector: NumPy vector of the prices, in the order of `name_list`.
+        :raises KeyError: If an item is not in the catalog.
+        """
+        price_vector = self.price_vector
+        try:
+            index_list = [self._index_by_name[name] for name in name_list]
+        except KeyError as e:
+            raise KeyError(f"No item '{e.args[0]}' in catalog '{self.path.name}'.") from None
+        return price_vector[index_list]
+
+    def get_total(self, name_list: Iterable[str], quantity_list: Iterable[Union[int, str]]) -> Price:
+        """Compute the total price of quantities of items.
+
+        :param name_list: Names of the items.
+        :param quantity_list: Quantity of each item (numeric strings are accepted, as entered in the GUI).
+        :return total_price: Sum of the quantities times the prices [CHF].
+        :raises KeyError: If an item is not in the catalog.
+        """
+        import numpy as np
+
+        name_list = list(name_list)
+        if not name_list:
+            return 0
+        quantity_vector = np.array([int(quantity) for quantity in quantity_list])
+        return (self.get_prices(name_list) * quantity_vector).sum().item()
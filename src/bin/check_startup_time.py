@@ -0,0 +1,106 @@
+# Script name:         check_startup_time.py
+# Python interpreter:  Miniconda virtual environment "automation-env"
+# Description:         Check that a script starts within its startup budget, by measuring its imports with `python -X importtime`
+# Invocation example:  python src/bin/check_startup_time.py (or python src/bin/check_startup_time.py -s main.py --import-only)
+# Author:              Anthony Guinchard
+# Version:             0.1
+# Creation date:       2025-06-20
+# Modification date:   2025-06-20
+# Working:             ✅
+
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+
+import click
+from termcolor import colored
+
+from definition import (BIN_PATH, STARTUP_FORBIDDEN_MODULE_LIST,
+                        STARTUP_TIME_BUDGET)
+
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")  # line of `-X importtime` output (times in [us])
+
+
+class ImportTime(NamedTuple):
+    """Import time of a module, as reported by `python -X importtime`.
+
+    :param module: Name of the module.
+    :param self_time: Time spent importing the module itself [s].
+    :param cumulative_time: Time spent importing the module and the modules it imports [s].
+    :param level: Nesting level of the import (0 for the modules imported by the script itself).
+    """
+    module: str
+    self_time: float
+    cumulative_time: float
+    level: int
+
+
+def measure_import_time(script_path: Path, import_only: bool = False) -> Tuple[float, List[ImportTime]]:
+    """Start a script with `python -X importtime` and collect the import time of every module.
+
+    :param script_path: Path to the script.
+    :param import_only: Whether to only import the script as a module (for scripts without CLI), instead of running it with `--help`.
+    :return total_time, import_time_list: Total import time [s] and import time of every imported module (in import order).
+    """
+    if import_only:
+        command_list = [sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.insert(0, {str(script_path.parent)!r}); import {script_path.stem}"]
+    else:
+        command_list = [sys.executable, "-X", "importtime", str(script_path), "--help"]
+    result = subprocess.run(command_list, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(colored("Error!", "red"), f"'{' '.join(command_list[3:])}' failed:\n{result.stderr[-2000:]}")
+        sys.exit(1)
+
+    import_time_list = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_time, cumulative_time, indent, module = match.groups()
+            import_time_list.append(ImportTime(module, int(self_time) / 1e6, int(cumulative_time) / 1e6, len(indent) // 2))
+    total_time = sum(import_time.self_time for import_time in import_time_list)
+    return total_time, import_time_list
+
+
+@click.command()
+@click.option("-s", "--script", default="generate_and_send_sport_invoices.py", show_default=True, help="Script to check (in 'src/bin').")
+@click.option("-b", "--budget", type=float, default=STARTUP_TIME_BUDGET, show_default=True, help="Maximum total import time [s].")
+@click.option("-r", "--repeat", type=int, default=3, show_default=True, help="Number of measurements (the fastest one is kept, the first one also compiling the bytecode).")
+@click.option("-n", "--top", type=int, default=10, show_default=True, help="Number of slowest top-level imports to show.")
+@click.option("-x", "--allow", multiple=True, help="Heavy package allowed to be imported at startup (can be repeated).")
+@click.option("--import-only", is_flag=True, help="Only import the script instead of running it with `--help` (for scripts without CLI, e.g. 'main.py').")
+def main(script: str, budget: float, repeat: int, top: int, allow: Tuple[str, ...], import_only: bool):
+    """Measure the startup time of a script and exit with an error if it exceeds the budget or loads heavy packages.
+    """
+    script_path = BIN_PATH / script
+    if not script_path.exists():
+        print(colored("Error!", "red"), f"The script '{script_path}' does not exist.")
+        sys.exit(1)
+
+    print(f"Measuring startup of '{script}' ({repeat} runs)...")
+    total_time, import_time_list = min((measure_import_time(script_path, import_only=import_only) for _ in range(max(repeat, 1))), key=lambda measurement: measurement[0])
+
+    print(f"\tSlowest top-level imports:")
+    top_level_list = sorted((import_time for import_time in import_time_list if import_time.level == 0), key=lambda import_time: import_time.cumulative_time, reverse=True)
+    for import_time in top_level_list[:top]:
+        print(f"\t\t{import_time.cumulative_time * 1e3:8.1f} [ms]  {import_time.module}")
+
+    is_ok = True
+    forbidden_module_set = set(STARTUP_FORBIDDEN_MODULE_LIST) - set(allow)
+    loaded_forbidden_list = sorted({import_time.module.split(".")[0] for import_time in import_time_list} & forbidden_module_set)
+    if loaded_forbidden_list:
+        is_ok = False
+        print(colored("\tError!", "red"), f"Heavy packages imported at startup: {', '.join(loaded_forbidden_list)} (import them in the functions using them).")
+
+    if total_time > budget:
+        is_ok = False
+        print(colored("\tError!", "red"), f"Total import time {total_time:.3f} [s] exceeds the startup budget of {budget:.3f} [s].")
+    else:
+        print(f"\tTotal import time {total_time:.3f} [s] (budget: {budget:.3f} [s]).")
+
+    sys.exit(0 if is_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
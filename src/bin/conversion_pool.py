@@ -0,0 +1,372 @@
+import importlib.util
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from termcolor import colored
+
+from definition import (SOFFICE_BATCH_CHUNK_SIZE, SOFFICE_BINARY_PATH,
+                        SOFFICE_CONVERSION_TIMEOUT, SOFFICE_PROFILES_PATH,
+                        SOFFICE_STARTUP_TIMEOUT, SOFFICE_WORKER_BASE_PORT)
+
+
+class SofficeWorker:
+    """Warm headless LibreOffice instance receiving DOCX to PDF conversion jobs over UNO.
+
+    Each worker runs its own `soffice` process with its own user profile
+    (`-env:UserInstallation`), listening on its own local socket, so that
+    several instances can run side by side without locking each other's profile.
+
+    Requires the `uno` Python module shipped with LibreOffice (e.g. `sudo apt
+    install python3-uno` on Ubuntu, or LibreOffice's bundled Python on macOS).
+
+    :param worker_id: Number of the worker (used for the profile folder name and in logs).
+    :param port: Local port on which the instance accepts UNO connections.
+    :param profile_path: Folder of the LibreOffice user profile of the instance.
+    :param conversion_timeout: Maximum time to convert one document, after which the instance is killed [s].
+    """
+    def __init__(self, worker_id: int, port: int, profile_path: Path, conversion_timeout: float = SOFFICE_CONVERSION_TIMEOUT) -> None:
+        self.worker_id = worker_id
+        self.port = port
+        self.profile_path = profile_path
+        self.conversion_timeout = conversion_timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.num_conversions = 0
+        self.num_restarts = 0
+
+    def start(self) -> None:
+        """Launch the LibreOffice instance and connect to it.
+
+        :return: None.
+        :raises ImportError: If the `uno` module is not available (no LibreOffice instance is launched).
+        :raises RuntimeError: If the instance does not accept connections within `SOFFICE_STARTUP_TIMEOUT` seconds.
+        """
+        if importlib.util.find_spec("uno") is None:
+            raise ImportError("The 'uno' module shipped with LibreOffice is not available in this Python environment.")
+        self.profile_path.mkdir(parents=True, exist_ok=True)
+        self.process = subprocess.Popen([
+            SOFFICE_BINARY_PATH, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault", "--nolockcheck",
+            f"-env:UserInstallation={self.profile_path.as_uri()}",
+            f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # Wait until the instance accepts UNO connections (first start also creates the user profile)
+        time_start = time.perf_counter()
+        while True:
+            try:
+                self.desktop = self._connect()
+                break
+            except ImportError:
+                self.stop()
+                raise
+            except Exception as e:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"LibreOffice instance {self.worker_id} exited with code {self.process.returncode} during startup.") from e
+                if time.perf_counter() - time_start > SOFFICE_STARTUP_TIMEOUT:
+                    self.stop()
+                    raise RuntimeError(f"LibreOffice instance {self.worker_id} did not accept connections on port {self.port} within {SOFFICE_STARTUP_TIMEOUT} [s].") from e
+                time.sleep(0.25)
+        print(f"\t\tLibreOffice instance {self.worker_id} ready on port {self.port} (⏱️ startup time: {time.perf_counter() - time_start:.2f} [s])")
+
+    def _connect(self):
+        """Connect to the LibreOffice instance through its UNO socket.
+
+        :return desktop: The `com.sun.star.frame.Desktop` object of the instance.
+        """
+        import uno  # only available in a Python environment shipped with/linked to LibreOffice
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_context)
+        context = resolver.resolve(f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext")
+        return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+
+    def is_healthy(self) -> bool:
+        """Check that the process is still running and that it answers over UNO.
+
+        :return: True if the instance is healthy, False otherwise.
+        """
+        if self.process is None or self.process.poll() is not None or self.desktop is None:
+            return False
+        try:
+            self.desktop.getFrames()  # cheap round trip over the UNO bridge
+            return True
+        except Exception:
+            return False
+
+    def restart(self) -> None:
+        """Kill the LibreOffice instance (if still running) and start a fresh one.
+
+        :return: None.
+        """
+        print(colored("\t\t\t\tWarning!", "yellow"), f"Restarting LibreOffice instance {self.worker_id}...")
+        self.stop()
+        self.num_restarts += 1
+        self.start()
+
+    def convert(self, docx_path: Union[str, Path], out_dir: Path) -> Path:
+        """Convert a DOCX document into a PDF document stored in the given folder.
+
+        :param docx_path: Path to the DOCX document to convert.
+        :param out_dir: Folder where the PDF document is written (same name as the DOCX document).
+        :return pdf_path: Path to the generated PDF document.
+        :raises TimeoutError: If the conversion takes longer than `conversion_timeout` (the instance is killed, see `restart`).
+        """
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def property_value(name, value):
+            prop = PropertyValue()
+            prop.Name = name
+            prop.Value = value
+            return prop
+
+        docx_path = Path(docx_path).resolve()
+        pdf_path = Path(out_dir).resolve() / docx_path.with_suffix(".pdf").name
+        # The UNO calls block until LibreOffice answers: kill a hung instance so that they fail instead of blocking the worker forever
+        timed_out_event = threading.Event()
+
+        def kill_hung_instance():
+            timed_out_event.set()
+            self.kill()
+
+        timer = threading.Timer(self.conversion_timeout, kill_hung_instance)
+        timer.start()
+        try:
+            document = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(str(docx_path)), "_blank", 0, (property_value("Hidden", True),))
+            try:
+                document.storeToURL(uno.systemPathToFileUrl(str(pdf_path)), (property_value("FilterName", "writer_pdf_Export"),))
+            finally:
+                document.close(True)
+        except Exception as e:
+            if timed_out_event.is_set():
+                raise TimeoutError(f"LibreOffice instance {self.worker_id} did not convert '{docx_path.name}' within {self.conversion_timeout} [s].") from e
+            raise
+        finally:
+            timer.cancel()
+        self.num_conversions += 1
+        return pdf_path
+
+    def kill(self) -> None:
+        """Kill the LibreOffice process at once (e.g. when it hangs), so that the pending UNO calls fail.
+
+        :return: None.
+        """
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def stop(self) -> None:
+        """Terminate the LibreOffice instance.
+
+        :return: None.
+        """
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass  # the UNO bridge is closed as soon as the instance terminates
+            self.desktop = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+
+class ConversionPool:
+    """Pool of warm headless LibreOffice instances used to convert DOCX invoices to PDF.
+
+    Instead of paying LibreOffice's cold start for every invoice, `num_workers`
+    instances are launched once and reused for the whole batch. Before each job,
+    the worker is health checked and restarted if it crashed; a job failing on a
+    worker (e.g. after the instance has been killed for exceeding the conversion
+    timeout) is retried once on a restarted worker.
+
+    Usage:
+        with ConversionPool(num_workers=2) as pool:
+            pdf_path = pool.convert(docx_path, out_dir)
+
+    :param num_workers: Number of LibreOffice instances to keep running.
+    :param base_port: Port of the first instance (the following instances use the next free ports).
+    :param profiles_path: Folder containing one user profile folder per instance.
+    """
+    def __init__(self, num_workers: int = 2, base_port: int = SOFFICE_WORKER_BASE_PORT, profiles_path: Path = SOFFICE_PROFILES_PATH) -> None:
+        self.num_workers = num_workers
+        self.workers = []
+        port = base_port
+        for i in range(num_workers):
+            port = self._find_free_port(port)
+            self.workers.append(SofficeWorker(worker_id=i, port=port, profile_path=profiles_path / f"worker_{i}"))
+            port += 1
+        self._idle_workers: "queue.Queue[SofficeWorker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.num_failures = 0
+
+    @staticmethod
+    def _find_free_port(port: int) -> int:
+        """Get the first free local port starting from the given one.
+
+        :param port: First port to try.
+        :return: A local port number nothing is listening on.
+        """
+        while True:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                if sock.connect_ex(("127.0.0.1", port)) != 0:
+                    return port
+            port += 1
+
+    def start(self) -> "ConversionPool":
+        """Launch all LibreOffice instances of the pool.
+
+        :return: The pool itself.
+        """
+        if not SOFFICE_BINARY_PATH.exists():
+            raise FileNotFoundError(f"LibreOffice binary file '{SOFFICE_BINARY_PATH}' does not exist.")
+        print(f"\tStarting {self.num_workers} LibreOffice instance(s) for DOCX to PDF conversion...")
+        # Instances are started concurrently since each one pays the cold start
+        try:
+            with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                list(executor.map(lambda worker: worker.start(), self.workers))
+        except Exception:
+            # Do not leave the instances which did start running
+            for worker in self.workers:
+                worker.stop()
+            raise
+        for worker in self.workers:
+            self._idle_workers.put(worker)
+        return self
+
+    def convert(self, docx_path: Union[str, Path], out_dir: Path) -> Path:
+        """Convert a DOCX document to PDF on the next idle instance (blocks until one is available).
+
+        :param docx_path: Path to the DOCX document to convert.
+        :param out_dir: Folder where the PDF document is written.
+        :return pdf_path: Path to the generated PDF document.
+        """
+        worker = self._idle_workers.get()
+        try:
+            if not worker.is_healthy():
+                worker.restart()
+            try:
+                return worker.convert(docx_path, out_dir)
+            except Exception:
+                # The instance may have crashed in the middle of the job: retry once on a fresh instance
+                worker.restart()
+                return worker.convert(docx_path, out_dir)
+        except Exception:
+            with self._lock:
+                self.num_failures += 1
+            raise
+        finally:
+            self._idle_workers.put(worker)
+
+    def convert_many(self, docx_path_list: List[Union[str, Path]], out_dir: Path) -> Dict[str, Union[Path, Exception]]:
+        """Convert several DOCX documents, spreading the jobs over all instances of the pool.
+
+        :param docx_path_list: Paths to the DOCX documents to convert.
+        :param out_dir: Folder where the PDF documents are written.
+        :return result_dict: A dictionary mapping each DOCX path to its PDF path, or to the exception raised by its conversion.
+        """
+        def convert_one(docx_path):
+            try:
+                return self.convert(docx_path, out_dir)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            result_list = list(executor.map(convert_one, docx_path_list))
+        return {str(docx_path): result for docx_path, result in zip(docx_path_list, result_list)}
+
+    def shutdown(self, remove_profiles: bool = False) -> None:
+        """Terminate all LibreOffice instances of the pool.
+
+        :param remove_profiles: Whether to also delete the user profile folders of the instances.
+        :return: None.
+        """
+        for worker in self.workers:
+            worker.stop()
+            if remove_profiles:
+                shutil.rmtree(worker.profile_path, ignore_errors=True)
+        num_conversions = sum(worker.num_conversions for worker in self.workers)
+        num_restarts = sum(worker.num_restarts for worker in self.workers)
+        print(f"\tLibreOffice instances stopped ({num_conversions} conversion(s), {self.num_failures} failure(s), {num_restarts} restart(s)).")
+
+    def __enter__(self) -> "ConversionPool":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.shutdown()
+
+
+def convert_docx_batch(docx_path_list: List[Union[str, Path]], out_dir: Path, num_shards: Optional[int] = None,
+                       chunk_size: int = SOFFICE_BATCH_CHUNK_SIZE, profiles_path: Path = SOFFICE_PROFILES_PATH,
+                       conversion_timeout: float = SOFFICE_CONVERSION_TIMEOUT) -> Dict[str, Union[Path, Exception]]:
+    """Convert many DOCX documents to PDF with a few multi-file `soffice --convert-to` calls.
+
+    Cheaper alternative to `ConversionPool` (no resident instance, no `uno`
+    module needed): the documents are split into `num_shards` shards run in
+    parallel, each with its own user profile (`-env:UserInstallation`), and each
+    shard converts its documents `chunk_size` files per `soffice` call, so that
+    LibreOffice's cold start is paid once per chunk instead of once per document.
+
+    :param docx_path_list: Paths to the DOCX documents to convert.
+    :param out_dir: Folder where the PDF documents are written (same names as the DOCX documents).
+    :param num_shards: Number of shards converted in parallel (defaults to the number of CPU cores).
+    :param chunk_size: Maximum number of documents passed to a single `soffice` call.
+    :param profiles_path: Folder containing one user profile folder per shard.
+    :param conversion_timeout: Maximum time to convert one document, `soffice` calls being killed after this time per document of the chunk [s].
+    :return result_dict: A dictionary mapping each DOCX path to its PDF path, or to the exception describing why its conversion failed.
+    """
+    if not SOFFICE_BINARY_PATH.exists():
+        raise FileNotFoundError(f"LibreOffice binary file '{SOFFICE_BINARY_PATH}' does not exist.")
+    if not docx_path_list:
+        return {}
+
+    num_shards = min(num_shards or os.cpu_count() or 1, len(docx_path_list))
+    # Round-robin distribution so that shards get the same amount of work
+    shard_list = [docx_path_list[i::num_shards] for i in range(num_shards)]
+    result_dict: Dict[str, Union[Path, Exception]] = {}
+    lock = threading.Lock()
+
+    def convert_shard(shard_id: int, shard_docx_path_list: List[Union[str, Path]]) -> None:
+        profile_path = profiles_path / f"shard_{shard_id}"
+        profile_path.mkdir(parents=True, exist_ok=True)
+        for chunk_start in range(0, len(shard_docx_path_list), chunk_size):
+            chunk = shard_docx_path_list[chunk_start:chunk_start + chunk_size]
+            time_start = time.time()
+            try:
+                completed_process = subprocess.run([
+                    SOFFICE_BINARY_PATH, "--headless", "--norestore", "--nolockcheck",
+                    f"-env:UserInstallation={profile_path.as_uri()}",
+                    "--convert-to", "pdf:writer_pdf_Export", "--outdir", str(out_dir),
+                    *[str(docx_path) for docx_path in chunk],
+                ], capture_output=True, text=True, timeout=conversion_timeout * len(chunk))
+                chunk_error = None if completed_process.returncode == 0 else f"soffice exited with code {completed_process.returncode}: {completed_process.stderr.strip()}"
+            except Exception as e:
+                chunk_error = str(e)
+            # Map each PDF back to its DOCX document (a PDF older than the call is a leftover from a previous run)
+            for docx_path in chunk:
+                pdf_path = Path(out_dir) / Path(docx_path).with_suffix(".pdf").name
+                if pdf_path.exists() and pdf_path.stat().st_mtime >= time_start - 1:
+                    result = pdf_path
+                else:
+                    result = RuntimeError(f"No PDF generated for '{Path(docx_path).name}'" + (f" ({chunk_error})" if chunk_error else ""))
+                with lock:
+                    result_dict[str(docx_path)] = result
+            print(f"\t\tShard {shard_id}: converted chunk of {len(chunk)} document(s) (⏱️ elapsed time: {time.time() - time_start:.2f} [s])")
+
+    with ThreadPoolExecutor(max_workers=num_shards) as executor:
+        list(executor.map(convert_shard, range(num_shards), shard_list))
+
+    # Keep the order of the input list
+    return {str(docx_path): result_dict[str(docx_path)] for docx_path in docx_path_list}
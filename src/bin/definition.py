@@ -1,5 +1,6 @@
 import os
 import platform
+import tempfile
 from datetime import datetime
 from pathlib import Path
 
@@ -20,6 +21,8 @@ INVOICE_MODELS_FOLDER_NAME = "invoice_models"
 
 NUM_INVOICE_NAME = "1_N° facture.xlsx"
 NUM_INVOICE_PATH = LIB_PATH / NUM_INVOICE_NAME
+NUM_INVOICE_SHEET_NAME = "Facturation"
+NUM_INVOICE_SAVE_INTERVAL = 50  # number of new rows after which the invoice ledger "1_N° facture.xlsx" is saved (see "ledger.py")
 
 SPONSOR_DATABASE_NAME = "sponsor_database.xlsx"
 SPONSOR_DATABASE_DEBUG_NAME = "sponsor_database_DEBUG.xlsx"
@@ -28,13 +31,46 @@ if DEBUG_MODE:
     SPONSOR_DATABASE_PATH = LIB_PATH / SPONSOR_DATABASE_DEBUG_NAME
 else:
     SPONSOR_DATABASE_PATH = LIB_PATH / SPONSOR_DATABASE_NAME
+SPONSOR_DATABASE_CHECKPOINT_INTERVAL = 50  # number of new entries after which the sponsor database Excel file is rewritten (see "invoice_database.py")
+
+# SQLite invoice store, system of record of the sponsor database (see "invoice_store.py")
+INVOICE_STORE_NAME = "invoice_store.sqlite"
+INVOICE_STORE_DEBUG_NAME = "invoice_store_DEBUG.sqlite"
+if DEBUG_MODE:
+    INVOICE_STORE_PATH = LIB_PATH / INVOICE_STORE_DEBUG_NAME
+else:
+    INVOICE_STORE_PATH = LIB_PATH / INVOICE_STORE_NAME
 
 
 SPORTS_CATALOG_NAME = "sports_catalog.json"
 SPORTS_CATALOG_PATH = LIB_PATH / SPORTS_CATALOG_NAME
+CATALOG_RELOAD_INTERVAL = 1.0  # [s] minimum time between two checks of a catalog file for changes (see "catalog.py")
+PRODUCT_TOTAL_CHECK_INTERVAL = 50  # number of product changes between two full recomputations of the running total price (see "product_selection.py")
 
 CURRENT_TIME = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 
+# SMTP email transport (see "email_transport.py"), the password is only read from the environment
+SMTP_HOST = os.environ.get("GDNC_SMTP_HOST", "mail.infomaniak.com")
+SMTP_PORT = int(os.environ.get("GDNC_SMTP_PORT", 465))
+SMTP_SECURITY = os.environ.get("GDNC_SMTP_SECURITY", "ssl")  # "ssl", "starttls" or "none"
+SMTP_USERNAME = os.environ.get("GDNC_SMTP_USERNAME", "finances@concise2025.ch")
+SMTP_PASSWORD = os.environ.get("GDNC_SMTP_PASSWORD", "")
+SMTP_SENDER = os.environ.get("GDNC_SMTP_SENDER", SMTP_USERNAME)
+SMTP_TIMEOUT = 30  # [s]
+
+# Waits of the Selenium webmail automation: (timeout [s], polling interval [s]) per readiness condition
+WEBMAIL_COMPOSER_WAIT = (10, 0.1)  # composer opened and recipient field visible
+WEBMAIL_UPLOAD_WAIT = (30, 0.2)  # attachment uploaded
+WEBMAIL_SEND_WAIT = (15, 0.2)  # composer closed once the email is sent
+
+EMAIL_QUEUE_SIZE = 20  # maximum number of finished invoices waiting to be sent (see "email_dispatcher.py")
+
+RUN_JOURNAL_PATH = LOG_PATH / f"run_journal_{CURRENT_TIME}.jsonl"  # stages completed for each registrer of the run (see "run_journal.py")
+
+# Startup budget of the scripts, measured with `python -X importtime` (see "check_startup_time.py")
+STARTUP_TIME_BUDGET = 0.5  # [s] total import time of a script started with `--help`
+STARTUP_FORBIDDEN_MODULE_LIST = ["pandas", "numpy", "openpyxl", "docx", "reportlab", "selenium", "webdriver_manager", "pyautogui", "pynput", "halo", "docx2pdf", "requests"]  # heavy packages which must only be imported where used
+
 if platform.system() == "Linux":
     # Ubuntu
     SOFFICE_BINARY_PATH = Path("/usr/lib/libreoffice/program/soffice")
@@ -42,6 +78,18 @@ else:
     # macOS
     SOFFICE_BINARY_PATH = Path("/Applications/LibreOffice.app/Contents/MacOS/soffice")
 
+# Warm LibreOffice instances used for DOCX to PDF conversion (see "conversion_pool.py")
+SOFFICE_NUM_WORKERS = 2
+SOFFICE_WORKER_BASE_PORT = 2002
+SOFFICE_STARTUP_TIMEOUT = 60  # [s]
+SOFFICE_CONVERSION_TIMEOUT = 60  # [s] maximum time to convert one document (the instance is killed and restarted beyond)
+SOFFICE_PROFILES_PATH = Path(tempfile.gettempdir()) / "gdnc_soffice_profiles"
+SOFFICE_BATCH_CHUNK_SIZE = 25  # maximum number of documents per `soffice --convert-to` call in batch conversion mode
+
+# Cache of rendered DOCX and PDF invoices (see "render_cache.py")
+RENDER_CACHE_PATH = OUT_PATH / ".cache"
+RENDER_CACHE_MAX_SIZE = 500 * 1024**2  # [bytes] least recently used invoices are evicted beyond this size
+
 SPORTS_SHEET_NAME_LIST = ["Inscription Volley mixte", "Inscription Pétanque", "Inscription Tir à la corde"]
 #SPORTS_LIST = ["Mixed Volleyball", "Pétanque", "Tug of War"]
 SPORTS_LIST = ["Volley Mixte", "Pétanque", "Tir à la Corde"]
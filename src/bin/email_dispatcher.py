@@ -0,0 +1,77 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from termcolor import colored
+
+from definition import EMAIL_QUEUE_SIZE
+
+
+class EmailDispatcher:
+    """Background consumer sending the finished invoices one after the other.
+
+    Invoices are handed over through a bounded queue, so that rendering,
+    conversion and booking of the next invoices go on while an email is being
+    composed and sent, and that the producer only waits when `max_queue_size`
+    invoices are already waiting to be sent. A single consumer thread sends all
+    emails, since the email transport (webmail session or SMTP connection)
+    handles one message at a time.
+
+    Usage:
+        dispatcher = EmailDispatcher(send_function=send).start()
+        dispatcher.submit(registrer_dict, invoice_path)
+        dispatcher.close()
+
+    :param send_function: Function sending an invoice, called with `registrer_dict`
+        and `invoice_path` and returning whether the email has been sent.
+    :param max_queue_size: Maximum number of invoices waiting to be sent.
+    """
+    def __init__(self, send_function: Callable[..., bool], max_queue_size: int = EMAIL_QUEUE_SIZE) -> None:
+        self.send_function = send_function
+        self.email_queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_queue_size)
+        self.result_dict = {"sent": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._consume, name="email-dispatcher", daemon=True)
+
+    def start(self) -> "EmailDispatcher":
+        """Start the consumer thread.
+
+        :return: The dispatcher itself.
+        """
+        self._thread.start()
+        return self
+
+    def _consume(self) -> None:
+        """Send the queued invoices until the end marker (None) is received.
+
+        :return: None.
+        """
+        while True:
+            item = self.email_queue.get()
+            if item is None:
+                break
+            registrer_dict, invoice_path = item
+            try:
+                is_sent = self.send_function(registrer_dict=registrer_dict, invoice_path=invoice_path)
+            except Exception as e:
+                is_sent = False
+                print(colored("\t\tError!", "red"), f"Invoice {registrer_dict['invoice number']} could not be sent via email: {e}")
+            self.result_dict["sent" if is_sent else "failed"] += 1
+
+    def submit(self, registrer_dict: Dict[str, Any], invoice_path: str) -> None:
+        """Queue an invoice for sending (blocks while the queue is full).
+
+        :param registrer_dict: A dictionary summarizing invoice data (see `book_invoice`).
+        :param invoice_path: A string containing the path to the PDF invoice.
+        :return: None.
+        """
+        self.email_queue.put((registrer_dict, invoice_path))
+
+    def close(self) -> Dict[str, int]:
+        """Wait for the queued invoices to be sent and stop the consumer thread.
+
+        :return result_dict: Number of emails sent (key "sent") and failed (key "failed").
+        """
+        self.email_queue.put(None)
+        self._thread.join()
+        print(f"Emails: {self.result_dict['sent']} sent, {self.result_dict['failed']} failed.")
+        return self.result_dict
@@ -0,0 +1,178 @@
+import mimetypes
+import smtplib
+import ssl
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Callable, Optional
+
+from termcolor import colored
+
+from definition import (SMTP_HOST, SMTP_PASSWORD, SMTP_PORT, SMTP_SECURITY,
+                        SMTP_SENDER, SMTP_TIMEOUT, SMTP_USERNAME)
+
+
+class EmailTransport(ABC):
+    """Way of delivering invoice emails (see `SeleniumTransport` and `SmtpTransport`).
+    """
+    name = "base"  # name of the transport (used in logs)
+
+    def connect(self) -> None:
+        """Open the transport before the first email, so that a wrong configuration is detected before any invoice is booked.
+
+        :return: None.
+        """
+
+    @abstractmethod
+    def send(self, recipient: str, subject: str, body: str, attachment_path: str) -> bool:
+        """Send an email with an attachment.
+
+        :param recipient: Email address of the recipient.
+        :param subject: Subject of the email.
+        :param body: Plain text content of the email.
+        :param attachment_path: Path to the file to attach (i.e., the PDF invoice).
+        :return is_sent: Whether the email has been sent.
+        """
+
+    def close(self) -> None:
+        """Release the resources of the transport.
+
+        :return: None.
+        """
+
+
+class SeleniumTransport(EmailTransport):
+    """Delivery through the Infomaniak webmail UI driven with Selenium.
+
+    The element IDs of the webmail composer depend on the number of messages
+    composed so far, which is counted here and given to `send_function`.
+
+    :param driver: The Chrome webdriver connected to the webmail.
+    :param send_function: Function composing and sending one email in the webmail, called with
+        `driver`, `recipient`, `subject`, `body`, `attachment_path` and `index` and returning whether it has been sent.
+    :param close_function: Function called with `driver` when the transport is closed (e.g. `shutdown_selenium`).
+    """
+    name = "selenium"
+
+    def __init__(self, driver, send_function: Callable[..., bool], close_function: Optional[Callable] = None) -> None:
+        self.driver = driver
+        self.send_function = send_function
+        self.close_function = close_function
+        self.num_composed = 0
+
+    def send(self, recipient: str, subject: str, body: str, attachment_path: str) -> bool:
+        index = self.num_composed
+        self.num_composed += 1
+        return self.send_function(driver=self.driver, recipient=recipient, subject=subject, body=body, attachment_path=attachment_path, index=index)
+
+    def close(self) -> None:
+        if self.close_function is not None:
+            self.close_function(self.driver)
+
+
+class SmtpTransport(EmailTransport):
+    """Delivery over SMTP, with one authenticated connection reused for the whole batch.
+
+    The connection is opened by `connect` (or on the first email) and reopened
+    (once per email) when the server has dropped it, e.g. after an idle timeout. Emails are sent
+    as MIME messages with the invoice attached.
+
+    Defaults are read from the `GDNC_SMTP_*` environment variables (see
+    "definition.py"). For local tests, a stand-in server such as `python -m
+    aiosmtpd -n -l localhost:8025` can be used with `security="none"`.
+
+    :param host: SMTP server host name.
+    :param port: SMTP server port.
+    :param username: Login of the mailbox (no authentication if empty).
+    :param password: Password of the mailbox.
+    :param sender: Email address the emails are sent from.
+    :param security: Connection security, "ssl" (implicit TLS), "starttls" or "none".
+    :param timeout: Timeout of the socket operations [s].
+    """
+    name = "smtp"
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, username: str = SMTP_USERNAME,
+                 password: str = SMTP_PASSWORD, sender: str = SMTP_SENDER, security: str = SMTP_SECURITY,
+                 timeout: float = SMTP_TIMEOUT) -> None:
+        if security not in ("ssl", "starttls", "none"):
+            raise ValueError(f"Unknown SMTP security '{security}' (expected 'ssl', 'starttls' or 'none').")
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.security = security
+        self.timeout = timeout
+        self.smtp: Optional[smtplib.SMTP] = None
+        self.num_connections = 0
+
+    def connect(self) -> None:
+        """Open and authenticate the SMTP connection.
+
+        :return: None.
+        :raises smtplib.SMTPException: If the server rejects the connection or the login.
+        :raises OSError: If the server cannot be reached.
+        """
+        self.close()
+        if self.security == "ssl":
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.security == "starttls":
+                smtp.starttls(context=ssl.create_default_context())
+            if self.username:
+                smtp.login(self.username, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        # Only kept once authenticated, so that a failed login is retried with a new connection
+        self.smtp = smtp
+        self.num_connections += 1
+
+    def build_message(self, recipient: str, subject: str, body: str, attachment_path: str) -> EmailMessage:
+        """Build the MIME message of an email with an attachment.
+
+        :param recipient: Email address of the recipient.
+        :param subject: Subject of the email.
+        :param body: Plain text content of the email.
+        :param attachment_path: Path to the file to attach.
+        :return message: The email message.
+        """
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.set_content(body)
+        content_type = mimetypes.guess_type(attachment_path)[0] or "application/octet-stream"
+        maintype, subtype = content_type.split("/", 1)
+        message.add_attachment(Path(attachment_path).read_bytes(), maintype=maintype, subtype=subtype, filename=Path(attachment_path).name)
+        return message
+
+    def send(self, recipient: str, subject: str, body: str, attachment_path: str) -> bool:
+        message = self.build_message(recipient=recipient, subject=subject, body=body, attachment_path=attachment_path)
+        for attempt in range(2):
+            try:
+                if self.smtp is None:
+                    self.connect()
+                refused_dict = self.smtp.send_message(message)
+                break
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                # Connection dropped by the server: reconnect and try once more
+                self.smtp = None
+                if attempt == 1:
+                    print(colored("\t\t\tError!", "red"), f"SMTP connection to {self.host}:{self.port} lost: {e}")
+                    return False
+        if refused_dict:
+            print(colored("\t\t\tError!", "red"), f"Recipients refused by the SMTP server: {refused_dict}")
+            return False
+        print("\t\t\tEmail successfully sent via SMTP!")
+        return True
+
+    def close(self) -> None:
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self.smtp.close()
+            self.smtp = None
@@ -0,0 +1,79 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+
+
+def get_file_signature(path: Path) -> Tuple[int, int]:
+    """Get the modification time and size of a file, used to memoize lookups until the file changes.
+
+    :param path: Path to the file.
+    :return: A tuple (modification time in nanoseconds, size in bytes).
+    """
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def iter_column_values(path: Path, sheet_name: str, column_name: Optional[str] = None, column_index: int = 1) -> Iterator[Any]:
+    """Stream the values of one column of an Excel sheet, without loading the whole sheet.
+
+    The workbook is opened in read-only mode and only the cells of the requested
+    column are read, row by row, so that the caller can stop early.
+
+    :param path: Path to the Excel file.
+    :param sheet_name: Name of the sheet.
+    :param column_name: Header of the column (first row). If given, `column_index` is ignored.
+    :param column_index: 1-based index of the column (used when `column_name` is None, header row included).
+    :return: An iterator over the values of the column (below the header when `column_name` is given).
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name]
+        min_row = 1
+        if column_name is not None:
+            header_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+            if column_name not in header_row:
+                raise ValueError(f"Column '{column_name}' not found in sheet '{sheet_name}' of '{path.name}'.")
+            column_index = header_row.index(column_name) + 1
+            min_row = 2
+        for (value,) in sheet.iter_rows(min_row=min_row, min_col=column_index, max_col=column_index, values_only=True):
+            yield value
+    finally:
+        workbook.close()
+
+
+@lru_cache(maxsize=32)
+def _get_column_values(path: Path, sheet_name: str, column_name: str, signature: Tuple[int, int]) -> Tuple[Any, ...]:
+    return tuple(iter_column_values(path, sheet_name, column_name=column_name))
+
+
+def get_column_values(path: Path, sheet_name: str, column_name: str) -> Tuple[Any, ...]:
+    """Get all values of one column of an Excel sheet (memoized as long as the file is unchanged).
+
+    :param path: Path to the Excel file.
+    :param sheet_name: Name of the sheet.
+    :param column_name: Header of the column.
+    :return: A tuple with the values of the column, header excluded.
+    """
+    return _get_column_values(path, sheet_name, column_name, get_file_signature(path))
+
+
+@lru_cache(maxsize=32)
+def _get_last_filled_row(path: Path, sheet_name: str, column_index: int, signature: Tuple[int, int]) -> int:
+    last_row = 1
+    for row, value in enumerate(iter_column_values(path, sheet_name, column_index=column_index), start=1):
+        if row > 1 and value not in (None, ""):
+            last_row = row
+    return last_row
+
+
+def get_last_filled_row(path: Path, sheet_name: str, column_index: int = 1) -> int:
+    """Get the number of the last row with a value in a key column (memoized as long as the file is unchanged).
+
+    :param path: Path to the Excel file.
+    :param sheet_name: Name of the sheet.
+    :param column_index: 1-based index of the key column.
+    :return: The number of the last filled row (1, the header row, if there is no data).
+    """
+    return _get_last_filled_row(path, sheet_name, column_index, get_file_signature(path))
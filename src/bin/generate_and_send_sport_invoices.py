@@ -11,65 +11,74 @@
 #                      - Discussion with ChatGPT (https://chatgpt.com/c/6792c47d-01b4-8003-abc4-23d175330cdc)
 # Working:             ✅
 
+from __future__ import annotations
+
 import json
 import math as m
 import os
 import platform
 import re
+import smtplib
 import subprocess
 import sys
 import threading
 import time
-from halo import Halo
-import tkinter as tk
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from enum import Enum
-from functools import wraps
+from functools import partial, wraps
 from pathlib import Path
-from openpyxl import load_workbook
 from time import perf_counter
-from typing import Dict, Any
-from tkinter import (BOTH, LEFT, RIGHT, VERTICAL, Canvas, Frame, Y, filedialog,
-                     messagebox, ttk)
-import pyautogui
-from pynput.keyboard import Controller
-
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Set, Tuple
 
 import click
-import docx
-import pandas as pd
-import pyperclip
-import requests
-import threading
+import importlib.util
 from definition import (BIN_PATH, CURRENT_TIME, INVOICE_MODELS_FOLDER_NAME,
                         LIB_PATH, LOG_PATH, OUT_PATH, PROJECT_PATH,
                         SOFFICE_BINARY_PATH, SPONSOR_DATABASE_DEBUG_NAME, SPONSOR_DATABASE_NAME, SHEET_NAME, SPONSOR_DATABASE_DEBUG_NAME, SPONSOR_DATABASE_PATH,
-                        SPORTS_CATALOG_PATH, SRC_PATH, NUM_INVOICE_PATH, DEBUG_MODE, REGISTRATION_EXCEL_FILE_NAME, SPORTS_SHEET_NAME_LIST, SPORTS_LIST)
-from docx2pdf import convert
-from pandas import DataFrame
-from PIL import Image, ImageSequence, ImageTk
+                        SPORTS_CATALOG_PATH, SRC_PATH, NUM_INVOICE_PATH, DEBUG_MODE, REGISTRATION_EXCEL_FILE_NAME, SPORTS_SHEET_NAME_LIST, SPORTS_LIST,
+                        SOFFICE_NUM_WORKERS, SOFFICE_PROFILES_PATH, WEBMAIL_COMPOSER_WAIT, WEBMAIL_UPLOAD_WAIT,
+                        WEBMAIL_SEND_WAIT)
 from termcolor import colored
-from tktooltip import ToolTip
-
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.webdriver import WebDriver
-from selenium.common.exceptions import NoSuchElementException
 
 from utils import (DualLogger, get_deadline_formatted_date, get_invoice_number,
-                   get_today_formatted_date, replace_text)
+                   get_today_formatted_date, reserve_invoice_numbers)
+from template_cache import TemplateCache
+from catalog import Catalog
+from conversion_pool import ConversionPool, convert_docx_batch
+from render_cache import RenderCache
+from run_journal import CONVERTED, DB_WRITTEN, EMAILED, RENDERED, RESERVED, RunJournal
+from email_dispatcher import EmailDispatcher
+from email_transport import EmailTransport, SeleniumTransport, SmtpTransport
+from invoice_database import InvoiceDatabaseWriter
+from ledger import InvoiceLedger
+
+# Heavy packages (pandas, Selenium, pyautogui, halo, reportlab, etc.) are imported in the functions using them, so
+# that runs which never reach them (e.g. `--help`, SMTP runs) do not pay for loading them (see "check_startup_time.py")
+if TYPE_CHECKING:
+    from pandas import DataFrame
+    from selenium.webdriver.chrome.webdriver import WebDriver
 
 SCRIPT_NAME = Path(__file__).name
+TEMPLATE_CACHE = TemplateCache(LIB_PATH / INVOICE_MODELS_FOLDER_NAME)  # each invoice model is parsed once per process
+SPORTS_CATALOG = None  # sports catalog indexed by sport name (set up in `main`)
+CONVERSION_POOL = None  # pool of warm LibreOffice instances (set up in `main`)
+PDF_RENDERER = None  # native PDF renderer replacing LibreOffice with `--pdf-engine reportlab` (set up in `main`)
+RENDER_CACHE = None  # cache of the DOCX and PDF invoices already rendered (set up in `main`)
+JOURNAL = None  # journal of the stages completed for each registrer, used by `--resume` (set up in `main`)
+INVOICE_DATABASE = None  # append-only sponsor database writer (set up in `main`)
+LEDGER = None  # writer of the invoice ledger "1_N° facture.xlsx" (set up in `main`)
+SOFFICE_PROFILE_PATH = None  # LibreOffice user profile of the current worker process (set up in `init_render_worker`)
+SOFFICE_INSTALL_HINT = "Please download LibreOffice to your Mac from 'https://www.libreoffice.org/donate/dl/mac-x86_64/25.2.1/fr/LibreOffice_25.2.1_MacOS_x86-64.dmg' or, if using Linux operating system, install it using the command `sudo apt install libreoffice` (in this case, make sure to add line `export LD_LIBRARY_PATH=/usr/lib/libreoffice/program:$LD_LIBRARY_PATH` to your .bashrc and .zshrc files to avoid issues such as `/usr/lib/libreoffice/program/soffice.bin: error while loading shared libraries: libreglo.so: cannot open shared object file: No such file or directory`) or download the Debian file from 'https://www.libreoffice.org/download/download-libreoffice/?type=deb-x86_64&version=25.2.1&lang=en-US'."
+REGISTRATION_EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") else None  # faster Rust-based reader when installed (default: openpyxl)
 
 
 def launch_client_chrome_instance():
     """Launch client Chrome instance in separate terminal thread via iTerm.
     """
+    import pyautogui
+    from pynput.keyboard import Controller
+
     # Open iTerm app (will bring to front if already open)
     subprocess.Popen(["open", "-a", "iTerm"])
 
@@ -126,6 +135,11 @@ def setup_selenium():
     # Launch client Chrome instance in terminal
     launch_client_chrome_instance()
 
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.webdriver.support.ui import WebDriverWait
+    from webdriver_manager.chrome import ChromeDriverManager
+
     # Specify the debugging address for the already opened Chrome browser
     debugger_address = "localhost:8989"
 
@@ -163,9 +177,49 @@ def click_button(driver: WebDriver, xpath: str) -> None:
     :param xpath: Button XPath under the form of string.
     :return: None.
     """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
     WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, xpath))).click()
 
 
+def wait_until(driver: WebDriver, condition, wait: Tuple[float, float], description: str):
+    """Wait until a readiness condition of the webpage is met and log how long it took.
+
+    :param driver: The Chrome webdriver used to interact with the webpage.
+    :param condition: Selenium expected condition (e.g. `EC.visibility_of_element_located(...)`).
+    :param wait: Timeout and polling interval of the wait [s] (e.g. `WEBMAIL_COMPOSER_WAIT`).
+    :param description: What is waited for (used in logs).
+    :return: The value returned by the condition (e.g. the element waited for).
+    :raises TimeoutException: If the condition is not met before the timeout.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    timeout, poll_frequency = wait
+    time_start = perf_counter()
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(condition)
+    finally:
+        print(f"\t\t\t⏱️ Waited {perf_counter() - time_start:.2f} [s] for {description}.")
+    return result
+
+
+def attachment_uploaded(file_name: str):
+    """Selenium expected condition met once an attachment is listed in the webmail composer and no upload is in progress anymore.
+
+    :param file_name: Name of the attached file.
+    :return: The condition, to be used with `wait_until`.
+    """
+    from selenium.webdriver.common.by import By
+
+    def condition(driver: WebDriver) -> bool:
+        if driver.find_elements(By.XPATH, "//app-mail-composer//mat-progress-bar | //app-mail-composer//mat-progress-spinner"):
+            return False
+        return bool(driver.find_elements(By.XPATH, f'//app-mail-composer//*[contains(text(), "{file_name}")]'))
+    return condition
+
+
 def enter_input(driver: WebDriver, xpath: str, text_input: str) -> None:
     """Enter a string in a text field of a webpage using Selenium package and provided input XPath.
     
@@ -174,6 +228,11 @@ def enter_input(driver: WebDriver, xpath: str, text_input: str) -> None:
     :param text_input: The text to input in the input field.
     :return: None.
     """
+    # Wait until input field
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
     # Wait until input field is present and interactable
     input_elem = WebDriverWait(driver, 10).until(
         EC.visibility_of_element_located((By.XPATH, xpath))
@@ -191,6 +250,8 @@ def enter_editor(driver: WebDriver, editor_name: str, text_input: str) -> None:
     :param text_input: The text to input in the input field.
     :return: None.
     """
+    from selenium.webdriver.common.by import By
+
     editor = driver.find_element(By.ID, editor_name)
     editor.click()
     editor.clear()  # clear existing text
@@ -253,25 +314,31 @@ def load_registrations_from_excel() -> DataFrame:
     :rtype: pandas.DataFrame
     :raises SystemExit: If the file does not exist, is empty, or is missing required columns.
     """
+    import pandas as pd
+
     excel_file_path = LIB_PATH / REGISTRATION_EXCEL_FILE_NAME
     if not excel_file_path.exists():
         print(colored("Error!", "red"), f"The file '{excel_file_path}' does not exist. Program will stop here.")
         sys.exit(1)
-    
-    # Read the different sheets from the Excel file
+
+    required_columns = ["Entry ID", "Date Created", "Nom complet", "E-mail", "Téléphone", "Adresse", "Nom d'équipe", "Nombre d'équipe(s)", "Total", "Sport"]
+
+    # Read the different sheets from the Excel file (opened and parsed only once, only keeping the required columns)
     print(f"Reading data from '{excel_file_path}'...")
+    start_time = perf_counter()
     df_list = []
-    for sheet_name in SPORTS_SHEET_NAME_LIST:
-        print(f"\tReading sheet '{sheet_name}'...")
-        try:
-            df = pd.read_excel(excel_file_path, sheet_name=sheet_name)
-            print(f"\t\tData read successfully from '{sheet_name}' sheet.")
-            # Add a column for the sport name
-            df["Sport"] = SPORTS_LIST[SPORTS_SHEET_NAME_LIST.index(sheet_name)]
-            df_list.append(df)
-        except ValueError as e:
-            print(colored("\t\tError!", "red"), f"Failed to read sheet '{sheet_name}': \n\t\t\t{e}\n\t\t\tProgram will stop here.")
-            sys.exit(1)
+    with pd.ExcelFile(excel_file_path, engine=REGISTRATION_EXCEL_ENGINE) as excel_file:
+        for sheet_name, sport in zip(SPORTS_SHEET_NAME_LIST, SPORTS_LIST):
+            print(f"\tReading sheet '{sheet_name}'...")
+            try:
+                df = excel_file.parse(sheet_name=sheet_name, usecols=lambda column: column in required_columns)
+                print(f"\t\tData read successfully from '{sheet_name}' sheet.")
+                # Add a column for the sport name
+                df["Sport"] = sport
+                df_list.append(df)
+            except ValueError as e:
+                print(colored("\t\tError!", "red"), f"Failed to read sheet '{sheet_name}': \n\t\t\t{e}\n\t\t\tProgram will stop here.")
+                sys.exit(1)
     
     # Concatenate all sheets into a single DataFrame
     df = pd.concat(df_list, ignore_index=True)
@@ -281,23 +348,48 @@ def load_registrations_from_excel() -> DataFrame:
         sys.exit(1)
     
     # Check if the required columns are present
-    required_columns = ["Entry ID", "Date Created", "Nom complet", "E-mail", "Téléphone", "Adresse", "Nom d'équipe", "Nombre d'équipe(s)", "Total", "Sport"]
     for column in required_columns:
         if column not in df.columns:
             print(colored("\t\tError!", "red"), f"The required column '{column}' is missing in the Excel file. Program will stop here.")
             sys.exit(1)
     
+    print(f"Registrations loaded in {perf_counter() - start_time:.2f} s (engine: {REGISTRATION_EXCEL_ENGINE or 'openpyxl'}).")
     print(f"Data read successfully. Total number of individual teams registered: {len(df)}")
 
     return df
 
 
+def filter_new_registrations(df: DataFrame, keep_email_set: Optional[Set[str]] = None) -> DataFrame:
+    """Keep only the registrations which have not been invoiced by a previous run.
+
+    The Entry IDs of invoiced registrations are recorded in the invoice store
+    together with their invoice, so that a new registrations export only yields
+    the registrations added since the last run.
+
+    :param df: Raw registration DataFrame (see `load_registrations_from_excel`).
+    :param keep_email_set: Email addresses of registrers to keep even if invoiced
+        (i.e., invoices of a resumed run which have not been sent yet).
+    :return df_new: The registrations whose Entry ID has not been invoiced yet.
+    """
+    processed_entry_id_set = INVOICE_DATABASE.store.get_processed_entry_ids()
+    df_new = df[~df["Entry ID"].astype(str).isin(processed_entry_id_set) | df["E-mail"].isin(keep_email_set or set())]
+    print(f"Found {len(df_new)} new registrations ({len(df) - len(df_new)} already invoiced registrations skipped).")
+
+    # Registrers having already received an invoice for earlier registrations get a separate invoice for the new ones
+    for email in df_new["E-mail"].unique():
+        if INVOICE_DATABASE.store.has_email_been_invoiced(email):
+            print(colored("\tNote:", "yellow"), f"Registrer {email} has already been invoiced, a new invoice will only cover the new registrations.")
+
+    return df_new
+
+
 def sanitize_data(df: DataFrame) -> DataFrame:
     """Sanitize and transform registration data.
 
     This function processes a registration DataFrame to:
     - Deduplicate registrants based on unique email addresses
     - Extract and group registered sports and associated teams
+    - Gather the Entry IDs of all registrations of each registrant
     - Generate current registration and deadline dates
     - Parse and validate address fields (street, postcode, city)
     - Build and return a cleaned DataFrame with relevant fields
@@ -308,23 +400,22 @@ def sanitize_data(df: DataFrame) -> DataFrame:
     :raises SystemExit: If address format errors are detected.
     """
     print("Sanitizing the data...")
-    
-    # Registered sports
-    email_unique_list = df["E-mail"].unique().tolist()
+
+    # One row per registrer (first registration of each unique email)
+    df_registrer = df.drop_duplicates(subset="E-mail", keep="first")
+    email_unique_list = df_registrer["E-mail"].tolist()
     num_registrers = len(email_unique_list)
-    # Gather sports and team names for each unique email
-    registered_sports_list = []
-    for email in email_unique_list:
-        df_registrer = df[df["E-mail"] == email]
-        sports_unique_list = df_registrer["Sport"].unique().tolist()
-        global_sport_dict = {}
-        for sport in sports_unique_list:
-            sport_df = df_registrer[df_registrer["Sport"] == sport]
-            team_name_list = sport_df["Nom d'équipe"].tolist()
-            sport_dict = {sport: team_name_list}
-            global_sport_dict.update(sport_dict)
-        registered_sports_list.append(global_sport_dict)
-        
+
+    # Registered sports
+    # Gather team names for each (email, sport) pair in a single pass (in order of first appearance)
+    team_name_series = df.groupby(["E-mail", "Sport"], sort=False, dropna=False)["Nom d'équipe"].agg(list)
+    registered_sports_dict = {email: {} for email in email_unique_list}
+    for (email, sport), team_name_list in team_name_series.items():
+        registered_sports_dict[email][sport] = team_name_list
+    registered_sports_list = list(registered_sports_dict.values())
+    # Entry IDs of all registrations of each registrer (marked as processed once invoiced)
+    entry_id_series = df.groupby("E-mail", sort=False, dropna=False)["Entry ID"].agg(list)
+
     # Dates
     # From "Date Created" column
     # date_created_list = df["Date Created"].unique().tolist()
@@ -332,61 +423,47 @@ def sanitize_data(df: DataFrame) -> DataFrame:
     # date_obj_list = [datetime.strptime(date, "%Y.%m.%d") for date in date_list]
     # date_list = [date_obj.strftime("%d.%m.%Y") for date_obj in date_obj_list]
     # From current invoicing date
-    date_obj_list = [datetime.now() for _ in range(num_registrers)]  # use current date for all entries
-    date_list = [get_today_formatted_date() for _ in range(num_registrers)]
-    date_deadline_list = [get_deadline_formatted_date(date_obj) for date_obj in date_obj_list]
-
-    # Address
-    address_unique_list = (
-        df[df["E-mail"].isin(email_unique_list)]
-        .drop_duplicates(subset="E-mail", keep="first")["Adresse"]
-        .tolist()
-    )    
+    date_list = [get_today_formatted_date()] * num_registrers  # use current date for all entries
+    date_deadline_list = [get_deadline_formatted_date(datetime.now())] * num_registrers
+
+    # Address ("street, city, postcode" or "street, postcode, city")
+    address_part_df = df_registrer["Adresse"].str.split(",", expand=True)
+    if address_part_df.shape[1] < 3 or address_part_df[[0, 1, 2]].isna().any(axis=None):
+        email = email_unique_list[address_part_df.reindex(columns=[0, 1, 2]).isna().any(axis=1).to_numpy().argmax()]
+        print(colored("\tError!", "red"), f"Address of registrer {email} is not of the form 'street, postcode, city'. Please check the address format. Program will stop here.")
+        sys.exit(1)
     # Street
-    street_list = [address.split(",")[0].strip() for address in address_unique_list]
+    street_series = address_part_df[0].str.strip()
     # Postcode
-    postcode_list = [address.split(",")[2].strip() for address in address_unique_list]
+    postcode_series = address_part_df[2].str.strip()
     # City
-    city_list = [address.split(",")[1].strip() for address in address_unique_list]
+    city_series = address_part_df[1].str.strip()
     # Eventually exchange postcode and city where necessary
-    for i in range(len(postcode_list)):
-        postcode = postcode_list[i]
-        city = city_list[i]
-        if postcode.isalpha() and city.isdigit():
-                postcode_list[i], city_list[i] = city_list[i], postcode_list[i]
-        elif postcode.isalpha() and city.isalpha():
-            print(colored("\tError!", "red"), f"Postcode '{postcode}' and city '{city}' are both alphabetic for registrer {email_unique_list[i]}. Please check the address format. Program will stop here.")
-            sys.exit(1)
-        elif postcode.isdigit() and city.isdigit():
-            print(colored("\tError!", "red"), f"Postcode '{postcode}' and city '{city}' are both numeric for registrer {email_unique_list[i]}. Please check the address format. Program will stop here.")
-            sys.exit(1)
-        else:
-            continue
+    postcode_is_alpha, postcode_is_digit = postcode_series.str.isalpha(), postcode_series.str.isdigit()
+    city_is_alpha, city_is_digit = city_series.str.isalpha(), city_series.str.isdigit()
+    error_mask = (postcode_is_alpha & city_is_alpha) | (postcode_is_digit & city_is_digit)
+    if error_mask.any():
+        i = error_mask.to_numpy().argmax()
+        postcode, city = postcode_series.iloc[i], city_series.iloc[i]
+        kind = "alphabetic" if postcode_is_alpha.iloc[i] else "numeric"
+        print(colored("\tError!", "red"), f"Postcode '{postcode}' and city '{city}' are both {kind} for registrer {email_unique_list[i]}. Please check the address format. Program will stop here.")
+        sys.exit(1)
+    swap_mask = postcode_is_alpha & city_is_digit
+    postcode_series, city_series = postcode_series.where(~swap_mask, city_series), city_series.where(~swap_mask, postcode_series)
 
     # Phone
-    phone_unique_list = (
-        df[df["E-mail"].isin(email_unique_list)]
-        .drop_duplicates(subset="E-mail", keep="first")["Téléphone"]
-        .tolist()
+    phone_series = (
+        df_registrer["Téléphone"]
+        .map(str)
+        .str.replace(r"^0", "+41", regex=True)
+        .str.replace(r"^41", "+41", regex=True)
+        .replace("nan", "")
     )
-    phone_list = [str(phone) for phone in phone_unique_list]
-    phone_list_adjusted = []
-    for phone in phone_list:
-        if phone.startswith("0"):
-            phone = "+41" + phone[1:]
-        if phone.startswith("41"):
-            phone = "+" + phone
-        if phone == "nan":
-            phone = ""
-        phone_list_adjusted.append(phone)
- 
+
     # Build sanitized DataFrame
     # Retrieve old columns to keep
     columns_to_keep = ["Entry ID", "Nom complet", "Téléphone", "E-mail"]
-    df_sanitized = (
-        df[df["E-mail"].isin(email_unique_list)]
-        .drop_duplicates(subset="E-mail", keep="first")[columns_to_keep]
-    )
+    df_sanitized = df_registrer[columns_to_keep].copy()
     # Rename some of the old columns in English
     df_sanitized.rename(columns={
         "Nom complet": "Name",
@@ -395,12 +472,13 @@ def sanitize_data(df: DataFrame) -> DataFrame:
     }, inplace=True)
     # Add new columns
     df_sanitized["Registered Sports"] = registered_sports_list
+    df_sanitized["Entry IDs"] = entry_id_series.tolist()
     df_sanitized["Date"] = date_list
     df_sanitized["Deadline"] = date_deadline_list
-    df_sanitized["Street"] = street_list
-    df_sanitized["Postcode"] = postcode_list
-    df_sanitized["City"] = city_list
-    df_sanitized["Phone"] = phone_list_adjusted
+    df_sanitized["Street"] = street_series
+    df_sanitized["Postcode"] = postcode_series
+    df_sanitized["City"] = city_series
+    df_sanitized["Phone"] = phone_series
     # Reset index
     df_sanitized = df_sanitized.reset_index(drop=True)
 
@@ -409,7 +487,7 @@ def sanitize_data(df: DataFrame) -> DataFrame:
     return df_sanitized
 
 
-def generate_invoice(entry: Dict[str, Any]) -> Dict[str, Any]:
+def generate_invoice(entry: Dict[str, Any], convert_to_pdf: bool = True, invoice_number: Optional[str] = None) -> Dict[str, Any]:
     """Generate a personalized invoice document (DOCX and PDF) for a sports
     registration entry, update tracking files, and return a summary dictionary
     of the invoice.
@@ -423,13 +501,45 @@ def generate_invoice(entry: Dict[str, Any]) -> Dict[str, Any]:
 
     :param entry: A dictionary containing participant and registration data.
     :type entry: dict[str, Any]
+    :param convert_to_pdf: Whether to convert the DOCX invoice to PDF right away
+        (False when all invoices are converted at once afterwards).
+    :param invoice_number: A string containing an already reserved invoice number
+        (the next invoice number is retrieved from the invoice database if None).
     :return registrer_dict: A dictionary summarizing invoice data to be used for
         database updates.
     :return invoice_path: A string containing the path to the generated PDF invoice.
     """
     # Get invoice number
-    invoice_number = get_invoice_number()
-    
+    if invoice_number is None:
+        invoice_number = get_invoice_number()
+
+    # Generate DOCX (and PDF) invoice
+    product_dict_list, total_price, invoice_path = render_invoice(entry=entry, invoice_number=invoice_number, convert_to_pdf=convert_to_pdf)
+    record_rendered_invoice(email=entry["Email"], invoice_number=invoice_number, invoice_path=invoice_path)
+
+    # Update tracking file and build database entry
+    registrer_dict = book_invoice(entry=entry, invoice_number=invoice_number, product_dict_list=product_dict_list, total_price=total_price)
+
+    return registrer_dict, invoice_path
+
+
+def render_invoice(entry: Dict[str, Any], invoice_number: str, convert_to_pdf: bool = True) -> Tuple[List[Dict[str, Any]], int, str]:
+    """Compute the price of a sports registration entry and generate its DOCX
+    (and PDF) invoice.
+
+    This function does not touch any shared file (i.e., tracking Excel file and
+    invoice database), so that it can run in parallel worker processes (see
+    `process_registrations_in_parallel`). Invoices rendered by a previous run
+    with the same template and replacements are taken from the render cache.
+
+    :param entry: A dictionary containing participant and registration data.
+    :param invoice_number: A string containing the (already reserved) invoice number.
+    :param convert_to_pdf: Whether to convert the DOCX invoice to PDF right away.
+    :return product_dict_list: A list of dictionaries describing the registered sports.
+    :return total_price: The total price of the invoice.
+    :return invoice_path: A string containing the path to the generated PDF invoice.
+    :raises RuntimeError: If the DOCX invoice has to be converted to PDF but LibreOffice is not installed.
+    """
     print(f"\t\tProcess launched for generating invoice {invoice_number}! 🚀")
     time_start = perf_counter() 
 
@@ -440,7 +550,7 @@ def generate_invoice(entry: Dict[str, Any]) -> Dict[str, Any]:
     product_dict_list = []
     for key, value in entry["Registered Sports"].items():
         sport = key
-        sport_price = next((v["price"] for v in SPORTS_CATALOG_DICT.values() if v["name"] == sport), None)
+        sport_price = SPORTS_CATALOG.get_price(sport)
         num_teams = len(value)
         registration = "Inscriptions" if num_teams > 1 else "Inscription"
         team = "équipes" if num_teams > 1 else "équipe"
@@ -456,7 +566,7 @@ def generate_invoice(entry: Dict[str, Any]) -> Dict[str, Any]:
 
     # Update status label
     print("\t\t\t> Select invoice template...")
-    doc = docx.Document(template_path)
+    template_name = f"InvoiceModel_CH95_DefaultProducts_{num_total_products}_sports.docx"
 
     product_key = "[PRODUCT-DESCRIPTION-IDX]"
     quantity_key = "[QT-IDX]"
@@ -491,90 +601,104 @@ def generate_invoice(entry: Dict[str, Any]) -> Dict[str, Any]:
         quantity_key_idx = quantity_key.replace("IDX", str(idx))
         product_replacements[quantity_key_idx] = str(quantity)
         price_key_idx = price_key.replace("IDX", str(idx))
-        sport_price = next((v["price"] for v in SPORTS_CATALOG_DICT.values() if v["name"] == sport), None)
+        sport_price = SPORTS_CATALOG.get_price(sport)
         product_replacements[price_key_idx] = str(sport_price)  # convert price to string since all mapped values have to have type string
         tot_key_idx = tot_key.replace("IDX", str(idx))
         product_replacements[tot_key_idx] = str("{:.2f}".format(float(price)))
 
         replacements.update(product_replacements)
 
-    # Update status label
-    print("\t\t\t> Replace keys in template...")
- 
-    # Make replacements in the paragraphs of the DOCX document (i.e., info and invoice data)
-    for paragraph in list(doc.paragraphs):
-        for old_text, new_text in replacements.items():
-            replace_text(paragraph=paragraph,
-                            old_text=old_text, new_text=new_text)
-
-    # Make replacements in the tables of the DOCX document (i.e., product data)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    for old_text, new_text in replacements.items():
-                        replace_text(
-                            paragraph=paragraph, old_text=old_text, new_text=new_text)
-                    # Make sure product number "01", "02", etc. (under the column "NO" in the invoice template) are not bold
-                    if re.fullmatch(r"0[1-5]", paragraph.text):
-                        paragraph.style.font.bold = False
-                        for run in paragraph.runs:
-                            run.bold = False
-
     invoice_name = f"Facture N° {invoice_number}.docx"
     if DEBUG_MODE:
         invoice_name = invoice_name.replace(".docx", "_DEBUG.docx")
     output_docx_path = str(OUT_PATH / invoice_name)
-    doc.save(output_docx_path)
     invoice_path = output_docx_path.replace(".docx",".pdf")
+
+    # Reuse the invoice of a previous run if nothing changed (e.g. when retrying a failed batch)
+    cache_key = None
+    if RENDER_CACHE is not None:
+        pdf_engine = PDF_RENDERER.engine_name if PDF_RENDERER is not None else "soffice"
+        cache_key = RENDER_CACHE.get_key(template_hash=TEMPLATE_CACHE.get(template_name).file_hash, replacements=replacements, engine=pdf_engine)
+        if RENDER_CACHE.fetch(key=cache_key, docx_path=output_docx_path, pdf_path=invoice_path):
+            print("\t\t\t> DOCX and PDF invoices taken from render cache.")
+            elapsed_time = perf_counter() - time_start
+            print(f"\t\t\tInvoice created and saved successfully! ⏱️ Elapsed time: {elapsed_time:.2f} [s]")
+            return product_dict_list, total_price, invoice_path
+
+    # Remove previous output files instead of overwriting them (they may be linked to render cache entries)
+    RenderCache.discard(output_docx_path, invoice_path)
+
+    # Update status label
+    print("\t\t\t> Replace keys in template...")
+
+    # Make replacements in a copy of the cached template (only the indexed placeholder runs are rewritten)
+    doc = TEMPLATE_CACHE.render(template_name=template_name, replacements=replacements)
+    doc.save(output_docx_path)
     
-    # Convert DOCX to PDF
-    
-    print("\t\t\t> DOCX to PDF conversion...")
+    # Convert DOCX to PDF (unless conversion is deferred to the batch conversion stage, see `convert_docx_batch`)
+    if PDF_RENDERER is not None:
+        # Draw the filled document straight to PDF (no LibreOffice process involved)
+        print("\t\t\t> DOCX to PDF rendering...")
+        PDF_RENDERER.render(doc=doc, pdf_path=invoice_path)
+    elif not convert_to_pdf:
+        print("\t\t\t> DOCX to PDF conversion deferred to batch conversion stage.")
+    else:
+        print("\t\t\t> DOCX to PDF conversion...")
 
-    if not SOFFICE_BINARY_PATH.exists():
-        print(f"LibreOffice binary file '{SOFFICE_BINARY_PATH}' does not exist. Please download LibreOffice to your Mac from 'https://www.libreoffice.org/donate/dl/mac-x86_64/25.2.1/fr/LibreOffice_25.2.1_MacOS_x86-64.dmg' or, if using Linux operating system, install it using the command `sudo apt install libreoffice` (in this case, make sure to add line `export LD_LIBRARY_PATH=/usr/lib/libreoffice/program:$LD_LIBRARY_PATH` to your .bashrc and .zshrc files to avoid issues such as `/usr/lib/libreoffice/program/soffice.bin: error while loading shared libraries: libreglo.so: cannot open shared object file: No such file or directory`) or download the Debian file from 'https://www.libreoffice.org/download/download-libreoffice/?type=deb-x86_64&version=25.2.1&lang=en-US'. The DOCX invoice could be generated but not converted into PDF. Invoice generation will stop here.")
-        sys.exit(1)
+        if not SOFFICE_BINARY_PATH.exists():
+            # Raised rather than exiting, since `SystemExit` would escape the error handling of the worker processes
+            raise RuntimeError(f"LibreOffice binary file '{SOFFICE_BINARY_PATH}' does not exist. {SOFFICE_INSTALL_HINT} The DOCX invoice could be generated but not converted into PDF.")
 
-    spinner = Halo(text="", spinner='dots')
-    spinner.start()
+        from halo import Halo
 
-    try:
-        # GUI solution for converting DOCX to PDF (using Microsoft Word) (not reliable every time; produces errors like: "'result': 'error', 'error': 'Error: Message not understood.'")
-        #convert(input_path=output_docx_path, output_path=output_pdf_path)
-        # Headless solution for converting DOCX to PDF (using LibreOffice with command `soffice --headless --convert-to pdf:writer_pdf_Export --outdir out/ input.docx`) (see "https://github.com/AlJohri/docx2pdf/issues/51#issuecomment-1335382983" and "https://stackoverflow.com/a/32595547") (download LibreOffice for macOS from this link: https://www.libreoffice.org/donate/dl/mac-x86_64/25.2.1/fr/LibreOffice_25.2.1_MacOS_x86-64.dmg)
-        subprocess.run([SOFFICE_BINARY_PATH, "--headless", "--convert-to", "pdf:writer_pdf_Export", "--outdir", str(OUT_PATH), output_docx_path], check=True)
-        spinner.succeed()
-        print(f"\t\t\t\tDOCX to PDF conversion successful!")
-    except Exception as e:
-        spinner.fail()
-        print(colored("\t\t\t\tError!", "red"), f"DOCX to PDF conversion failed:\n\t\t\t\t\t{e}.\n\t\t\t\t\tProgram will stop here.")
+        spinner = Halo(text="", spinner='dots')
+        spinner.start()
+
+        try:
+            # GUI solution for converting DOCX to PDF (using Microsoft Word) (not reliable every time; produces errors like: "'result': 'error', 'error': 'Error: Message not understood.'")
+            #convert(input_path=output_docx_path, output_path=output_pdf_path)
+            # Headless solution for converting DOCX to PDF (using LibreOffice with command `soffice --headless --convert-to pdf:writer_pdf_Export --outdir out/ input.docx`) (see "https://github.com/AlJohri/docx2pdf/issues/51#issuecomment-1335382983" and "https://stackoverflow.com/a/32595547") (download LibreOffice for macOS from this link: https://www.libreoffice.org/donate/dl/mac-x86_64/25.2.1/fr/LibreOffice_25.2.1_MacOS_x86-64.dmg)
+            if CONVERSION_POOL is not None:
+                # Send the job to one of the warm LibreOffice instances
+                CONVERSION_POOL.convert(docx_path=output_docx_path, out_dir=OUT_PATH)
+            else:
+                # Use a dedicated user profile in worker processes since concurrent LibreOffice processes cannot share one
+                profile_argument_list = [f"-env:UserInstallation={SOFFICE_PROFILE_PATH.as_uri()}"] if SOFFICE_PROFILE_PATH is not None else []
+                subprocess.run([SOFFICE_BINARY_PATH, "--headless", *profile_argument_list, "--convert-to", "pdf:writer_pdf_Export", "--outdir", str(OUT_PATH), output_docx_path], check=True)
+            spinner.succeed()
+            print(f"\t\t\t\tDOCX to PDF conversion successful!")
+        except Exception as e:
+            spinner.fail()
+            print(colored("\t\t\t\tError!", "red"), f"DOCX to PDF conversion failed:\n\t\t\t\t\t{e}.\n\t\t\t\t\tOnly the DOCX invoice is available, the other invoices are still processed.")
+
+    # Add the new invoice to the render cache (once its PDF exists)
+    if cache_key is not None:
+        if PDF_RENDERER is None and not convert_to_pdf:
+            RENDER_CACHE.defer(key=cache_key, docx_path=output_docx_path, pdf_path=invoice_path)
+        else:
+            RENDER_CACHE.store(key=cache_key, docx_path=output_docx_path, pdf_path=invoice_path)
 
     time_end = perf_counter()
     elapsed_time = time_end - time_start
     print(f"\t\t\tInvoice created and saved successfully! ⏱️ Elapsed time: {elapsed_time:.2f} [s]")
 
-    # Generate new line to fill in file "1_N° facture.xlsx"
-    num_invoice_entry_list = [get_today_formatted_date().replace('.', '/'), invoice_number, f"{entry['Name']} (sports)", str(int(total_price)), "Mail"]
-    print(f"\t\t▷ Generated new line for file '1_N° facture.xlsx':\n\t\t\t{num_invoice_entry_list}")
-    workbook = load_workbook(NUM_INVOICE_PATH)
-    # Select the sheet
-    sheet = workbook["Facturation"]
-    # Append the row at the very bottom of the table
-    # Find last non-empty row based on a key column
-    last_row = 1
-    for row in range(2, sheet.max_row + 1):
-        if sheet.cell(row=row, column=1).value not in (None, ""):
-            last_row = row
-    # Write your data in the next row
-    for col_index, value in enumerate(num_invoice_entry_list, start=1):
-        sheet.cell(row=last_row + 1, column=col_index, value=value)
-    # Save changes
-    workbook.save(NUM_INVOICE_PATH)
+    return product_dict_list, total_price, invoice_path
 
+
+def book_invoice(entry: Dict[str, Any], invoice_number: str, product_dict_list: List[Dict[str, Any]], total_price: int) -> Dict[str, Any]:
+    """Add a generated invoice to the tracking Excel file "1_N° facture.xlsx" and
+    build the dictionary used to update the invoice database.
+
+    :param entry: A dictionary containing participant and registration data.
+    :param invoice_number: A string containing the invoice number.
+    :param product_dict_list: A list of dictionaries describing the registered sports.
+    :param total_price: The total price of the invoice.
+    :return registrer_dict: A dictionary summarizing invoice data to be used for
+        database updates.
+    """
     registrer_dict = {
         "date": get_today_formatted_date(),
-        "invoice number": get_invoice_number(),
+        "invoice number": invoice_number,
         "company": "",
         "title": "",
         "first name": "",
@@ -590,99 +714,186 @@ def generate_invoice(entry: Dict[str, Any]) -> Dict[str, Any]:
         "comment": "",
     }
 
-    return registrer_dict, invoice_path
+    # Generate new line to fill in file "1_N° facture.xlsx"
+    num_invoice_entry_list = get_ledger_row(registrer_dict)
+    print(f"\t\t▷ Generated new line for file '1_N° facture.xlsx':\n\t\t\t{num_invoice_entry_list}")
+    # Append the row at the very bottom of the table (saved at the next checkpoint of the ledger)
+    LEDGER.append(num_invoice_entry_list)
 
+    return registrer_dict
 
-def update_invoice_database(registrer_dict: Dict[str, Any]) -> None:
+
+def get_ledger_row(registrer_dict: Dict[str, Any]) -> List[str]:
+    """Build the line of an invoice in the tracking Excel file "1_N° facture.xlsx".
+
+    :param registrer_dict: A dictionary summarizing invoice data (see `book_invoice`).
+    :return num_invoice_entry_list: The date, invoice number, name, amount and sending method of the invoice.
+    """
+    return [registrer_dict["date"].replace('.', '/'), registrer_dict["invoice number"], f"{registrer_dict['last name']} (sports)", str(int(registrer_dict["total price"])), "Mail"]
+
+
+def update_invoice_database(registrer_dict: Dict[str, Any], entry_id_list: Optional[List[Any]] = None) -> None:
     """Backup registerer data and update invoice database with a new entry.
 
-    This function takes a dictionary containing registration and invoice data,
-    formats it into a pandas DataFrame, and appends it to an Excel-based
-    sponsor database. If the database file does not exist, it creates a new one
-    with an appropriate Excel table structure. If it does exist, the function
-    appends the new data and rewrites the file.
+    The entry is handed over to the append-only `INVOICE_DATABASE` writer: it is
+    committed to the SQLite invoice store right away and the Excel-based sponsor
+    database (with its Excel table structure) is regenerated from the store at
+    the next checkpoint or at the end of the run, instead of reading and
+    rewriting the whole database for every entry.
 
     :param registrer_dict: A dictionary containing all invoice-related fields,
         including customer information and products purchased.
     :type registrer_dict: dict[str, Any]
+    :param entry_id_list: Entry IDs of the registrations covered by the invoice,
+        so that they are skipped by the next runs (see `filter_new_registrations`).
+    :type entry_id_list: list[Any] | None
     :return: None
     :rtype: None
     """
 
     print("\t\t> Update invoice database...")
-    
-    # Sponsor database
 
-    # Format sponsor DataFrame
-    column_list = ["Date", "Invoice Number", "Company", "Title", "First Name", "Last Name", "Address", "Postcode", "City", "Phone", "Email", "Default Product Dict", "Custom Product Dict", "Total Price [CHF]", "Comment"]
-    registrer_entry_list = list(registrer_dict.values())
+    INVOICE_DATABASE.append(registrer_dict=registrer_dict, entry_id_list=entry_id_list)
+    JOURNAL.record(registrer_dict["email"], DB_WRITTEN, registrer_dict=registrer_dict)
 
-    registrer_entry_df = pd.DataFrame([registrer_entry_list], columns=column_list)
-    
-    # Add data to database
-    if not os.path.exists(SPONSOR_DATABASE_PATH):
-        # If the database Excel file does NOT exist, create it and write the very first DataFrame
-        with pd.ExcelWriter(SPONSOR_DATABASE_PATH, engine="xlsxwriter") as writer:
-            # Write the sponsor entry data to the sheet
-            registrer_entry_df.to_excel(writer, index=False, sheet_name=SHEET_NAME)
-            # Getting XlsxWriter worksheet object
-            worksheet = writer.sheets[SHEET_NAME]
-            # Getting the dimensions of the DataFrame
-            (max_row, max_col) = registrer_entry_df.shape
-            # Creating a list of column headers, to use in "add_table()"
-            column_settings = [{"header": column} for column in registrer_entry_df.columns]
-            # Adding the Excel table structure (Pandas will add the data)
-            worksheet.add_table(0, 0, max_row, max_col-1, {"columns": column_settings})
-    else:
-        # If the database Excel file exists, read the existing data, append the new data, and rewrite the file
-        # Read the existing data
-        existing_data_df = pd.read_excel(SPONSOR_DATABASE_PATH, sheet_name=SHEET_NAME)
-        # Append the new data to the existing data
-        combined_data_df = pd.concat([existing_data_df, registrer_entry_df], ignore_index=True)
-        # Rewrite the combined data and recreate the pivot table
-        with pd.ExcelWriter(SPONSOR_DATABASE_PATH, engine="xlsxwriter") as writer:
-            # Write the combined data to the sheet
-            combined_data_df.to_excel(writer, index=False, sheet_name=SHEET_NAME)
-            # Getting XlsxWriter worksheet object
-            worksheet = writer.sheets[SHEET_NAME]
-            # Getting the dimensions of the DataFrame
-            (max_row, max_col) = combined_data_df.shape
-            # Creating a list of column headers, to use in "add_table()"
-            column_settings = [{"header": column} for column in registrer_entry_df.columns]
-            # Adding the Excel table structure (Pandas will add the data)
-            worksheet.add_table(0, 0, max_row, max_col-1, {"columns": column_settings})
-
-    print("\t\t\t> Invoice database successfully updated!")
-
-
-def send_invoice_via_email(driver: WebDriver, registrer_dict: dict, invoice_path: str, index: int):
-    """TODO: Description!!
-    + Parameters!
+    print("\t\t\t> Invoice database entry stored!")
+
+
+def record_rendered_invoice(email: str, invoice_number: str, invoice_path: str) -> None:
+    """Record in the run journal that the invoice of a registrer has been rendered (and converted if its PDF exists).
+
+    :param email: Email address of the registrer.
+    :param invoice_number: A string containing the invoice number.
+    :param invoice_path: A string containing the path to the PDF invoice.
+    :return: None.
     """
-    print("\t\t> Send invoice via email...")
+    JOURNAL.record(email, RENDERED, invoice_number=invoice_number, invoice_path=invoice_path)
+    if Path(invoice_path).exists():
+        JOURNAL.record(email, CONVERTED)
+
+
+def assign_invoice_numbers(df_sanitized: DataFrame) -> List[str]:
+    """Get the invoice number of each registrer.
+
+    Registrers already handled by a resumed run keep the invoice number recorded
+    in the run journal, new invoice numbers are reserved for the other ones and
+    recorded in the journal right away. An invoice whose rendering fails leaves
+    a gap in the invoice numbers, which is filled when the run is resumed
+    (`--resume`) since the registrer then gets its reserved number back.
+
+    :param df_sanitized: The sanitized DataFrame with one row per registrer.
+    :return invoice_number_list: A list of strings containing the invoice number of each registrer.
+    """
+    invoice_number_list = [JOURNAL.get_state(email).get("invoice_number") for email in df_sanitized["Email"]]
+    # Reserve new invoice numbers (the invoice database is only written at checkpoints)
+    new_invoice_number_iter = iter(reserve_invoice_numbers(invoice_number_list.count(None)))
+    for i, email in enumerate(df_sanitized["Email"]):
+        if invoice_number_list[i] is None:
+            invoice_number_list[i] = next(new_invoice_number_iter)
+            JOURNAL.record(email, RESERVED, invoice_number=invoice_number_list[i])
+    return invoice_number_list
+
+
+def resume_booked_invoice(entry: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], str]]:
+    """Get the invoice of a registrer which has already been booked by the resumed run.
+
+    Its missing invoice ledger line has already been written again by
+    `restore_unsaved_ledger_rows`.
+
+    :param entry: A dictionary containing participant and registration data.
+    :return registrer_dict: A dictionary summarizing invoice data (None if the invoice has not been booked yet).
+    :return invoice_path: A string containing the path to the PDF invoice.
+    """
+    state = JOURNAL.get_state(entry["Email"])
+    if DB_WRITTEN not in state["stages"]:
+        return None
+    print("\t\t> Invoice already booked by the resumed run.")
+    return state["registrer_dict"], state["invoice_path"]
+
+
+def restore_unsaved_ledger_rows() -> int:
+    """Write again the invoice ledger lines of the invoices booked by the resumed run but not saved to the ledger.
+
+    The ledger being saved at checkpoints, the resumed run may have booked (and
+    even emailed) invoices whose line was never saved. Such emailed invoices are
+    skipped by the resumed run, so their lines are written here, before the
+    registrations are filtered.
+
+    :return num_row: The number of lines written again.
+    """
+    email_list = JOURNAL.get_unsaved_ledger_emails()
+    for email in email_list:
+        LEDGER.append(get_ledger_row(JOURNAL.get_state(email)["registrer_dict"]))
+    if email_list:
+        print(f"\t{len(email_list)} invoices booked by the resumed run were missing from the invoice ledger and have been written again.")
+        LEDGER.save()
+    return len(email_list)
+
+
+def send_invoice_via_email(transport: EmailTransport, registrer_dict: dict, invoice_path: str) -> bool:
+    """Compose the email of an invoice and send it with the PDF invoice attached.
+
+    :param transport: The email transport (Selenium webmail or SMTP, see "email_transport.py").
+    :param registrer_dict: A dictionary summarizing invoice data (see `book_invoice`).
+    :param invoice_path: A string containing the path to the PDF invoice.
+    :return is_sent: Whether the email has been sent.
+    """
+    print(f"\t\t> Send invoice via email ({transport.name})...")
+
+    # Recipient email address
+    #email = registrer_dict["email"]
+    email = "antho.guinchard@gmail.com"
+
+    # Email subject
+    invoice_name = Path(invoice_path).name
+    invoice_number = re.search(r'\d+', invoice_name).group(0)
+    email_subject = f"Giron du Nord 2025 à Concise • Facture inscription sports • {invoice_number}"
+
+    # Email content
+    email_content = compose_email(registrer_dict=registrer_dict)
+
+    is_sent = transport.send(recipient=email, subject=email_subject, body=email_content, attachment_path=invoice_path)
+    if is_sent:
+        JOURNAL.record(registrer_dict["email"], EMAILED)
+    return is_sent
+
+
+def send_email_via_webmail(driver: WebDriver, recipient: str, subject: str, body: str, attachment_path: str, index: int) -> bool:
+    """Compose and send an email in the Infomaniak webmail using Selenium (see `SeleniumTransport`).
+
+    :param driver: The Chrome webdriver used to interact with the webmail.
+    :param recipient: Email address of the recipient.
+    :param subject: Subject of the email.
+    :param body: Content of the email.
+    :param attachment_path: Path to the file to attach (i.e., the PDF invoice).
+    :param index: Number of messages composed so far (webmail element IDs depend on it).
+    :return is_sent: Whether the email has been sent.
+    """
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
 
     # Click on button "Nouveau message"
     new_message_button_xpath = '//*[@id="step1"]'
     click_button(driver=driver, xpath=new_message_button_xpath)
-    time.sleep(2)  # adjust if needed
 
-    # Input recipient email address
+    # Input recipient email address (once the composer is open)
     recipient_input_xpath = f'//*[@id="mat-chip-list-input-{str(index)}"]'
-    #email = registrer_dict["email"]
-    email = "antho.guinchard@gmail.com"
-    enter_input(driver=driver, xpath=recipient_input_xpath, text_input=email)
+    try:
+        wait_until(driver=driver, condition=EC.visibility_of_element_located((By.XPATH, recipient_input_xpath)), wait=WEBMAIL_COMPOSER_WAIT, description="composer")
+    except TimeoutException:
+        print(colored("\t\t\tError!", "red"), "Email composer did not open. Email could not be sent...")
+        return False
+    enter_input(driver=driver, xpath=recipient_input_xpath, text_input=recipient)
 
     # Input email subject
     email_subject_input_xpath = f'//*[@id="mat-input-{str(8+index)}"]'
-    invoice_name = Path(invoice_path).name
-    invoice_number = re.search(r'\d+', invoice_name).group(0)
-    email_subject = f"Giron du Nord 2025 à Concise • Facture inscription sports • {invoice_number}"
-    enter_input(driver=driver, xpath=email_subject_input_xpath, text_input=email_subject)
+    enter_input(driver=driver, xpath=email_subject_input_xpath, text_input=subject)
 
     # Input email content
     editor_name = "squireEditor"
-    email_content = compose_email(registrer_dict=registrer_dict)
-    enter_editor(driver=driver, editor_name=editor_name, text_input=email_content)
+    enter_editor(driver=driver, editor_name=editor_name, text_input=body)
     
     # Attach invoice
     # Wait for the file input element to be present
@@ -690,26 +901,235 @@ def send_invoice_via_email(driver: WebDriver, registrer_dict: dict, invoice_path
         EC.presence_of_element_located((By.XPATH, '//input[@type="file"]'))
     )
     # Send the file path to the input (this uploads the file)
-    file_input.send_keys(invoice_path)
-    time.sleep(2)  # adjust if needed
+    file_input.send_keys(attachment_path)
+    try:
+        wait_until(driver=driver, condition=attachment_uploaded(Path(attachment_path).name), wait=WEBMAIL_UPLOAD_WAIT, description="attachment upload")
+    except TimeoutException:
+        print(colored("\t\t\tError!", "red"), "Attachment upload did not complete. Email not sent...")
+        return False
 
     # Send mail by clicking twice on button "ENVOYER" (to prevent pop-up message appearing in case of sending message during weekend)
     #send_message_button_xpath = '//*[@id="cdk-overlay-0"]/app-compose-dialog/div/div/div[2]/app-mail-composer/form/div[2]/div[2]/div/button[1]'
     send_message_button_xpath = "//button[normalize-space(.)='Envoyer']"
     click_button(driver=driver, xpath=send_message_button_xpath)
 
-    # Wait a bit after sending email to make sure it has been sent
-    time.sleep(5)  # adjust if needed
-
+    # The composer is closed once the email has been sent
     try:
-        recipient_input_element = driver.find_element(By.XPATH, recipient_input_xpath)
+        wait_until(driver=driver, condition=EC.invisibility_of_element_located((By.XPATH, recipient_input_xpath)), wait=WEBMAIL_SEND_WAIT, description="composer to close")
+    except TimeoutException:
         print(colored("\t\t\tError!", "red"), "Recipient input element is still present. This means that email could not be sent...")
-    except NoSuchElementException:
-        print("\t\t\tRecipient input element no more present. Email successfully sent!")
+        return False
+    print("\t\t\tRecipient input element no more present. Email successfully sent!")
+    return True
+
+def process_registrations(transport: EmailTransport, df_sanitized: DataFrame) -> None:
+    """Generate and book the invoice of each registrer, one registrer after the
+    other, while the finished invoices are sent in the background (see `EmailDispatcher`).
+
+    :param transport: The email transport sending the invoices (see "email_transport.py").
+    :param df_sanitized: The sanitized DataFrame with one row per registrer.
+    :return: None.
+    """
+    invoice_number_list = assign_invoice_numbers(df_sanitized)
+
+    # Email consumer
+    email_dispatcher = EmailDispatcher(send_function=partial(send_invoice_via_email, transport)).start()
+
+    # Loop through each registration
+    print("Processing registrations...")
+    for (index, row), invoice_number in zip(df_sanitized.iterrows(), invoice_number_list):
+        print(f"\t{index + 1}/{len(df_sanitized)}: entry ID {row['Entry ID']} (name: {row['Name']};  email: {row['Email']})")
+        if JOURNAL.has_stage(row["Email"], EMAILED):
+            print("\t\t> Invoice already sent by the resumed run.")
+            continue
+
+        booked_invoice = resume_booked_invoice(entry=row)
+        if booked_invoice is not None:
+            registrer_dict, invoice_path = booked_invoice
+        else:
+            # Generate invoice
+            registrer_dict, invoice_path = generate_invoice(entry=row, invoice_number=invoice_number)
+
+            # Update invoice database
+            update_invoice_database(registrer_dict=registrer_dict, entry_id_list=row["Entry IDs"])
+
+        # Hand the invoice over to the email consumer (sent using selenium while the next invoices are generated)
+        email_dispatcher.submit(registrer_dict=registrer_dict, invoice_path=invoice_path)
+
+    # Wait for the remaining emails to be sent
+    email_dispatcher.close()
+
+
+def process_registrations_in_batch(transport: EmailTransport, df_sanitized: DataFrame) -> None:
+    """Generate, book and send the invoices of all registrers stage by stage.
+
+    All DOCX invoices are rendered (and booked in the invoice files) first, then
+    converted to PDF at once with `convert_docx_batch` and finally sent. Invoices
+    whose conversion failed are reported and not sent. With `--pdf-engine
+    reportlab`, PDF invoices are already rendered in the first stage and the
+    conversion stage is skipped, as for invoices taken from the render cache.
+
+    :param transport: The email transport sending the invoices (see "email_transport.py").
+    :param df_sanitized: The sanitized DataFrame with one row per registrer.
+    :return: None.
+    """
+    invoice_number_list = assign_invoice_numbers(df_sanitized)
+
+    # Stage 1: render all DOCX invoices
+    print("Rendering invoices...")
+    invoice_list = []
+    for (index, row), invoice_number in zip(df_sanitized.iterrows(), invoice_number_list):
+        print(f"\t{index + 1}/{len(df_sanitized)}: entry ID {row['Entry ID']} (name: {row['Name']};  email: {row['Email']})")
+        if JOURNAL.has_stage(row["Email"], EMAILED):
+            print("\t\t> Invoice already sent by the resumed run.")
+            continue
+
+        booked_invoice = resume_booked_invoice(entry=row)
+        if booked_invoice is not None:
+            registrer_dict, invoice_path = booked_invoice
+        else:
+            # Generate invoice (DOCX only)
+            registrer_dict, invoice_path = generate_invoice(entry=row, convert_to_pdf=False, invoice_number=invoice_number)
+
+            # Update invoice database
+            update_invoice_database(registrer_dict=registrer_dict, entry_id_list=row["Entry IDs"])
+
+        invoice_list.append((index, row, registrer_dict, invoice_path))
+
+    # Stage 2: convert all DOCX invoices to PDF (invoices rendered natively or taken from the render cache already have their PDF)
+    docx_path_list = [invoice_path.replace(".pdf", ".docx") for _, _, _, invoice_path in invoice_list]
+    result_dict = {docx_path: docx_path.replace(".docx", ".pdf") for docx_path in docx_path_list if Path(docx_path.replace(".docx", ".pdf")).exists()}
+    pending_docx_path_list = [docx_path for docx_path in docx_path_list if docx_path not in result_dict]
+    if pending_docx_path_list:
+        print(f"Converting {len(pending_docx_path_list)} invoices from DOCX to PDF...")
+        time_start = perf_counter()
+        conversion_result_dict = convert_docx_batch(docx_path_list=pending_docx_path_list, out_dir=OUT_PATH)
+        failure_list = [(docx_path, result) for docx_path, result in conversion_result_dict.items() if isinstance(result, Exception)]
+        print(f"\tConversion finished: {len(conversion_result_dict) - len(failure_list)} succeeded, {len(failure_list)} failed. ⏱️ Elapsed time: {perf_counter() - time_start:.2f} [s]")
+        for docx_path, error in failure_list:
+            print(colored("\t\tError!", "red"), f"DOCX to PDF conversion failed for '{Path(docx_path).name}': {error}")
+        result_dict.update(conversion_result_dict)
+        for _, row, _, invoice_path in invoice_list:
+            if not isinstance(result_dict[invoice_path.replace(".pdf", ".docx")], Exception) and not JOURNAL.has_stage(row["Email"], CONVERTED):
+                JOURNAL.record(row["Email"], CONVERTED)
+    if RENDER_CACHE is not None:
+        RENDER_CACHE.store_deferred()
+
+    # Stage 3: send the invoices which could be converted
+    print("Sending invoices...")
+    email_dispatcher = EmailDispatcher(send_function=partial(send_invoice_via_email, transport)).start()
+    for index, row, registrer_dict, invoice_path in invoice_list:
+        print(f"\t{index + 1}/{len(df_sanitized)}: entry ID {row['Entry ID']} (name: {row['Name']};  email: {row['Email']})")
+        if isinstance(result_dict[invoice_path.replace(".pdf", ".docx")], Exception):
+            print(colored("\t\tError!", "red"), f"No PDF invoice available, invoice not sent. Please convert and send '{Path(invoice_path).name}' manually.")
+            continue
+
+        # Send invoice via email using selenium
+        email_dispatcher.submit(registrer_dict=registrer_dict, invoice_path=invoice_path)
+    email_dispatcher.close()
+
+
+def init_render_worker(sports_catalog: Catalog, use_pdf_renderer: bool = False, use_render_cache: bool = False) -> None:
+    """Initialize a worker process of `process_registrations_in_parallel`.
+
+    :param sports_catalog: The sports catalog loaded by the main process.
+    :param use_pdf_renderer: Whether to render PDF invoices natively instead of using LibreOffice.
+    :param use_render_cache: Whether to reuse invoices already rendered (see "render_cache.py").
+    :return: None.
+    """
+    global SPORTS_CATALOG, SOFFICE_PROFILE_PATH, PDF_RENDERER, RENDER_CACHE
+    SPORTS_CATALOG = sports_catalog
+    SOFFICE_PROFILE_PATH = SOFFICE_PROFILES_PATH / f"process_{os.getpid()}"
+    if use_pdf_renderer:
+        from pdf_renderer import InvoicePdfRenderer
+        PDF_RENDERER = InvoicePdfRenderer()
+    else:
+        PDF_RENDERER = None
+    RENDER_CACHE = RenderCache() if use_render_cache else None
+
+
+def process_registrations_in_parallel(transport: EmailTransport, df_sanitized: DataFrame, num_processes: int) -> None:
+    """Generate, book and send the invoices of all registrers in a staged pipeline.
+
+    - Invoice numbers are reserved for all registrers up front, since they are
+      printed on the invoices. An invoice which fails to render leaves a gap in
+      the invoice numbers until the run is resumed (see `assign_invoice_numbers`).
+    - DOCX rendering and PDF conversion run in a pool of `num_processes` worker processes.
+    - The tracking Excel file and the invoice database are only written by the
+      main thread, one finished invoice after the other.
+    - Emails are sent by a single consumer thread fed by a queue of finished invoices.
+
+    :param transport: The email transport sending the invoices (see "email_transport.py").
+    :param df_sanitized: The sanitized DataFrame with one row per registrer.
+    :param num_processes: Number of worker processes rendering and converting invoices.
+    :return: None.
+    """
+    print(f"Processing registrations with {num_processes} worker processes...")
+    time_start = perf_counter()
+
+    # Assign invoice numbers up front so that workers never race on `get_invoice_number`
+    invoice_number_list = assign_invoice_numbers(df_sanitized)
+    print(f"\tAssigned invoice numbers {min(invoice_number_list)} to {max(invoice_number_list)}.")
+
+    # Email consumer
+    email_dispatcher = EmailDispatcher(send_function=partial(send_invoice_via_email, transport)).start()
+
+    # Rendering and conversion in worker processes, bookkeeping in the main thread (single writer)
+    failure_list = []
+    with ProcessPoolExecutor(max_workers=num_processes, initializer=init_render_worker, initargs=(SPORTS_CATALOG, PDF_RENDERER is not None, RENDER_CACHE is not None)) as executor:
+        future_dict = {}
+        for (index, row), invoice_number in zip(df_sanitized.iterrows(), invoice_number_list):
+            if JOURNAL.has_stage(row["Email"], EMAILED):
+                print(f"\t{index + 1}/{len(df_sanitized)}: invoice {invoice_number} already sent by the resumed run.")
+                continue
+            booked_invoice = resume_booked_invoice(entry=row)
+            if booked_invoice is not None:
+                # Invoices booked by the resumed run only have to be sent
+                email_dispatcher.submit(*booked_invoice)
+                continue
+            future_dict[executor.submit(render_invoice, entry=row, invoice_number=invoice_number)] = (index, row, invoice_number)
+
+        for future in as_completed(future_dict):
+            index, row, invoice_number = future_dict[future]
+            print(f"\t{index + 1}/{len(df_sanitized)}: entry ID {row['Entry ID']} (name: {row['Name']};  email: {row['Email']}) → invoice {invoice_number}")
+            try:
+                product_dict_list, total_price, invoice_path = future.result()
+            except Exception as e:
+                failure_list.append(invoice_number)
+                print(colored("\t\tError!", "red"), f"Invoice {invoice_number} could not be generated: {e}")
+                continue
+            record_rendered_invoice(email=row["Email"], invoice_number=invoice_number, invoice_path=invoice_path)
+
+            # Update tracking file and invoice database
+            registrer_dict = book_invoice(entry=row, invoice_number=invoice_number, product_dict_list=product_dict_list, total_price=total_price)
+            update_invoice_database(registrer_dict=registrer_dict, entry_id_list=row["Entry IDs"])
+
+            if not Path(invoice_path).exists():
+                failure_list.append(invoice_number)
+                print(colored("\t\tError!", "red"), f"No PDF invoice available, invoice not sent. Please convert and send '{Path(invoice_path).name}' manually.")
+                continue
+
+            # Hand the invoice over to the email consumer
+            email_dispatcher.submit(registrer_dict=registrer_dict, invoice_path=invoice_path)
+
+    # Wait for the remaining emails to be sent
+    email_result_dict = email_dispatcher.close()
+
+    print(f"\tPipeline finished: {len(df_sanitized) - len(failure_list)} invoices generated, {len(failure_list)} failed, {email_result_dict['sent']} emails sent, {email_result_dict['failed']} emails failed. ⏱️ Elapsed time: {perf_counter() - time_start:.2f} [s]")
+
 
 @click.command()
 @click.option("-d", "--debug", is_flag=True, help="Enable debug mode.", default=True)
-def main(debug: bool):
+@click.option("-w", "--soffice-workers", type=int, default=SOFFICE_NUM_WORKERS, show_default=True, help="Number of warm LibreOffice instances used for DOCX to PDF conversion (0 to launch one LibreOffice process per invoice).")
+@click.option("-b", "--batch-convert", is_flag=True, help="Render all DOCX invoices first, then convert them to PDF in multi-file LibreOffice calls spread over all CPU cores.")
+@click.option("-j", "--jobs", type=int, default=1, show_default=True, help="Number of worker processes rendering and converting invoices in parallel (0 to use all CPU cores).")
+@click.option("-a", "--all-registrations", is_flag=True, help="Process all registrations of the export, including the ones already invoiced by a previous run.")
+@click.option("--ledger-dry-run", is_flag=True, help="Only show the rows which would be written to the invoice ledger '1_N° facture.xlsx' instead of saving it.")
+@click.option("-e", "--pdf-engine", type=click.Choice(["soffice", "reportlab"]), default="soffice", show_default=True, help="Engine producing the PDF invoices: LibreOffice conversion of the DOCX invoices, or native rendering with reportlab (no LibreOffice needed).")
+@click.option("--no-render-cache", is_flag=True, help="Render and convert every invoice again instead of reusing the identical invoices of previous runs.")
+@click.option("-t", "--email-transport", type=click.Choice(["selenium", "smtp"]), default="selenium", show_default=True, help="Way of sending the invoices: Infomaniak webmail driven with Selenium, or SMTP with one reused connection (configured with the GDNC_SMTP_* environment variables).")
+@click.option("-r", "--resume", is_flag=True, help="Resume the latest run from its journal: reuse its invoice numbers, skip the invoices it already booked or sent and only send the remaining ones.")
+def main(debug: bool, soffice_workers: int, batch_convert: bool, jobs: int, all_registrations: bool, ledger_dry_run: bool, pdf_engine: str, no_render_cache: bool, resume: bool, email_transport: str):
     """Run script for generating and sending sport invoices.
     """
     # Set debug mode
@@ -723,36 +1143,114 @@ def main(debug: bool):
     # Set up print statement redirection to log file
     sys.stdout = DualLogger(LOG_PATH / f"{SCRIPT_NAME}_{CURRENT_TIME}.log")
     
-    # Set up Selenium
-    driver = setup_selenium()
+    # Set up email transport
+    if email_transport == "smtp":
+        transport = SmtpTransport()
+    else:
+        # Set up Selenium
+        driver = setup_selenium()
+        transport = SeleniumTransport(driver=driver, send_function=send_email_via_webmail, close_function=shutdown_selenium)
+    try:
+        transport.connect()
+    except (smtplib.SMTPException, OSError) as e:
+        print(colored("Error!", "red"), f"Could not connect to the email server ({transport.name}): {e}. No invoice has been generated.")
+        sys.exit(1)
 
     # Load sports catalog
-    with open (SPORTS_CATALOG_PATH, "r") as file:
-        global SPORTS_CATALOG_DICT
-        SPORTS_CATALOG_DICT = json.load(file)
+    global SPORTS_CATALOG
+    SPORTS_CATALOG = Catalog(SPORTS_CATALOG_PATH)
+
+    # Open invoice database writer (exports entries stored by a previous crashed run)
+    global INVOICE_DATABASE
+    INVOICE_DATABASE = InvoiceDatabaseWriter(database_path=SPONSOR_DATABASE_PATH)
+
+    # Open run journal (the journal of the latest run is continued when resuming)
+    global JOURNAL
+    journal_path = RunJournal.find_latest() if resume else None
+    if resume and journal_path is None:
+        print(colored("\tWarning!", "yellow"), f"No run journal found in '{LOG_PATH}', nothing to resume. Starting a new run.")
+    JOURNAL = RunJournal(journal_path) if journal_path is not None else RunJournal()
+    if journal_path is not None:
+        print(f"\tResuming run from journal '{journal_path.name}' (registrers per last completed stage: {JOURNAL.get_summary()}).")
+
+    # Open invoice ledger (loaded once on first use, saved at checkpoints)
+    global LEDGER
+    LEDGER = InvoiceLedger(dry_run=ledger_dry_run, on_save=JOURNAL.record_ledger_rows)
+    if journal_path is not None:
+        restore_unsaved_ledger_rows()
+
+    # Parse sports invoice templates once for the whole batch
+    TEMPLATE_CACHE.preload(pattern="*_sports.docx")
+
+    # Set up native PDF rendering
+    global PDF_RENDERER
+    if pdf_engine == "reportlab":
+        from pdf_renderer import REPORTLAB_AVAILABLE, InvoicePdfRenderer
+        if REPORTLAB_AVAILABLE:
+            PDF_RENDERER = InvoicePdfRenderer()
+        else:
+            print(colored("\tWarning!", "yellow"), "Package 'reportlab' is not installed (`pip install reportlab`). Falling back to LibreOffice for DOCX to PDF conversion.")
 
-    # Read Excel file with sport registrations
-    df = load_registrations_from_excel()
+    # Check that LibreOffice is installed before any invoice number is reserved or any invoice is booked
+    if PDF_RENDERER is None and not SOFFICE_BINARY_PATH.exists():
+        print(colored("Error!", "red"), f"LibreOffice binary file '{SOFFICE_BINARY_PATH}' does not exist. {SOFFICE_INSTALL_HINT} Alternatively, render the PDF invoices with `--pdf-engine reportlab`.")
+        sys.exit(1)
 
-    # Sanitize data
-    df_sanitized = sanitize_data(df)
+    # Open render cache
+    global RENDER_CACHE
+    if not no_render_cache:
+        RENDER_CACHE = RenderCache()
 
-    # Loop through each registration
-    print("Processing registrations...")
-    for index, row in df_sanitized.iterrows():
-        print(f"\t{index + 1}/{len(df_sanitized)}: entry ID {row['Entry ID']} (name: {row['Name']};  email: {row['Email']})")
-        
-        # Generate invoice
-        registrer_dict, invoice_path = generate_invoice(entry=row)
+    # Start warm LibreOffice instances for DOCX to PDF conversion
+    global CONVERSION_POOL
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if soffice_workers > 0 and not batch_convert and jobs == 1 and PDF_RENDERER is None:
+        try:
+            CONVERSION_POOL = ConversionPool(num_workers=soffice_workers).start()
+        except Exception as e:
+            print(colored("\tWarning!", "yellow"), f"Could not start LibreOffice instances ({e}). Falling back to one LibreOffice process per invoice.")
+            CONVERSION_POOL = None
+
+    # Read Excel file with sport registrations
+    df = load_registrations_from_excel()
 
-        # Update invoice database
-        update_invoice_database(registrer_dict=registrer_dict)
+    # Only keep registrations which have not been invoiced yet
+    if not all_registrations:
+        df = filter_new_registrations(df, keep_email_set=JOURNAL.get_unfinished_emails())
 
-        # Send invoice via email using selenium
-        send_invoice_via_email(driver=driver, registrer_dict=registrer_dict, invoice_path=invoice_path, index=index)
+    if df.empty:
+        print("No new registrations to invoice.")
+    else:
+        # Sanitize data
+        df_sanitized = sanitize_data(df)
 
-    # Shut down Selenium
-    shutdown_selenium(driver=driver)
+        if batch_convert:
+            process_registrations_in_batch(transport=transport, df_sanitized=df_sanitized)
+        elif jobs > 1:
+            process_registrations_in_parallel(transport=transport, df_sanitized=df_sanitized, num_processes=jobs)
+        else:
+            process_registrations(transport=transport, df_sanitized=df_sanitized)
+
+    # Render cache statistics (worker processes of the parallel mode keep their own)
+    if RENDER_CACHE is not None:
+        if jobs == 1:
+            print(f"Render cache: {RENDER_CACHE.num_hits} invoices reused, {RENDER_CACHE.num_misses} rendered.")
+        # Worker processes only know the entries they stored themselves, so the size limit is enforced once more
+        RENDER_CACHE.evict()
+
+    # Shut down LibreOffice instances
+    if CONVERSION_POOL is not None:
+        CONVERSION_POOL.shutdown()
+
+    # Write remaining entries to the invoice database and the invoice ledger
+    INVOICE_DATABASE.close()
+    LEDGER.close()
+    print(f"Run journal '{JOURNAL.path.name}': registrers per last completed stage: {JOURNAL.get_summary()}.")
+    JOURNAL.close()
+
+    # Close email transport (shuts down Selenium)
+    transport.close()
 
     print("✅ Finished! All invoices have been generated and sent!")
 
@@ -0,0 +1,76 @@
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from definition import (SPONSOR_DATABASE_CHECKPOINT_INTERVAL,
+                        SPONSOR_DATABASE_PATH)
+from invoice_store import REGISTRANT, InvoiceStore
+
+
+class InvoiceDatabaseWriter:
+    """Append-only writer for the sponsor database, backed by the SQLite invoice store.
+
+    Each new entry is committed to the invoice store right away, which is the
+    system of record. The Excel database is only a view regenerated from the
+    store at checkpoints (every `checkpoint_interval` entries) and when the
+    writer is closed, instead of being read and rewritten for every entry.
+    Entries committed by a crashed run are already in the store and are exported
+    when the next writer is created.
+
+    Usage:
+        writer = InvoiceDatabaseWriter()
+        writer.append(registrer_dict)
+        writer.close()
+
+    :param database_path: Path to the Excel database file.
+    :param store: Invoice store to write through (defaults to the store at `INVOICE_STORE_PATH`).
+    :param checkpoint_interval: Number of new entries after which the Excel database is rewritten (0 to only write it when closing).
+    """
+    def __init__(self, database_path: Path = SPONSOR_DATABASE_PATH, store: Optional[InvoiceStore] = None,
+                 checkpoint_interval: int = SPONSOR_DATABASE_CHECKPOINT_INTERVAL) -> None:
+        self.database_path = database_path
+        self.store = store or InvoiceStore()
+        self.checkpoint_interval = checkpoint_interval
+        self.num_pending = 0
+
+        # Migrate an existing Excel database into a new store
+        if self.store.count_invoices() == 0 and self.database_path.exists():
+            num_imported = self.store.import_excel(self.database_path)
+            print(f"\tImported {num_imported} entries of '{self.database_path.name}' into invoice store '{self.store.path.name}'.")
+
+        # Export entries committed by a previous run which crashed before its last checkpoint
+        if self.database_path.exists() and self.store.path.stat().st_mtime > self.database_path.stat().st_mtime:
+            print(f"\tRecovering invoice database entries from invoice store '{self.store.path.name}'...")
+            self.store.export_excel(self.database_path)
+
+    def append(self, registrer_dict: Dict[str, Any], kind: str = REGISTRANT, entry_id_list: Optional[Iterable[Any]] = None) -> None:
+        """Add a new entry to the database (written to the Excel file at the next checkpoint).
+
+        :param registrer_dict: A dictionary containing all invoice-related fields,
+            including customer information and products purchased.
+        :param kind: Kind of customer, either `SPONSOR` or `REGISTRANT` (see "invoice_store.py").
+        :param entry_id_list: Entry IDs of the registrations covered by the invoice, marked as processed.
+        :return: None.
+        """
+        self.store.add_invoice(registrer_dict=registrer_dict, kind=kind, entry_id_list=entry_id_list)
+        self.num_pending += 1
+        if self.checkpoint_interval and self.num_pending >= self.checkpoint_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Regenerate the Excel database from the invoice store if new entries were added.
+
+        :return: None.
+        """
+        if not self.num_pending:
+            return
+        self.store.export_excel(self.database_path)
+        print(f"\t\t\t> Invoice database checkpoint: {self.num_pending} new entries written to '{self.database_path.name}'.")
+        self.num_pending = 0
+
+    def close(self) -> None:
+        """Write the pending entries to the Excel database and close the invoice store.
+
+        :return: None.
+        """
+        self.flush()
+        self.store.close()
@@ -0,0 +1,366 @@
+from __future__ import annotations
+
+import ast
+import math
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from definition import INVOICE_STORE_PATH, SHEET_NAME
+from excel_lookup import get_column_values
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where needed, since loading pandas takes most of the startup time
+
+# Columns of the sponsor database
+COLUMN_LIST = ["Date", "Invoice Number", "Company", "Title", "First Name", "Last Name", "Address", "Postcode", "City", "Phone", "Email", "Default Product Dict", "Custom Product Dict", "Total Price [CHF]", "Comment"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sponsors (
+    sponsor_id INTEGER PRIMARY KEY,
+    company TEXT, title TEXT, first_name TEXT, last_name TEXT,
+    address TEXT, postcode TEXT, city TEXT, phone TEXT, email TEXT,
+    UNIQUE (company, email)
+);
+CREATE TABLE IF NOT EXISTS registrants (
+    registrant_id INTEGER PRIMARY KEY,
+    name TEXT, address TEXT, postcode TEXT, city TEXT, phone TEXT,
+    email TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_number TEXT PRIMARY KEY,
+    date TEXT, company TEXT, title TEXT, first_name TEXT, last_name TEXT,
+    address TEXT, postcode TEXT, city TEXT, phone TEXT, email TEXT,
+    default_product_dict TEXT, custom_product_dict TEXT,
+    total_price NUMERIC, comment TEXT,
+    sponsor_id INTEGER REFERENCES sponsors (sponsor_id),
+    registrant_id INTEGER REFERENCES registrants (registrant_id)
+);
+CREATE INDEX IF NOT EXISTS invoices_email_idx ON invoices (email);
+CREATE INDEX IF NOT EXISTS invoices_sponsor_idx ON invoices (sponsor_id);
+CREATE INDEX IF NOT EXISTS invoices_registrant_idx ON invoices (registrant_id);
+CREATE TABLE IF NOT EXISTS line_items (
+    invoice_number TEXT NOT NULL REFERENCES invoices (invoice_number),
+    position INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT, description TEXT, quantity INTEGER, unit_price NUMERIC, total_price NUMERIC,
+    PRIMARY KEY (invoice_number, kind, position)
+);
+CREATE TABLE IF NOT EXISTS processed_registrations (
+    entry_id TEXT PRIMARY KEY,
+    email TEXT,
+    invoice_number TEXT REFERENCES invoices (invoice_number)
+);
+CREATE INDEX IF NOT EXISTS processed_registrations_email_idx ON processed_registrations (email);
+CREATE TABLE IF NOT EXISTS invoice_number_sequence (
+    year INTEGER PRIMARY KEY,
+    next_number INTEGER NOT NULL
+);
+"""
+
+# Columns of the "invoices" table matching `COLUMN_LIST` (i.e., the columns of the Excel sponsor database)
+INVOICE_COLUMN_LIST = ["date", "invoice_number", "company", "title", "first_name", "last_name", "address", "postcode", "city", "phone", "email", "default_product_dict", "custom_product_dict", "total_price", "comment"]
+# Keys of the registrer dictionaries given to `InvoiceStore.add_invoice`, matching `COLUMN_LIST`
+REGISTRER_KEY_LIST = ["date", "invoice number", "company", "title", "first name", "last name", "address", "postcode", "city", "phone", "email", "default product", "custom product", "total price", "comment"]
+
+SPONSOR = "sponsor"
+REGISTRANT = "registrant"
+
+
+def write_database_excel(df: pd.DataFrame, database_path: Path) -> None:
+    """Write the whole sponsor database to an Excel file with an Excel table structure.
+
+    The workbook is first written next to the database and then moved over it, so
+    that a crash while writing never leaves a truncated database behind.
+
+    :param df: The DataFrame containing all database entries.
+    :param database_path: Path to the Excel database file.
+    :return: None.
+    """
+    import pandas as pd
+
+    tmp_path = database_path.with_name(f"~{database_path.name}")
+    with pd.ExcelWriter(tmp_path, engine="xlsxwriter") as writer:
+        # Write the data to the sheet
+        df.to_excel(writer, index=False, sheet_name=SHEET_NAME)
+        # Getting XlsxWriter worksheet object
+        worksheet = writer.sheets[SHEET_NAME]
+        # Getting the dimensions of the DataFrame
+        (max_row, max_col) = df.shape
+        # Creating a list of column headers, to use in "add_table()"
+        column_settings = [{"header": column} for column in df.columns]
+        # Adding the Excel table structure (Pandas will add the data)
+        worksheet.add_table(0, 0, max_row, max_col-1, {"columns": column_settings})
+    os.replace(tmp_path, database_path)
+
+
+def to_text(value: Any) -> Optional[str]:
+    """Convert a database field to text the way it shows up in the Excel sponsor database.
+
+    :param value: The field value (string, number, dictionary, list, NaN, etc.).
+    :return: The value as a string, or None for missing values.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def parse_line_items(products: Any, kind: str) -> List[Tuple[int, str, str, Optional[str], Optional[int], Optional[float], Optional[float]]]:
+    """Extract line items from the product field of an invoice.
+
+    Supported shapes:
+    - Sponsor invoices (`main.py`): {"0": {"name": ..., "quantity": ..., ["price": ...]}, ...}
+    - Sports invoices: [{sport: {"description": ..., "num teams": ..., "price": ...}}, ...]
+    - Their string representation, as stored in the Excel sponsor database.
+
+    :param products: The product field of the invoice.
+    :param kind: Kind of line items ("default" or "custom").
+    :return: A list of tuples (position, kind, name, description, quantity, unit price, total price).
+    """
+    if isinstance(products, str):
+        try:
+            products = ast.literal_eval(products) if products else None
+        except (ValueError, SyntaxError):
+            return []
+    line_item_list = []
+    if isinstance(products, dict):
+        for position, product in enumerate(products.values()):
+            quantity = int(product["quantity"])
+            unit_price = float(product["price"]) if product.get("price") not in (None, "") else None
+            total_price = quantity * unit_price if unit_price is not None else None
+            line_item_list.append((position, kind, product["name"], None, quantity, unit_price, total_price))
+    elif isinstance(products, list):
+        for position, product_dict in enumerate(products):
+            name, product = next(iter(product_dict.items()))
+            quantity = int(product["num teams"])
+            total_price = float(product["price"])
+            line_item_list.append((position, kind, name, product["description"], quantity, total_price / quantity, total_price))
+    return line_item_list
+
+
+class InvoiceStore:
+    """SQLite store used as system of record for invoices, sponsors, registrants and line items.
+
+    The Excel sponsor database is only a view of this store, regenerated on
+    demand with `export_excel`. Lookups such as the next invoice number or
+    whether an email address has already been invoiced are answered by indexed
+    queries instead of loading the whole workbook.
+
+    Invoice numbers are handed out by a per-year sequence (see
+    `reserve_invoice_numbers`), so that several processes sharing the store
+    never get the same number.
+
+    :param path: Path to the SQLite database file.
+    """
+    def __init__(self, path: Path = INVOICE_STORE_PATH) -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def add_invoice(self, registrer_dict: Dict[str, Any], kind: str = REGISTRANT, entry_id_list: Optional[Iterable[Any]] = None) -> None:
+        """Store a new invoice along with its sponsor or registrant and its line items.
+
+        :param registrer_dict: A dictionary containing all invoice-related fields, with the keys of
+            `REGISTRER_KEY_LIST` (see `book_invoice` in "generate_and_send_sport_invoices.py").
+        :param kind: Kind of customer, either `SPONSOR` (sponsoring invoices) or `REGISTRANT` (sports invoices).
+        :param entry_id_list: Entry IDs of the registrations covered by the invoice (sports invoices only),
+            recorded in the same transaction so that they are never invoiced again.
+        :return: None.
+        :raises ValueError: If a field is missing from `registrer_dict`.
+        """
+        missing_key_list = [key for key in REGISTRER_KEY_LIST if key not in registrer_dict]
+        if missing_key_list:
+            raise ValueError(f"Invoice fields missing: {', '.join(missing_key_list)}.")
+        field_dict = {column: to_text(registrer_dict[key]) for column, key in zip(INVOICE_COLUMN_LIST, REGISTRER_KEY_LIST)}
+        field_dict["total_price"] = registrer_dict["total price"]
+        value_list = list(field_dict.values())
+        with self.connection:
+            customer_id = self._upsert_customer(field_dict, kind)
+            self.connection.execute(
+                f"INSERT INTO invoices ({', '.join(INVOICE_COLUMN_LIST)}, sponsor_id, registrant_id) VALUES ({', '.join('?' * (len(INVOICE_COLUMN_LIST) + 2))})",
+                [*value_list, customer_id if kind == SPONSOR else None, customer_id if kind == REGISTRANT else None],
+            )
+            line_item_list = parse_line_items(registrer_dict["default product"], "default") + parse_line_items(registrer_dict["custom product"], "custom")
+            self.connection.executemany(
+                "INSERT INTO line_items (invoice_number, position, kind, name, description, quantity, unit_price, total_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(field_dict["invoice_number"], *line_item) for line_item in line_item_list],
+            )
+            if entry_id_list is not None:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO processed_registrations (entry_id, email, invoice_number) VALUES (?, ?, ?)",
+                    [(str(entry_id), field_dict["email"], field_dict["invoice_number"]) for entry_id in entry_id_list],
+                )
+            # Never hand out this invoice number again (e.g. numbers typed in by hand in "main.py")
+            invoice_number = field_dict["invoice_number"]
+            if invoice_number and invoice_number.isdigit() and len(invoice_number) > 4:
+                year = int(invoice_number[:4])
+                self.connection.execute(
+                    "INSERT INTO invoice_number_sequence (year, next_number) VALUES (?, ?) ON CONFLICT (year) DO UPDATE SET next_number = MAX(next_number, excluded.next_number)",
+                    (year, max(self._get_sequence_number(year), int(invoice_number) + 1)),
+                )
+
+    def _upsert_customer(self, field_dict: Dict[str, Any], kind: str) -> int:
+        """Insert or update the sponsor or registrant of an invoice.
+
+        :param field_dict: A dictionary mapping the invoice columns to their values.
+        :param kind: Kind of customer, either `SPONSOR` or `REGISTRANT`.
+        :return: The ID of the sponsor or registrant.
+        """
+        if kind == SPONSOR:
+            self.connection.execute(
+                """INSERT INTO sponsors (company, title, first_name, last_name, address, postcode, city, phone, email)
+                VALUES (:company, :title, :first_name, :last_name, :address, :postcode, :city, :phone, :email)
+                ON CONFLICT (company, email) DO UPDATE SET title = excluded.title, first_name = excluded.first_name, last_name = excluded.last_name,
+                address = excluded.address, postcode = excluded.postcode, city = excluded.city, phone = excluded.phone""", field_dict)
+            return self.connection.execute("SELECT sponsor_id FROM sponsors WHERE company IS :company AND email IS :email", field_dict).fetchone()[0]
+        self.connection.execute(
+            """INSERT INTO registrants (name, address, postcode, city, phone, email)
+            VALUES (:last_name, :address, :postcode, :city, :phone, :email)
+            ON CONFLICT (email) DO UPDATE SET name = excluded.name, address = excluded.address, postcode = excluded.postcode,
+            city = excluded.city, phone = excluded.phone""", field_dict)
+        return self.connection.execute("SELECT registrant_id FROM registrants WHERE email IS :email", field_dict).fetchone()[0]
+
+    def get_latest_invoice_number(self, year: Optional[int] = None) -> Optional[str]:
+        """Get the highest invoice number of the given year.
+
+        :param year: Year of the invoices (defaults to the current year).
+        :return: The latest invoice number as a string, or None if there is no invoice for this year.
+        """
+        year = year or datetime.now().year
+        # Range condition on the primary key (rather than "LIKE") so that the index is used
+        row = self.connection.execute("SELECT MAX(invoice_number) FROM invoices WHERE invoice_number >= ? AND invoice_number < ?", (str(year), str(year + 1))).fetchone()
+        return row[0]
+
+    def _get_sequence_number(self, year: int) -> int:
+        """Get the next free invoice number of the given year without reserving it.
+
+        The sequence of a year is seeded from the latest invoice of this year ("YYYY0000"
+        if there is none), so that numbering starts over every year.
+
+        :param year: Year of the invoices.
+        :return: The next free invoice number.
+        """
+        row = self.connection.execute("SELECT next_number FROM invoice_number_sequence WHERE year = ?", (year,)).fetchone()
+        if row is not None:
+            return row[0]
+        latest_invoice_number = self.get_latest_invoice_number(year)
+        if latest_invoice_number is None:
+            return int(f"{year}0000")
+        return int(latest_invoice_number) + 1
+
+    def get_next_invoice_number(self, year: Optional[int] = None) -> str:
+        """Get the next free invoice number of the given year, without reserving it.
+
+        :param year: Year of the invoices (defaults to the current year).
+        :return: The next invoice number as a string.
+        """
+        return str(self._get_sequence_number(year or datetime.now().year))
+
+    def reserve_invoice_numbers(self, num_invoices: int, year: Optional[int] = None) -> List[str]:
+        """Atomically reserve a block of consecutive invoice numbers.
+
+        The sequence is read and advanced within a single write transaction, so
+        that concurrent reservations (from other processes as well) never
+        overlap. Reserved numbers which end up unused are not handed out again.
+
+        :param num_invoices: Number of invoice numbers to reserve.
+        :param year: Year of the invoices (defaults to the current year).
+        :return invoice_number_list: A list of strings containing the reserved invoice numbers.
+        """
+        year = year or datetime.now().year
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            first_invoice_number = self._get_sequence_number(year)
+            self.connection.execute(
+                "INSERT INTO invoice_number_sequence (year, next_number) VALUES (?, ?) ON CONFLICT (year) DO UPDATE SET next_number = excluded.next_number",
+                (year, first_invoice_number + num_invoices),
+            )
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        invoice_number_list = [str(first_invoice_number + i) for i in range(num_invoices)]
+        return invoice_number_list
+
+    def has_invoice(self, invoice_number: str) -> bool:
+        """Check whether an invoice with the given number has already been stored.
+
+        :param invoice_number: The invoice number (e.g. "20250024").
+        :return: True if the invoice exists, False otherwise.
+        """
+        return self.connection.execute("SELECT 1 FROM invoices WHERE invoice_number = ?", (invoice_number,)).fetchone() is not None
+
+    def has_email_been_invoiced(self, email: str) -> bool:
+        """Check whether an invoice has already been issued for the given email address.
+
+        :param email: The email address of the sponsor or registrant.
+        :return: True if at least one invoice exists for this email address, False otherwise.
+        """
+        return self.connection.execute("SELECT 1 FROM invoices WHERE email = ? LIMIT 1", (email,)).fetchone() is not None
+
+    def get_processed_entry_ids(self) -> Set[str]:
+        """Get the Entry IDs of all registrations which have already been invoiced.
+
+        :return: A set of Entry IDs (as strings).
+        """
+        return {row[0] for row in self.connection.execute("SELECT entry_id FROM processed_registrations")}
+
+    def count_invoices(self) -> int:
+        """Get the number of stored invoices."""
+        return self.connection.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Get all invoices with the columns of the Excel sponsor database.
+
+        :return: A DataFrame with columns `COLUMN_LIST`, ordered by invoice number.
+        """
+        import pandas as pd
+
+        row_list = self.connection.execute(f"SELECT {', '.join(INVOICE_COLUMN_LIST)} FROM invoices ORDER BY invoice_number").fetchall()
+        return pd.DataFrame(row_list, columns=COLUMN_LIST)
+
+    def export_excel(self, database_path: Path) -> None:
+        """Regenerate the Excel sponsor database view from the store.
+
+        :param database_path: Path to the Excel database file.
+        :return: None.
+        """
+        write_database_excel(df=self.to_dataframe(), database_path=database_path)
+        print(f"\t\t\t> Invoice database exported to '{database_path.name}'.")
+
+    def import_excel(self, database_path: Path) -> int:
+        """Import the entries of an existing Excel sponsor database which are not yet in the store.
+
+        Entries with a company are imported as sponsoring invoices, the other ones as sports invoices.
+
+        :param database_path: Path to the Excel database file.
+        :return num_imported: Number of imported invoices.
+        """
+        if not database_path.exists():
+            return 0
+        # Only stream the invoice numbers first, the whole sheet is read only if some invoices are missing
+        stored_invoice_number_set = {row[0] for row in self.connection.execute("SELECT invoice_number FROM invoices")}
+        invoice_number_list = [str(int(value)) for value in get_column_values(database_path, SHEET_NAME, "Invoice Number") if value not in (None, "")]
+        if stored_invoice_number_set.issuperset(invoice_number_list):
+            return 0
+        import pandas as pd
+
+        existing_data_df = pd.read_excel(database_path, sheet_name=SHEET_NAME)
+        num_imported = 0
+        for entry in existing_data_df.reindex(columns=COLUMN_LIST).itertuples(index=False):
+            entry_dict = dict(zip(REGISTRER_KEY_LIST, entry))
+            entry_dict["invoice number"] = str(int(entry_dict["invoice number"]))
+            if self.has_invoice(entry_dict["invoice number"]):
+                continue
+            if pd.isna(entry_dict["total price"]):
+                entry_dict["total price"] = None
+            kind = SPONSOR if to_text(entry_dict["company"]) else REGISTRANT
+            self.add_invoice(entry_dict, kind=kind)
+            num_imported += 1
+        return num_imported
+
+    def close(self) -> None:
+        """Close the connection to the SQLite database."""
+        self.connection.close()
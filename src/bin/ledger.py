@@ -0,0 +1,118 @@
+import os
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+from definition import (NUM_INVOICE_PATH, NUM_INVOICE_SAVE_INTERVAL,
+                        NUM_INVOICE_SHEET_NAME)
+from excel_lookup import get_last_filled_row
+
+
+class InvoiceLedger:
+    """Writer for the invoice ledger "1_N° facture.xlsx".
+
+    The workbook is loaded once per run and the last filled row is searched
+    once in the loaded sheet, then kept as a pointer. New rows are written below it in memory and
+    the workbook is only saved every `save_interval` rows and when the ledger is
+    closed, instead of being loaded, scanned and saved for every invoice.
+
+    In dry-run mode, the workbook is neither loaded for writing nor saved: the
+    last filled row is found by streaming the key column, and the rows which
+    would have been written are printed instead (see `diff`).
+
+    Usage:
+        ledger = InvoiceLedger()
+        ledger.append([date, invoice_number, name, amount, "Mail"])
+        ledger.close()
+
+    :param path: Path to the ledger Excel file.
+    :param sheet_name: Name of the ledger sheet.
+    :param save_interval: Number of new rows after which the workbook is saved (0 to only save it when closing).
+    :param dry_run: Whether to only show the rows to write instead of saving the workbook.
+    :param on_save: Function called with the rows (without row number) each time they have been saved to the ledger.
+    """
+    def __init__(self, path: Path = NUM_INVOICE_PATH, sheet_name: str = NUM_INVOICE_SHEET_NAME,
+                 save_interval: int = NUM_INVOICE_SAVE_INTERVAL, dry_run: bool = False,
+                 on_save: Optional[Callable[[List[List[Any]]], None]] = None) -> None:
+        self.path = path
+        self.sheet_name = sheet_name
+        self.save_interval = save_interval
+        self.dry_run = dry_run
+        self.on_save = on_save
+        self.pending_row_list: List[List[Any]] = []
+        self._workbook = None
+        self._sheet = None
+        self._last_row: Optional[int] = None
+
+    def _load(self) -> None:
+        """Find the last filled row and load the workbook for writing (only done once).
+
+        :return: None.
+        """
+        if self.dry_run:
+            # Find last non-empty row based on a key column (streamed, the workbook is not fully loaded for this)
+            self._last_row = get_last_filled_row(self.path, self.sheet_name, column_index=1)
+            return
+
+        from openpyxl import load_workbook
+
+        self._workbook = load_workbook(self.path)
+        self._sheet = self._workbook[self.sheet_name]
+        # Find last non-empty row based on a key column in the loaded sheet (the file is not read a second time)
+        self._last_row = 1
+        for row, (value,) in enumerate(self._sheet.iter_rows(min_col=1, max_col=1, values_only=True), start=1):
+            if row > 1 and value not in (None, ""):
+                self._last_row = row
+
+    def append(self, row_value_list: List[Any]) -> int:
+        """Write a new row below the last filled row of the ledger.
+
+        :param row_value_list: Values of the new row (date, invoice number, name, amount, "Mail").
+        :return row: The number of the row written in the sheet.
+        """
+        if self._last_row is None:
+            self._load()
+        self._last_row += 1
+        if not self.dry_run:
+            for col_index, value in enumerate(row_value_list, start=1):
+                self._sheet.cell(row=self._last_row, column=col_index, value=value)
+        self.pending_row_list.append([self._last_row, *row_value_list])
+        if self.save_interval and len(self.pending_row_list) >= self.save_interval:
+            self.save()
+        return self._last_row
+
+    def diff(self) -> List[str]:
+        """Describe the rows written since the last save.
+
+        :return: One line per new row (e.g. "+ row 227: ['22/06/2025', '20250111', 'Doe (sports)', '40', 'Mail']").
+        """
+        return [f"+ row {row}: {row_value_list}" for row, *row_value_list in self.pending_row_list]
+
+    def save(self) -> None:
+        """Save the new rows to the ledger (or only print them in dry-run mode).
+
+        :return: None.
+        """
+        if not self.pending_row_list:
+            return
+        if self.dry_run:
+            print(f"\t\t\t> Invoice ledger dry run, '{self.path.name}' is left untouched. Rows which would be written:")
+            for line in self.diff():
+                print(f"\t\t\t\t{line}")
+        else:
+            # Save next to the ledger first so that a crash while saving never leaves a truncated workbook behind
+            tmp_path = self.path.with_name(f"~{self.path.name}")
+            self._workbook.save(tmp_path)
+            os.replace(tmp_path, self.path)
+            print(f"\t\t\t> Invoice ledger saved: {len(self.pending_row_list)} new rows written to '{self.path.name}'.")
+            if self.on_save is not None:
+                self.on_save([row_value_list for _, *row_value_list in self.pending_row_list])
+        self.pending_row_list = []
+
+    def close(self) -> None:
+        """Save the remaining new rows and release the workbook.
+
+        :return: None.
+        """
+        self.save()
+        if self._workbook is not None:
+            self._workbook.close()
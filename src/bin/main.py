@@ -17,21 +17,26 @@ import datetime as dt
 import json
 import math as m
 import os
+import queue
 import re
 import subprocess
+import threading
 import time
 import tkinter as tk
+from copy import deepcopy
 from datetime import datetime, timedelta
 from enum import Enum
 from functools import wraps
 from tkinter import (BOTH, LEFT, RIGHT, VERTICAL, Canvas, Frame, Y, filedialog,
                      messagebox, ttk)
 
-import docx
-import pandas as pd
-import requests
-from docx2pdf import convert
-from PIL import Image, ImageSequence, ImageTk
+from PIL import Image, ImageTk
+
+from catalog import Catalog
+from definition import INVOICE_STORE_PATH
+from invoice_store import SPONSOR, InvoiceStore
+from product_selection import CUSTOM, DEFAULT, ProductSelection
+from template_cache import TemplateCache
 
 # ++++++++++++++++
 DEBUG_MODE = True
@@ -132,6 +137,10 @@ class SponsorObject:
         return False  # everything is valid
 
 
+class InvoiceCancelled(Exception):
+    """Raised in the background thread when the invoice being generated has been cancelled."""
+
+
 class InvoiceAutomation:
     # Class-level constants
     PRODUCT_CATALOG_NAME = "product_catalog.json"  # source: "/Users/anthony/Dropbox/DocumentsPartagésMBPro↔MBAir/GironDuNord2025ÀConcise(GDNC)/Sponsoring/ContratSponsoring_v3.pdf"
@@ -144,6 +153,9 @@ class InvoiceAutomation:
     VERSION = "0.2.0"
     PAD = 5  # set a consistent padding for widgets
     SPINNING_IMAGE_SIZE = 70  # set spinning image size
+    PRODUCT_UPDATE_DELAY = 150  # [ms] quiet time after the last product change before the total price is updated
+    PROGRESS_POLL_INTERVAL = 16  # [ms] interval at which invoice progress events are read by the UI (~60 fps)
+    USE_PDF_RENDERER = False  # draw PDF invoices natively with reportlab instead of converting them with Microsoft Word (docx2pdf)
 
     def __init__(self):
         # Create the main application window
@@ -151,6 +163,30 @@ class InvoiceAutomation:
         self.root.title(f"GDNC Invoice Automation System {self.VERSION}")
         self.root.geometry("600x750")
 
+        # Invoice templates are parsed once and reused for every generated invoice
+        self.template_cache = TemplateCache(LIB_PATH / self.INVOICE_MODELS_FOLDER_NAME)
+
+        # PDF invoices are converted with Microsoft Word, unless native rendering with reportlab is enabled
+        self.pdf_renderer = None
+        if self.USE_PDF_RENDERER:
+            from pdf_renderer import REPORTLAB_AVAILABLE, InvoicePdfRenderer
+            if REPORTLAB_AVAILABLE:
+                self.pdf_renderer = InvoicePdfRenderer()
+            else:
+                print("⚠️ Package 'reportlab' is not installed (`pip install reportlab`). Falling back to Microsoft Word for DOCX to PDF conversion.")
+
+        # Sponsor database entries are written through the SQLite invoice store (an existing Excel database is imported once)
+        self.invoice_store = InvoiceStore(INVOICE_STORE_PATH)
+        if self.invoice_store.count_invoices() == 0 and (LIB_PATH / self.SPONSOR_DATABASE_NAME).exists():
+            self.invoice_store.import_excel(LIB_PATH / self.SPONSOR_DATABASE_NAME)
+
+        # Invoices are generated one after the other by a background thread, which reports its progress through a queue
+        # read by the UI (see `poll_progress`), so that the window stays responsive while an invoice is being converted
+        self.invoice_job_queue = queue.Queue()
+        self.progress_queue = queue.Queue()
+        self.pending_job_list = []  # invoices submitted and not finished yet (in submission order)
+        threading.Thread(target=self.run_invoice_worker, name="invoice-worker", daemon=True).start()
+
         # --- Set up scrollbar for full window
         # Main frame
         main_frame = Frame(self.root)
@@ -242,7 +278,9 @@ class InvoiceAutomation:
         self.invoice_frame.configure(labelwidget=ttk.Label(self.invoice_frame, text="Invoice", font=("TkDefaultFont", 15, "bold")))
 
         ttkwidgets_invoice = ["Number", "Date", "Deadline   "]
-        ttkwidgets_invoice_values = [get_latest_invoice_number(), get_tomorrow_formatted_date(), get_deadline_formatted_date()]
+        # The number shown is provisional: it is only reserved when the invoice is generated (unless another number is entered)
+        self.provisional_invoice_number = get_latest_invoice_number(self.invoice_store)
+        ttkwidgets_invoice_values = [self.provisional_invoice_number, get_tomorrow_formatted_date(), get_deadline_formatted_date()]
         for i, label in enumerate(ttkwidgets_invoice):
             ttk.Label(self.invoice_frame, text=label).grid(row=i, column=0, sticky="w", padx=self.PAD, pady=self.PAD)
             #ttk.Entry(self.invoice_frame).grid(row=i, column=1, sticky="ew", padx=self.PAD, pady=self.PAD)
@@ -251,6 +289,7 @@ class InvoiceAutomation:
             entry_widget.insert(0, ttkwidgets_invoice_values[i])
             # Dynamically create attributes like self.number, self.date, etc.
             setattr(self, label.lower().strip(), entry_widget)
+        ttk.Label(self.invoice_frame, text="(provisional)").grid(row=0, column=2, sticky="w", padx=self.PAD, pady=self.PAD)
         self.invoice_frame.columnconfigure(1, weight=1)
 
         # ----------------------------------------------------------------------
@@ -259,17 +298,18 @@ class InvoiceAutomation:
         self.products_frame.grid(row=3, column=0, padx=self.PAD, pady=self.PAD, sticky="ew")
         self.products_frame.configure(labelwidget=ttk.Label(self.products_frame, text="Products", font=("TkDefaultFont", 15, "bold")))
 
+        self.product_update_after_id = None  # pending product update (see `schedule_product_update`)
+
+        self.product_catalog = Catalog(LIB_PATH / self.PRODUCT_CATALOG_NAME)  # indexed by product name, reloaded when the file changes
+
         # Initialize lists to store selected default and custom product data (sub-dictionary names correspond to immutable "product creation order ID")
-        self.selected_default_product_dict = {}
-        self.selected_custom_product_dict = {}
+        # The dictionaries are only changed through `self.product_selection`, which keeps a running total price
+        self.product_selection = ProductSelection(self.product_catalog)
+        self.selected_default_product_dict = self.product_selection.default_product_dict
+        self.selected_custom_product_dict = self.product_selection.custom_product_dict
 
         # Default product row
 
-        with open (LIB_PATH / self.PRODUCT_CATALOG_NAME, "r") as file:
-            self.default_product_catalog_dict = json.load(file)
-        self.default_product_catalog_name_list = [item["name"] for item in self.default_product_catalog_dict.values()]
-        self.default_product_catalog_price_list = [item["price"] for item in self.default_product_catalog_dict.values()]
-
         self.frame_default = ttk.Frame(self.products_frame)
         self.frame_default.grid(row=1, column=0, sticky="ew", pady=self.PAD)
         self.frame_default.grid_remove()  # hide default product frame by default
@@ -289,8 +329,8 @@ class InvoiceAutomation:
         self.default_quantity_var.trace_add("write", self.update_selected_default_product_data)  # listen for changes
         self.default_quantity = ttk.Spinbox(self.frame_default, from_=1, to=10, width=2, textvariable=self.default_quantity_var, state="readonly")
         self.default_quantity.grid(row=0, column=1, padx=self.PAD)
-        self.default_product = ttk.Combobox(self.frame_default, values=self.default_product_catalog_name_list)
-        self.default_product.set(self.default_product_catalog_name_list[6])  # default product is by default product number "7" in "default_product_catalog_dict"
+        self.default_product = ttk.Combobox(self.frame_default, values=self.product_catalog.name_list, postcommand=lambda: self.refresh_product_names(self.default_product))
+        self.default_product.set(self.product_catalog.get_item(7)["name"])  # default product is by default product number "7" in the product catalog
         self.default_product.bind("<<ComboboxSelected>>", self.update_selected_default_product_data)  # # listen for changes, update the price dynamically when a user selects a product from the combobox
         self.default_product.grid(row=0, column=2, padx=self.PAD, sticky="ew")
         self.default_price = ttk.Entry(self.frame_default, width=10)
@@ -358,18 +398,20 @@ class InvoiceAutomation:
         # Static image
         self.static_img_path = ASSETS_PATH / self.GDNC_LOGO_NAME
         self.static_img = Image.open(self.static_img_path)
-        self.static_img = self.static_img.resize((self.SPINNING_IMAGE_SIZE, self.SPINNING_IMAGE_SIZE), Image.LANCZOS)
+        self.static_img = ImageTk.PhotoImage(self.static_img.resize((self.SPINNING_IMAGE_SIZE, self.SPINNING_IMAGE_SIZE), Image.LANCZOS))  # converted once, reused on every stop
         # Static image success
         self.static_img_success_path = ASSETS_PATH / self.GDNC_LOGO_CHECK_NAME
         self.static_img_success = Image.open(self.static_img_success_path)
-        self.static_img_success = self.static_img_success.resize((self.SPINNING_IMAGE_SIZE, self.SPINNING_IMAGE_SIZE), Image.LANCZOS)
+        self.static_img_success = ImageTk.PhotoImage(self.static_img_success.resize((self.SPINNING_IMAGE_SIZE, self.SPINNING_IMAGE_SIZE), Image.LANCZOS))
         self.success = False
         # GIF
         self.gif_path = ASSETS_PATH / self.GDNC_LOGO_SPINNING_WHEEL_NAME
         self.gif = Image.open(self.gif_path)
-        self.frames = [ImageTk.PhotoImage(frame) for frame in ImageSequence.Iterator(self.gif)]
-        self.frame_count = len(self.frames)
+        self.frame_count = getattr(self.gif, "n_frames", 1)
+        self.frames = [None] * self.frame_count  # frames ready to be displayed, prepared on their first display (see `get_gif_frame`)
+        self.frame_duration_list = [self.gif.info.get("duration", 100)] * self.frame_count  # [ms]
         self.current_frame = 0
+        self.gif_after_id = None  # pending animation tick (cancelled when spinning stops)
         # Label for displaying the static image or GIF
         self.gif_label = tk.Label(self.price_frame)
         self.gif_label.grid(row=0, column=2, sticky="ew", padx=self.PAD*12, pady=self.PAD)
@@ -392,10 +434,15 @@ class InvoiceAutomation:
         self.create_invoice_button = ttk.Button(second_frame, text="Create invoice", command=self.create_invoice)
         self.create_invoice_button.grid(row=5, column=0, padx=self.PAD, pady=self.PAD, sticky="ew")
 
+        # ▷ Cancel button (cancels the invoices being generated)
+        self.cancel_invoice_button = ttk.Button(second_frame, text="Cancel", command=self.cancel_invoices, state="disabled")
+        self.cancel_invoice_button.grid(row=6, column=0, padx=self.PAD, pady=self.PAD, sticky="ew")
+
         # --- Create window around the target frame "second_frame" to finish setting up the scrollbar
         my_canvas.create_window((0, 0), window=second_frame, anchor="nw")
         # ---
 
+        self.root.after(self.PROGRESS_POLL_INTERVAL, self.poll_progress)
         self.root.mainloop()
     
 
@@ -411,23 +458,22 @@ class InvoiceAutomation:
                     default_product = widget.get()
                 if isinstance(widget, ttk.Button):
                     # Store reference of the products
-                    self.selected_default_product_dict[f"{row_count}"] = {
+                    self.product_selection.set_product(DEFAULT, f"{row_count}", {
                         "name": default_product,
                         "quantity": default_quantity
-                    }
+                    })
                     # Update row_count to begin gathering data from the next product row
                     row_count = row_count+1
         else:
             self.frame_default.grid_remove()
-            self.selected_default_product_dict.clear()  # completely empty dictionary of selected default products
-        self.print_selected_product_summary()
-        # Update total price
-        self.update_total_price()
+            self.product_selection.clear(DEFAULT)  # completely empty dictionary of selected default products
+        # Log selected products and update total price (once per burst of changes)
+        self.schedule_product_update()
 
 
     def update_selected_default_product_data(self, event, *args):
         selected_product = self.default_product.get()  # get selected product name
-        if selected_product in self.default_product_catalog_name_list:
+        if selected_product in self.product_catalog:
             # Update displayed price
             selected_price = self.get_product_price(selected_product)
             self.default_price.config(state="normal")  # enable editing
@@ -435,13 +481,12 @@ class InvoiceAutomation:
             self.default_price.insert(0, f"{selected_price} CHF")  # insert updated price
             self.default_price.config(state="readonly")  # disable editing again
             # Update dictionary of selected default products
-            self.selected_default_product_dict["0"] = {  # update reference of the first product
+            self.product_selection.set_product(DEFAULT, "0", {  # update reference of the first product
                 "name": selected_product,
                 "quantity": self.default_quantity_var.get(),
-            }
-            self.print_selected_product_summary()
-            # Update total price
-            self.update_total_price()
+            })
+            # Log selected products and update total price (once per burst of changes)
+            self.schedule_product_update()
         else:
             messagebox.showerror(title="Error", message="Non-existing default product selected!")
             return
@@ -452,7 +497,7 @@ class InvoiceAutomation:
         
         def update_new_selected_default_product_data(event, *args):
             selected_product = new_product.get()  # get selected product name
-            if selected_product in self.default_product_catalog_name_list:
+            if selected_product in self.product_catalog:
                 # Update displayed price
                 selected_price = self.get_product_price(selected_product)
                 new_price.config(state="normal")  # enable editing
@@ -460,13 +505,12 @@ class InvoiceAutomation:
                 new_price.insert(0, f"{selected_price} CHF")  # insert updated price
                 new_price.config(state="readonly")  # disable editing again
                 # Update dictionary of selected default products (i.e., update reference of the "row"-th product)
-                self.selected_default_product_dict[f"{row}"] = {
+                self.product_selection.set_product(DEFAULT, f"{row}", {
                     "name": selected_product,
                     "quantity": new_quantity_var.get(),
-                }
-                self.print_selected_product_summary()
-                # Update total price
-                self.update_total_price()
+                })
+                # Log selected products and update total price (once per burst of changes)
+                self.schedule_product_update()
             else:
                 messagebox.showerror(title="Error", message="Non-existing default product selected!")
                 return
@@ -476,10 +520,9 @@ class InvoiceAutomation:
             new_product.destroy()
             new_price.destroy()
             remove_button.destroy()
-            self.selected_default_product_dict.pop(f"{row}")
-            self.print_selected_product_summary()
-            # Update total price
-            self.update_total_price()
+            self.product_selection.remove_product(DEFAULT, f"{row}")
+            # Log selected products and update total price (once per burst of changes)
+            self.schedule_product_update()
 
         # The "row" (i.e., current "product ID" in selected_default_product_dict)
         # is determined based on the number of already stored products
@@ -492,8 +535,8 @@ class InvoiceAutomation:
         new_quantity.grid(row=row, column=1, padx=self.PAD)
 
         # Product Name
-        new_product = ttk.Combobox(self.frame_default, values=self.default_product_catalog_name_list)
-        new_product.set(self.default_product_catalog_name_list[6])  # default product is by default product number "7" in "default_product_catalog_dict"
+        new_product = ttk.Combobox(self.frame_default, values=self.product_catalog.name_list, postcommand=lambda: self.refresh_product_names(new_product))
+        new_product.set(self.product_catalog.get_item(7)["name"])  # default product is by default product number "7" in the product catalog
         new_product.bind("<<ComboboxSelected>>", update_new_selected_default_product_data)  # update the price dynamically when a user selects a product from the combobox
         new_product.grid(row=row, column=2, padx=self.PAD, sticky="ew")
         
@@ -509,15 +552,13 @@ class InvoiceAutomation:
         remove_button.grid(row=row, column=4, padx=self.PAD)
 
         # Update selected_default_product_dict
-        self.selected_default_product_dict[f"{row}"] = {
+        self.product_selection.set_product(DEFAULT, f"{row}", {
             "name": new_product.get(),
             "quantity": new_quantity.get(),
-        }
-
-        self.print_selected_product_summary()
+        })
 
-        # Update total price
-        self.update_total_price()
+        # Log selected products and update total price (once per burst of changes)
+        self.schedule_product_update()
 
 
     def toggle_custom_products(self):
@@ -537,37 +578,37 @@ class InvoiceAutomation:
                     custom_price = widget.get()
                 if isinstance(widget, ttk.Button):
                     # Store reference of the products
-                    self.selected_custom_product_dict[f"{row_count}"] = {
+                    self.product_selection.set_product(CUSTOM, f"{row_count}", {
                         "name": custom_product,
                         "quantity": custom_quantity,
                         "price": custom_price
-                    }
+                    })
                     # Update row_count to begin gathering data from the next product row
                     row_count = row_count+1
         else:
             self.frame_custom.grid_remove()
-            self.selected_custom_product_dict.clear()  # completely empty dictionary of selected custom products
-        self.print_selected_product_summary()
-        # Update total price
-        self.update_total_price()
+            self.product_selection.clear(CUSTOM)  # completely empty dictionary of selected custom products
+        # Log selected products and update total price (once per burst of changes)
+        self.schedule_product_update()
         
 
     def update_selected_custom_product_data(self, event, *args):
         # Prevent user from entering non-numeric characters
-        self.custom_price_var.set("".join(filter(str.isdigit, self.custom_price_var.get())))
+        custom_price_digits = "".join(filter(str.isdigit, self.custom_price_var.get()))
+        if custom_price_digits != self.custom_price_var.get():
+            self.custom_price_var.set(custom_price_digits)  # triggers this callback again
         custom_price_selected = self.custom_price_var.get()
         # Handle empty price field
         if self.custom_price_var.get() == "":
             custom_price_selected = "0"    
         # Update dictionary of selected custom products
-        self.selected_custom_product_dict["0"] = {
+        self.product_selection.set_product(CUSTOM, "0", {
             "name": self.custom_product_var.get(),
             "quantity": self.custom_quantity_var.get(),
             "price": custom_price_selected
-        }
-        self.print_selected_product_summary()
-        # Update total price
-        self.update_total_price()
+        })
+        # Log selected products and update total price (once per burst of changes)
+        self.schedule_product_update()
         
 
     def add_custom_product_row(self):
@@ -575,20 +616,21 @@ class InvoiceAutomation:
 
         def update_new_selected_custom_product_data(event=None, *args):
             # Prevent user from entering non-numeric characters
-            new_custom_price_var.set("".join(filter(str.isdigit, new_custom_price_var.get())))
+            new_custom_price_digits = "".join(filter(str.isdigit, new_custom_price_var.get()))
+            if new_custom_price_digits != new_custom_price_var.get():
+                new_custom_price_var.set(new_custom_price_digits)  # triggers this callback again
             new_custom_price_selected = new_custom_price_var.get()
             # Handle empty price field
             if new_custom_price_var.get() == "":
                 new_custom_price_selected = "0"    
             # Update dictionary of selected custom products
-            self.selected_custom_product_dict[f"{row}"] = {
+            self.product_selection.set_product(CUSTOM, f"{row}", {
                 "name": new_custom_product_var.get(),
                 "quantity": new_custom_quantity_var.get(),
                 "price": new_custom_price_selected
-            }
-            self.print_selected_product_summary()
-            # Update total price
-            self.update_total_price()
+            })
+            # Log selected products and update total price (once per burst of changes)
+            self.schedule_product_update()
 
         def remove_custom_product_row():
             new_custom_quantity.destroy()
@@ -596,9 +638,9 @@ class InvoiceAutomation:
             new_custom_price.destroy()
             new_custom_currency_label.destroy()
             remove_button.destroy()
-            self.selected_custom_product_dict.pop(f"{row}")
-            # Update total price
-            self.update_total_price()
+            self.product_selection.remove_product(CUSTOM, f"{row}")
+            # Update total price (once per burst of changes)
+            self.schedule_product_update()
         
         # The "row" (i.e., current "product ID" in selected_custom_product_dict)
         # is determined based on the number of already stored products
@@ -631,88 +673,72 @@ class InvoiceAutomation:
         remove_button.grid(row=row, column=5, padx=self.PAD)
 
         # Update selected_custom_product_dict
-        self.selected_custom_product_dict[f"{row}"] = {
+        self.product_selection.set_product(CUSTOM, f"{row}", {
             "name": new_custom_product.get(),
             "quantity": new_custom_quantity.get(),
             "price": new_custom_price.get(),
-        }
+        })
 
-        self.print_selected_product_summary()
+        # Log selected products and update total price (once per burst of changes)
+        self.schedule_product_update()
 
-        # Update total price
-        self.update_total_price()
 
+    def refresh_product_names(self, combobox: ttk.Combobox):
+        """Update the product names of a combobox from the product catalog (reloaded when its file changes) when its list is opened."""
+        combobox.configure(values=self.product_catalog.name_list)
 
-    def get_product_price(self, selected_product: str):
-        price = self.default_product_catalog_price_list[
-                self.default_product_catalog_name_list.index(selected_product)
-            ]
-        return price
-
-
-    def compute_total_price(self):
-        """Compute total price of selected products."""
-        total_price_default_products = 0
-        for product in self.selected_default_product_dict.values():
-            product_quantity = int(product["quantity"])
-            product_price = self.get_product_price(product["name"])
-            total_price_default_products = total_price_default_products + product_quantity * product_price
-        
-        total_price_custom_products = 0
-        for product in self.selected_custom_product_dict.values():
-            product_quantity = int(product["quantity"])
-            product_price = int(product["price"])
-            total_price_custom_products = total_price_custom_products + product_quantity * product_price
-        
-        total_price = total_price_default_products + total_price_custom_products
 
-        return total_price
+    def get_product_price(self, selected_product: str):
+        return self.product_catalog.get_price(selected_product)
 
 
     def update_total_price(self) -> None:
-        self.total_price = self.compute_total_price()
+        self.total_price = self.product_selection.total_price  # running total, no recomputation needed
         self.price_entry.config(state="normal")  # enable editing
         self.price_entry.delete(0, tk.END)
         self.price_entry.insert(0, f"{self.total_price} CHF")
         self.price_entry.config(state="readonly")
 
 
+    def schedule_product_update(self) -> None:
+        """Log the selected products and update the total price once the product editor has been left untouched for `PRODUCT_UPDATE_DELAY`.
+
+        Every keystroke in a product field fires a trace callback, so the
+        changes are coalesced: each call postpones the pending update, which
+        then runs once for the whole burst of changes (e.g. a typed price).
+        """
+        if self.product_update_after_id is not None:
+            self.root.after_cancel(self.product_update_after_id)
+        self.product_update_after_id = self.root.after(self.PRODUCT_UPDATE_DELAY, self.flush_product_update)
+
+
+    def flush_product_update(self) -> None:
+        """Run the pending product update now (see `schedule_product_update`)."""
+        if self.product_update_after_id is not None:
+            self.root.after_cancel(self.product_update_after_id)
+            self.product_update_after_id = None
+        self.print_selected_product_summary()
+        self.update_total_price()
+
+
     def print_selected_product_summary(self) -> None:
         """Retrieves selected product and print data."""
         print("\n---\nSelected default products:\n", json.dumps(self.selected_default_product_dict, indent=4, ensure_ascii=False))
         print("Selected custom products:\n", json.dumps(self.selected_custom_product_dict, indent=4, ensure_ascii=False))
 
 
-    @staticmethod
-    def replace_text(paragraph, old_text, new_text):
-        """Replaces old_text with new_text in the given paragraph while keeping the original font and bold style.
-        """
-        if old_text in paragraph.text:
-            bold_text_list = ["[TOTAL]", "[COMPANY]"]
-            bold = False
-            # Capture the fact that text has to be bold for the "TOTAL" text
-            if any(keyword in paragraph.text for keyword in bold_text_list):
-                bold = True
-            # Replace the text
-            paragraph.text = paragraph.text.replace(old_text, new_text)
-            # Apply font style
-            paragraph.style.font.name = "Times New Roman"
-            # Apply bold
-            if bold:
-                paragraph.style.font.bold = True
-            else:
-                paragraph.style.font.bold = False
-                for run in paragraph.runs:
-                    run.bold = False
-            if DEBUG_MODE:
-                print(f"---\nparagraph.text: {paragraph.text}")
-                print(f"paragraph.style.font.bold: {paragraph.style.font.bold}")
+    def get_gif_frame(self, frame_index: int) -> ImageTk.PhotoImage:
+        """Get a frame of the spinning wheel GIF ready to be displayed.
 
+        Each frame is decoded, resized and composited only once, on its first
+        display, so that the later animation ticks only swap the label image.
 
-    def animate_gif(self):
-        """Animate a transparent GIF properly"""
-        if self.start_spinning:
-            frame = self.gif.seek(self.current_frame)  # move to next frame
+        :param frame_index: Index of the frame in the GIF.
+        :return frame: The frame as a Tkinter-compatible image.
+        """
+        if self.frames[frame_index] is None:
+            self.gif.seek(frame_index)  # move to the frame (frames are first displayed in order, so GIF decoding stays sequential)
+            self.frame_duration_list[frame_index] = self.gif.info.get("duration", self.frame_duration_list[frame_index])
 
             # Convert to RGBA to handle transparency
             frame = self.gif.convert("RGBA")
@@ -724,16 +750,24 @@ class InvoiceAutomation:
             # Create a transparent-friendly background
             background = Image.new("RGBA", frame.size, (255, 255, 255, 0))  # white background
             frame = Image.alpha_composite(background, frame)  # blend the GIF frame
-            
+
             # Convert to a Tkinter-compatible format
-            self.frames[self.current_frame] = ImageTk.PhotoImage(frame)
-            self.gif_label.config(image=self.frames[self.current_frame])
+            self.frames[frame_index] = ImageTk.PhotoImage(frame)
+        return self.frames[frame_index]
+
+
+    def animate_gif(self):
+        """Animate a transparent GIF properly"""
+        self.gif_after_id = None
+        if self.start_spinning:
+            self.gif_label.config(image=self.get_gif_frame(self.current_frame))
+            duration = self.frame_duration_list[self.current_frame]
 
             # Cycle through frames
             self.current_frame = (self.current_frame + 1) % self.frame_count
 
             # Call again to continue animation
-            self.root.after(self.gif.info['duration'], self.animate_gif)
+            self.gif_after_id = self.root.after(duration, self.animate_gif)
         else:
             self.show_static_image()
 
@@ -741,19 +775,19 @@ class InvoiceAutomation:
     def show_static_image(self):
         """Switch to a static image when animation stops"""
         if self.success:
-            static_img_success = ImageTk.PhotoImage(self.static_img_success)
-            self.gif_label.config(image=static_img_success)
-            self.gif_label.image = static_img_success  # keep reference to prevent garbage collection
+            self.gif_label.config(image=self.static_img_success)
         else:
-            static_img = ImageTk.PhotoImage(self.static_img)
-            self.gif_label.config(image=static_img)
-            self.gif_label.image = static_img  # keep reference to prevent garbage collection
+            self.gif_label.config(image=self.static_img)
             self.success = False  # reset success variable
 
 
     def toggle_spinning(self):
         """Toggle spinning based on self.start_spinning"""
         self.start_spinning = not self.start_spinning
+        if self.gif_after_id is not None:
+            # Cancel the pending tick so that toggling twice never runs two animation loops
+            self.root.after_cancel(self.gif_after_id)
+            self.gif_after_id = None
         if self.start_spinning:
             self.animate_gif()  # start animation
         else:
@@ -761,11 +795,12 @@ class InvoiceAutomation:
 
 
     def create_invoice(self):
-        """Create invoice in PDF format.
-        TODO: Update docstring here!
+        """Check the entered sponsor data and hand over the invoice to the background thread, which creates it in PDF format (see `generate_invoice`).
         """
 
-        self.print_selected_product_summary()
+        # Apply product changes still waiting to be coalesced, and make sure that the invoiced total matches the selected products
+        self.product_selection.check_total()
+        self.flush_product_update()
         
         # Check that we have at least 1 and maximum 5 products (default + custom) selected
         num_selected_default_products = len(self.selected_default_product_dict)
@@ -799,8 +834,8 @@ class InvoiceAutomation:
                 deadline=self.deadline.get(),
             ),
             products=SponsorObject.Products(
-                default=self.selected_default_product_dict,
-                custom=self.selected_custom_product_dict,
+                default=deepcopy(self.selected_default_product_dict),  # copied since the form can be edited while the invoice is generated
+                custom=deepcopy(self.selected_custom_product_dict),
             )
         )
 
@@ -810,23 +845,14 @@ class InvoiceAutomation:
             print("⚠️ SponsorObject contains missing values. Please update them.")
             return  # stops further execution
 
-        # Toggle spinning animation indicating that app is running
-        self.toggle_spinning()
-        
-        # Update status label
-        status_text = "Process launched! 🚀\n(👀 See terminal for outputs)"
-        self.status_label.config(text=status_text)
-        self.root.update()
-
-        # Generate DOCX document
-
-        # Update status label
-        status_text = status_text + "\n> Generate DOCX invoice..."
-        self.status_label.config(text=status_text)
-        self.root.update()
+        # The provisional number is replaced by a reserved one when the invoice is generated, while a number entered by
+        # hand is used as is, so the same number cannot be submitted twice
+        reserve_invoice_number = sponsor.invoice.number == self.provisional_invoice_number
+        if not reserve_invoice_number and any(job_dict["sponsor"].invoice.number == sponsor.invoice.number for job_dict in self.pending_job_list):
+            messagebox.showerror(title="Error", message=f"Invoice {sponsor.invoice.number} is already being generated. Please use another invoice number.")
+            return
 
-        template_path = LIB_PATH / self.INVOICE_MODELS_FOLDER_NAME / f"InvoiceModel_CH95_DefaultProducts_{num_total_products}.docx"
-        doc = docx.Document(template_path)
+        template_name = f"InvoiceModel_CH95_DefaultProducts_{num_total_products}.docx"
 
         product_key = "[PRODUCT-DESCRIPTION-IDX]"
         quantity_key = "[QT-IDX]"
@@ -880,71 +906,134 @@ class InvoiceAutomation:
             custom_product_replacements[tot_key_idx] = str("{:.2f}".format(int(quantity)*float(price)))
 
         replacements.update(custom_product_replacements)
-        
-        # Make replacements in the paragraphs of the DOCX document (i.e., info and invoice data)
-        for paragraph in list(doc.paragraphs):
-            for old_text, new_text in replacements.items():
-                self.replace_text(paragraph=paragraph,
-                                  old_text=old_text, new_text=new_text)
-
-        # Make replacements in the tables of the DOCX document (i.e., product data)
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        for old_text, new_text in replacements.items():
-                            self.replace_text(
-                                paragraph=paragraph, old_text=old_text, new_text=new_text)
-                        # Make sure product number "01", "02", etc. (under the column "NO" in the invoice template) are not bold
-                        if re.fullmatch(r"0[1-5]", paragraph.text):
-                            paragraph.style.font.bold = False
-                            for run in paragraph.runs:
-                                run.bold = False
+
+        # Hand over the invoice to the background thread (the form can be filled in for the next sponsor meanwhile)
+        job_dict = {
+            "sponsor": sponsor,
+            "template_name": template_name,
+            "replacements": replacements,
+            "total_price": self.total_price,
+            "reserve_invoice_number": reserve_invoice_number,
+            "status_text": "Process launched! 🚀\n(👀 See terminal for outputs)",
+            "cancel_event": threading.Event(),
+        }
+        self.pending_job_list.append(job_dict)
+        if len(self.pending_job_list) == 1:
+            # Toggle spinning animation indicating that app is running
+            self.success = False
+            self.toggle_spinning()
+        self.cancel_invoice_button.config(state="normal")
+        self.show_progress(job_dict)
+        self.invoice_job_queue.put(job_dict)
+
+
+    def run_invoice_worker(self):
+        """Generate the submitted invoices one after the other (runs in the background thread).
+
+        The worker uses its own connection to the invoice store, since SQLite
+        connections cannot be shared between threads.
+        """
+        invoice_store = InvoiceStore(INVOICE_STORE_PATH)
+        while True:
+            job_dict = self.invoice_job_queue.get()
+            try:
+                self.generate_invoice(job_dict=job_dict, invoice_store=invoice_store)
+                self.progress_queue.put(("done", job_dict, "\nProcess finished! ✅"))
+            except InvoiceCancelled:
+                # Remove the files of the invoice, which has not been stored
+                for output_path in job_dict.get("output_path_list", []):
+                    Path(output_path).unlink(missing_ok=True)
+                self.progress_queue.put(("cancelled", job_dict, "\nProcess cancelled! ⛔"))
+            except Exception as e:
+                print(f"⚠️ Invoice {job_dict['sponsor'].invoice.number} could not be created: {e}")
+                job_dict["error"] = str(e)
+                self.progress_queue.put(("error", job_dict, "\nProcess failed! ❌"))
+
+
+    def report_progress(self, job_dict: dict, text: str) -> None:
+        """Send a progress message of an invoice to the UI (called from the background thread between stages).
+
+        Since it is called before every stage, it is also where a cancelled invoice stops.
+
+        :param job_dict: The invoice job (see `create_invoice`).
+        :param text: The line to add to the status label.
+        :raises InvoiceCancelled: If the invoice has been cancelled.
+        """
+        if job_dict["cancel_event"].is_set():
+            raise InvoiceCancelled()
+        self.progress_queue.put(("status", job_dict, text))
+
+
+    def generate_invoice(self, job_dict: dict, invoice_store: InvoiceStore) -> None:
+        """Generate the DOCX and PDF invoices of a sponsor, compose the email to send and store the invoice (runs in the background thread).
+
+        :param job_dict: The invoice job (see `create_invoice`).
+        :param invoice_store: The invoice store connection of the background thread.
+        :raises InvoiceCancelled: If the invoice has been cancelled before being stored.
+        :raises ValueError: If the invoice number entered by hand has already been used.
+        """
+        sponsor = job_dict["sponsor"]
+        template_name = job_dict["template_name"]
+        replacements = job_dict["replacements"]
+        total_price = job_dict["total_price"]
+
+        # Reserve the invoice number in the sequence shared with the sports invoices script (see `utils.reserve_invoice_numbers`)
+        if job_dict["reserve_invoice_number"]:
+            sponsor.invoice.number = invoice_store.reserve_invoice_numbers(1)[0]
+            replacements["[INVOICE-NUMBER]"] = sponsor.invoice.number
+            self.report_progress(job_dict, f"\n> Invoice number {sponsor.invoice.number} reserved")
+        elif invoice_store.has_invoice(sponsor.invoice.number):
+            raise ValueError(f"Invoice number {sponsor.invoice.number} has already been used. Please use another invoice number.")
+
+        # Generate DOCX document
+
+        # Update status label
+        self.report_progress(job_dict, "\n> Generate DOCX invoice...")
+
+        # Make replacements in a copy of the cached template (only the indexed placeholder runs are rewritten)
+        doc = self.template_cache.render(template_name=template_name, replacements=replacements)
 
         output_docx_path = f"invoice_populated/Facture N° {sponsor.invoice.number}.docx"
         doc.save(output_docx_path)
+        job_dict["output_path_list"] = [output_docx_path]
         
         # Convert DOCX to PDF
 
         #output_pdf_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF documents", "*.pdf")])
         output_pdf_path = output_docx_path.replace(".docx", ".pdf")
+        job_dict["output_path_list"].append(output_pdf_path)
 
-        # Notes:
-        # - For converting DOCX to PDF, Microsoft Word has to be installed and already opened! In addition, access to the folder in which the generated invoice will be saved has first to be granted to Microsoft Word via the Microsoft pop up message!
-        # - An internet connection is required to convert DOCX to PDF
+        if self.pdf_renderer is not None:
+            self.report_progress(job_dict, "\n> Render PDF...")
+
+            self.pdf_renderer.render(doc=doc, pdf_path=output_pdf_path)
+        else:
+            # Notes:
+            # - For converting DOCX to PDF, Microsoft Word has to be installed and already opened! In addition, access to the folder in which the generated invoice will be saved has first to be granted to Microsoft Word via the Microsoft pop up message!
+            # - An internet connection is required to convert DOCX to PDF
         
-        # Open up Microsoft Word to save time for future invoice generations
-        status_text = status_text + "\n> Open up Microsoft Word..."
-        self.status_label.config(text=status_text)
-        self.root.update()
+            # Open up Microsoft Word to save time for future invoice generations
+            self.report_progress(job_dict, "\n> Open up Microsoft Word...")
 
-        # TODO: Programmatically open Microsoft Word if not yet opened!
+            # TODO: Programmatically open Microsoft Word if not yet opened!
 
-        # Update status label
-        status_text = status_text + "\n> Check internet connection..."
-        self.status_label.config(text=status_text)
-        self.root.update()
+            self.report_progress(job_dict, "\n> Check internet connection...")
 
-        # Check internet connection
-        if check_internet():
-            print("Internet is available!")
-        else:
-            messagebox.showerror(title="Error", message=f"No internet connection. The DOCX invoice could be generated but not converted into PDF. Invoice generation will stop here.")
-            return
+            # Check internet connection
+            if check_internet():
+                print("Internet is available!")
+            else:
+                raise ConnectionError("No internet connection. The DOCX invoice could be generated but not converted into PDF. Invoice generation will stop here.")
 
-        # Update status label
-        status_text = status_text + "\n> Convert DOCX to PDF..."
-        self.status_label.config(text=status_text)
-        self.root.update()
+            self.report_progress(job_dict, "\n> Convert DOCX to PDF...")
         
-        convert(input_path=output_docx_path, output_path=output_pdf_path)
+            # docx2pdf drives Microsoft Word and is slow to import, so it is only loaded on this fallback path
+            from docx2pdf import convert
+            convert(input_path=output_docx_path, output_path=output_pdf_path)
 
         # Compose email to send
 
-        # Update status label
-        status_text = status_text + "\n> Compose email to send..."
-        self.status_label.config(text=status_text)
-        self.root.update()
+        self.report_progress(job_dict, "\n> Compose email to send...")
 
         # Sponsor email address
         print(f"\n▷ Sponsor email address:\n---\n{sponsor.contact.email}\n---")
@@ -995,61 +1084,103 @@ class InvoiceAutomation:
 
         # Sponsor data backup and database update
 
-        # Update status label
-        status_text = status_text + "\n> Update sponsor database..."
-        self.status_label.config(text=status_text)
-        self.root.update()
+        self.report_progress(job_dict, "\n> Update sponsor database...")
 
         # Generate new line to manually copy-paste in file "1_N° facture.xlsx"
 
         today = datetime.today().strftime("%d.%m.%Y")
-        numero_facture_entry = f"{today}\t{sponsor.invoice.number}\t{sponsor.info.company}\t{self.total_price:.2f} CHF\tMail"
+        numero_facture_entry = f"{today}\t{sponsor.invoice.number}\t{sponsor.info.company}\t{total_price:.2f} CHF\tMail"
         print(f"\n▷ Generated line for file '1_N° facture.xlsx':\n---\n{numero_facture_entry}\n---")
 
         # Sponsor database
 
         # TODO: Convert address into geographic coordinates and add such a column "Geographic Coordinates"
 
-        # Format sponsor DataFrame
-        column_list = ["Date", "Invoice Number", "Company", "Title", "First Name", "Last Name", "Address", "Postcode", "City", "Phone", "Email", "Default Product Dict", "Custom Product Dict", "Total Price [CHF]"]
-        sponsor_entry_list = [today, sponsor.invoice.number, sponsor.info.company, sponsor.info.title, sponsor.info.first_name, sponsor.info.last_name, sponsor.info.address, sponsor.info.postcode, sponsor.info.city, sponsor.contact.phone, sponsor.contact.email, sponsor.products.default, sponsor.products.custom, self.total_price]
-        sponsor_entry_df = pd.DataFrame([sponsor_entry_list], columns=column_list)
+        # Format sponsor entry (in the column order of the sponsor database)
+        sponsor_entry_dict = {
+            "date": today,
+            "invoice number": sponsor.invoice.number,
+            "company": sponsor.info.company,
+            "title": sponsor.info.title,
+            "first name": sponsor.info.first_name,
+            "last name": sponsor.info.last_name,
+            "address": sponsor.info.address,
+            "postcode": sponsor.info.postcode,
+            "city": sponsor.info.city,
+            "phone": sponsor.contact.phone,
+            "email": sponsor.contact.email,
+            "default product": sponsor.products.default,
+            "custom product": sponsor.products.custom,
+            "total price": total_price,
+            "comment": "",
+        }
 
+        # Store entry in the invoice store (system of record) and regenerate the Excel database from it
         sponsor_database_path = LIB_PATH / self.SPONSOR_DATABASE_NAME
-        
-        # Append data to database
-        if not os.path.exists(sponsor_database_path):
-            # If the database Excel file does NOT exist, create it and write the DataFrame
-            with pd.ExcelWriter(sponsor_database_path) as writer:
-                sponsor_entry_df.to_excel(writer, index=False, sheet_name=self.SHEET_NAME)
-                # Getting XlsxWriter workbook and worksheet objects
-                workbook = writer.book
-                worksheet = writer.sheets[self.SHEET_NAME]
-                # Getting the dimensions of the DataFrame
-                (max_row, max_col) = sponsor_entry_df.shape
-                # Creating a list of column headers, to use in "add_table()"
-                column_settings = [{"header": column} for column in sponsor_entry_df.columns]
-                # Adding the Excel table structure (Pandas will add the data)
-                worksheet.add_table(0, 0, max_row, max_col-1, {"columns": column_settings})
-        
-        else:
-            # TODO: Ask an LLM to modify below so that it doesn't just add line but is part of the excel pivot table (we should see the alternating blue and white colors!). Because those added lines are not part of the pivot table then!
-            with pd.ExcelWriter(sponsor_database_path, engine="openpyxl", mode="a", if_sheet_exists="overlay") as writer:
-                # Write the new data at the bottom of the sheet (append mode)
-                sponsor_entry_df.to_excel(writer, sheet_name=self.SHEET_NAME, startrow=writer.sheets[self.SHEET_NAME].max_row, index=False, header=False)
-        
-        # Update status label
-        status_text = status_text + "\nProcess finished! ✅"
+        invoice_store.add_invoice(registrer_dict=sponsor_entry_dict, kind=SPONSOR)
+        invoice_store.export_excel(sponsor_database_path)
+
+
+    def poll_progress(self):
+        """Show the progress events sent by the background thread (runs on the Tk main loop every `PROGRESS_POLL_INTERVAL`)."""
+        try:
+            while True:
+                event, job_dict, text = self.progress_queue.get_nowait()
+                job_dict["status_text"] += text
+                if event == "status":
+                    self.show_progress(job_dict)
+                else:
+                    self.finish_invoice(event, job_dict)
+        except queue.Empty:
+            pass
+        self.root.after(self.PROGRESS_POLL_INTERVAL, self.poll_progress)
+
+
+    def show_progress(self, job_dict: dict) -> None:
+        """Show the status of an invoice in the status label.
+
+        :param job_dict: The invoice job (see `create_invoice`).
+        """
+        status_text = job_dict["status_text"]
+        num_queued = sum(pending_job_dict is not job_dict for pending_job_dict in self.pending_job_list)
+        if num_queued > 0:
+            status_text = status_text + f"\n({num_queued} more invoice(s) queued)"
         self.status_label.config(text=status_text)
-        self.root.update()
 
-        # Display success logo
-        self.success = True
-        self.toggle_spinning()
 
-        # Display success message box
-        messagebox.showinfo(
-            title="Success", message="Invoice created and saved successfully!")
+    def finish_invoice(self, event: str, job_dict: dict) -> None:
+        """Update the UI once an invoice is done, has failed or has been cancelled.
+
+        :param event: How the invoice ended ("done", "error" or "cancelled").
+        :param job_dict: The invoice job (see `create_invoice`).
+        """
+        self.pending_job_list.remove(job_dict)
+        self.show_progress(job_dict)
+        invoice_number = job_dict["sponsor"].invoice.number
+        if event == "done" and self.number.get() in (invoice_number, self.provisional_invoice_number):
+            # Offer the next invoice number unless another one has already been entered
+            self.provisional_invoice_number = get_latest_invoice_number(self.invoice_store)
+            self.number.delete(0, tk.END)
+            self.number.insert(0, self.provisional_invoice_number)
+        if not self.pending_job_list:
+            self.cancel_invoice_button.config(state="disabled")
+            # Display success logo (or the static logo if the last invoice did not succeed)
+            self.success = event == "done"
+            self.toggle_spinning()
+
+        if event == "done":
+            # Display success message box
+            messagebox.showinfo(
+                title="Success", message=f"Invoice {invoice_number} created and saved successfully!")
+        elif event == "error":
+            messagebox.showerror(title="Error", message=f"Invoice {invoice_number} could not be created:\n{job_dict['error']}")
+
+
+    def cancel_invoices(self):
+        """Cancel the invoices being generated (the current stage of the running invoice is completed first, and an invoice being stored is not cancelled anymore)."""
+        for job_dict in self.pending_job_list:
+            job_dict["cancel_event"].set()
+        self.status_label.config(text=self.status_label.cget("text") + "\n> Cancelling...")
 
 
 def get_tomorrow_date() -> datetime:
@@ -1070,14 +1201,23 @@ def get_deadline_formatted_date() -> str:
     in_30_days_formatted = in_30_days.strftime("%d.%m.%Y")
     return in_30_days_formatted
 
-def get_latest_invoice_number() -> str:
-    """Retrieve latest invoice number from Excel file
-    TODO: Update this function doctstring + real functionality!!
+def get_latest_invoice_number(invoice_store: InvoiceStore) -> str:
+    """Retrieve the provisional number of the next invoice from the invoice store.
+
+    The number is not reserved, so that closing the window does not burn it. It
+    is only a preview: the number is reserved when the invoice is generated (see
+    `generate_invoice`) and may then differ, e.g. if the sports invoices script
+    has reserved numbers meanwhile.
+
+    :param invoice_store: The invoice store shared with the sports invoices script.
+    :return: A string containing the next invoice number (e.g. "20250024").
     """
-    return 20240023
+    return invoice_store.get_next_invoice_number()
 
 
 def check_internet(url="https://www.google.com", timeout=3):
+    import requests
+
     try:
         requests.get(url, timeout=timeout)
         return True
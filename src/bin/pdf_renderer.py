@@ -0,0 +1,428 @@
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from docx.document import Document
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+try:
+    from reportlab import Version as REPORTLAB_VERSION
+    from reportlab import rl_config
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.pdfgen.canvas import Canvas
+    REPORTLAB_AVAILABLE = True
+    # Keep the image streams binary, the pure-Python ASCII85 encoding would dominate the rendering time
+    rl_config.useA85 = 0
+except ImportError:  # optional dependency, only needed for native PDF rendering
+    REPORTLAB_AVAILABLE = False
+
+RENDERER_VERSION = 1  # to be increased whenever a change of the renderer changes the PDF output (part of the render cache keys)
+
+EMU_PER_PT = 12700
+TWIPS_PER_PT = 20
+LINE_HEIGHT_FACTOR = 1.15  # line height of a single-spaced line relative to the font size
+DEFAULT_FONT_SIZE = 11  # [pt]
+
+# Standard PDF fonts used in place of the fonts of the templates (no font files needed)
+FONT_DICT = {
+    ("Times New Roman", False): "Times-Roman",
+    ("Times New Roman", True): "Times-Bold",
+    (None, False): "Helvetica",
+    (None, True): "Helvetica-Bold",
+}
+
+
+class TextStyle:
+    """Resolved formatting of a paragraph (first non-empty run, paragraph style and document defaults).
+
+    :param font_name: Name of the PDF font (see `FONT_DICT`).
+    :param font_size: Font size [pt].
+    :param color: Text color as hexadecimal string (e.g. "251111").
+    :param space_before: Space before the paragraph [pt].
+    :param space_after: Space after the paragraph [pt].
+    :param line_spacing: Line spacing multiple.
+    :param alignment: Paragraph alignment ("left", "center", "right" or "both").
+    :param tab_list: Tab stops as tuples (alignment, position from the left margin [pt]).
+    :param top_border: Top border of the paragraph as tuple (width [pt], color), or None.
+    """
+    def __init__(self, font_name: str, font_size: float, color: str, space_before: float, space_after: float,
+                 line_spacing: float, alignment: str, tab_list: List[Tuple[str, float]], top_border: Optional[Tuple[float, str]]) -> None:
+        self.font_name = font_name
+        self.font_size = font_size
+        self.color = color
+        self.space_before = space_before
+        self.space_after = space_after
+        self.line_spacing = line_spacing
+        self.alignment = alignment
+        self.tab_list = tab_list
+        self.top_border = top_border
+
+    @property
+    def line_height(self) -> float:
+        return self.font_size * LINE_HEIGHT_FACTOR * self.line_spacing
+
+
+def _find_in_style_chain(element_list: List[Any], path: str) -> Optional[Any]:
+    """Find the first element matching an XPath-like path in a list of property elements (highest priority first).
+
+    :param element_list: List of `w:pPr`/`w:rPr` elements (None entries are skipped).
+    :param path: Path of the property to find (e.g. "w:spacing").
+    :return: The first matching element, or None.
+    """
+    for element in element_list:
+        if element is not None:
+            found = element.find(qn(path))
+            if found is not None:
+                return found
+    return None
+
+
+class InvoicePdfRenderer:
+    """Native PDF renderer for the fixed layout of the DOCX invoice models.
+
+    The filled-in `docx.Document` returned by `TemplateCache.render` is drawn
+    straight to PDF with reportlab: body paragraphs (fonts, colors, spacing,
+    alignment, tab stops, top borders), tables (grid widths, row heights, cell
+    shading and borders, merged cells) and floating images (logo, banner and
+    payment slip), laid out top-down from the section margins. Only the subset
+    of WordprocessingML used by the invoice models is supported, so that no
+    office suite is needed to get the PDF invoice.
+
+    Prepared images are kept across invoices since all invoices of a batch share them.
+    """
+    def __init__(self) -> None:
+        self._image_dir = tempfile.TemporaryDirectory(prefix="invoice_images_")
+        self._image_dict: Dict[str, str] = {}
+
+    @property
+    def engine_name(self) -> str:
+        """Name and version of the engine, so that cached invoices are not reused once the renderer output changes."""
+        return f"reportlab-{REPORTLAB_VERSION}/renderer-{RENDERER_VERSION}"
+
+    # --- Formatting -----------------------------------------------------------
+
+    def _get_style_chain(self, doc: Document, paragraph: Paragraph, tag: str) -> List[Any]:
+        """Get the property elements applying to a paragraph, from the paragraph itself to the document defaults.
+
+        :param doc: The document containing the paragraph.
+        :param paragraph: The paragraph.
+        :param tag: "w:pPr" for paragraph properties or "w:rPr" for run properties.
+        :return: A list of property elements (highest priority first).
+        """
+        element_list = []
+        if tag == "w:rPr":
+            run_element = next((r for r in paragraph._p.iter(qn("w:r")) if "".join(r.itertext()).strip()), None)
+            element_list.append(run_element.rPr if run_element is not None else None)
+            p_pr = paragraph._p.pPr
+            element_list.append(p_pr.find(qn("w:rPr")) if p_pr is not None else None)
+        else:
+            element_list.append(paragraph._p.pPr)
+        style = paragraph.style
+        while style is not None:
+            element_list.append(style.element.find(qn(tag)))
+            style = style.base_style
+        doc_defaults = doc.styles.element.find(qn("w:docDefaults"))
+        if doc_defaults is not None:
+            element_list.append(doc_defaults.find(f"{qn('w:rPrDefault' if tag == 'w:rPr' else 'w:pPrDefault')}/{qn(tag)}"))
+        return element_list
+
+    def get_text_style(self, doc: Document, paragraph: Paragraph) -> TextStyle:
+        """Resolve the formatting of a paragraph.
+
+        :param doc: The document containing the paragraph.
+        :param paragraph: The paragraph.
+        :return: The resolved `TextStyle`.
+        """
+        r_pr_list = self._get_style_chain(doc, paragraph, "w:rPr")
+        p_pr_list = self._get_style_chain(doc, paragraph, "w:pPr")
+
+        fonts = _find_in_style_chain(r_pr_list, "w:rFonts")
+        font_family = fonts.get(qn("w:ascii")) if fonts is not None else None
+        bold = _find_in_style_chain(r_pr_list, "w:b")
+        is_bold = bold is not None and bold.get(qn("w:val")) not in ("0", "false")
+        font_name = FONT_DICT.get((font_family, is_bold), FONT_DICT[(None, is_bold)])
+        size = _find_in_style_chain(r_pr_list, "w:sz")
+        font_size = int(size.get(qn("w:val"))) / 2 if size is not None else DEFAULT_FONT_SIZE
+        color = _find_in_style_chain(r_pr_list, "w:color")
+        color = color.get(qn("w:val")) if color is not None and color.get(qn("w:val")) != "auto" else "000000"
+
+        space_before = space_after = 0
+        line_spacing = 1
+        # Spacing attributes can be spread over several levels of the style chain
+        for attribute in ("before", "after", "line"):
+            for element in p_pr_list:
+                spacing = element.find(qn("w:spacing")) if element is not None else None
+                if spacing is not None and spacing.get(qn(f"w:{attribute}")) is not None:
+                    value = int(spacing.get(qn(f"w:{attribute}")))
+                    if attribute == "before":
+                        space_before = value / TWIPS_PER_PT
+                    elif attribute == "after":
+                        space_after = value / TWIPS_PER_PT
+                    else:
+                        line_spacing = value / 240
+                    break
+        justification = _find_in_style_chain(p_pr_list, "w:jc")
+        alignment = justification.get(qn("w:val")) if justification is not None else "left"
+        tabs = _find_in_style_chain(p_pr_list, "w:tabs")
+        tab_list = sorted(((tab.get(qn("w:val")), int(tab.get(qn("w:pos"))) / TWIPS_PER_PT) for tab in tabs), key=lambda tab: tab[1]) if tabs is not None else []
+        top_border = _find_in_style_chain(p_pr_list, "w:pBdr")
+        top_border = top_border.find(qn("w:top")) if top_border is not None else None
+        if top_border is not None and top_border.get(qn("w:val")) not in ("nil", "none"):
+            top_border = (int(top_border.get(qn("w:sz"))) / 8, top_border.get(qn("w:color")))
+        else:
+            top_border = None
+
+        return TextStyle(font_name, font_size, color, space_before, space_after, line_spacing, alignment, tab_list, top_border)
+
+    # --- Drawing --------------------------------------------------------------
+
+    def _set_font(self, canvas, style: TextStyle) -> None:
+        canvas.setFont(style.font_name, style.font_size)
+        canvas.setFillColor(HexColor(f"#{style.color}"))
+
+    def _draw_text_lines(self, canvas, text: str, style: TextStyle, x: float, y_top: float, width: float) -> float:
+        """Draw the text of a paragraph (with tab stops and line wrapping) in a box.
+
+        :param canvas: The reportlab canvas.
+        :param text: Text of the paragraph.
+        :param style: Formatting of the paragraph.
+        :param x: Left of the box [pt].
+        :param y_top: Top of the box, measured from the bottom of the page [pt].
+        :param width: Width of the box [pt].
+        :return height: Height of the drawn lines [pt].
+        """
+        self._set_font(canvas, style)
+        baseline_offset = style.font_size * 0.9
+        if "\t" in text:
+            # Tabbed line: each segment starts at the next tab stop (right tabs end there)
+            segment_list = text.split("\t")
+            x_cursor = x + stringWidth(segment_list[0], style.font_name, style.font_size)
+            canvas.drawString(x, y_top - baseline_offset, segment_list[0])
+            for segment in segment_list[1:]:
+                tab = next((tab for tab in style.tab_list if x + tab[1] > x_cursor), None)
+                if tab is None:
+                    # Default tab stops every 708 twips
+                    tab = ("left", ((x_cursor - x) // 35.4 + 1) * 35.4)
+                tab_alignment, tab_position = tab
+                if tab_alignment == "right":
+                    canvas.drawRightString(x + tab_position, y_top - baseline_offset, segment)
+                    x_cursor = x + tab_position
+                else:
+                    canvas.drawString(x + tab_position, y_top - baseline_offset, segment)
+                    x_cursor = x + tab_position + stringWidth(segment, style.font_name, style.font_size)
+            return style.line_height
+
+        line_list = simpleSplit(text, style.font_name, style.font_size, width) or [""]
+        for i, line in enumerate(line_list):
+            y_baseline = y_top - i * style.line_height - baseline_offset
+            if style.alignment == "center":
+                canvas.drawCentredString(x + width / 2, y_baseline, line)
+            elif style.alignment == "right":
+                canvas.drawRightString(x + width, y_baseline, line)
+            else:
+                canvas.drawString(x, y_baseline, line)
+        return len(line_list) * style.line_height
+
+    def _get_image(self, doc: Document, r_id: str) -> str:
+        """Get an image of the document as a file prepared for reportlab (once per image content).
+
+        Opaque non-JPEG images (e.g. the scanned payment slip) are re-encoded to
+        JPEG, which reportlab embeds as it is in every PDF instead of compressing
+        the pixels again for each invoice. Images are given to reportlab as file
+        paths so that it identifies them by name rather than by hashing their pixels.
+
+        :param doc: The document.
+        :param r_id: Relationship ID of the image.
+        :return image_path: Path to the prepared image file.
+        """
+        image_part = doc.part.related_parts[r_id]
+        key = image_part.sha1
+        if key not in self._image_dict:
+            blob, extension = image_part.blob, Path(str(image_part.partname)).suffix
+            if image_part.content_type != "image/jpeg":
+                from PIL import Image
+
+                image = Image.open(BytesIO(blob))
+                if "transparency" not in image.info and image.mode in ("P", "L", "RGB"):
+                    buffer = BytesIO()
+                    image.convert("RGB").save(buffer, format="JPEG", quality=90)
+                    blob, extension = buffer.getvalue(), ".jpg"
+            image_path = Path(self._image_dir.name) / f"{key}{extension}"
+            image_path.write_bytes(blob)
+            self._image_dict[key] = str(image_path)
+        return self._image_dict[key]
+
+    def _collect_anchored_images(self, doc: Document, paragraph: Paragraph, y_paragraph: float, page_width: float, page_height: float,
+                                 left_margin: float, top_margin: float, text_width: float) -> List[Tuple[bool, Any, float, float, float, float]]:
+        """Compute the position of the floating images anchored in a paragraph.
+
+        :return: A list of tuples (behind text, image, x, y, width, height), positions measured from the bottom left corner of the page [pt].
+        """
+        image_list = []
+        for anchor in paragraph._p.iter(qn("wp:anchor")):
+            blip = next(anchor.iter(qn("a:blip")), None)
+            extent = anchor.find(qn("wp:extent"))
+            if blip is None or extent is None:
+                continue
+            width, height = int(extent.get("cx")) / EMU_PER_PT, int(extent.get("cy")) / EMU_PER_PT
+
+            position_h = anchor.find(qn("wp:positionH"))
+            relative_h = position_h.get("relativeFrom")
+            origin_x, area_width = (0, page_width) if relative_h == "page" else (left_margin, text_width)
+            if position_h.find(qn("wp:align")) is not None:
+                align = position_h.find(qn("wp:align")).text
+                x = origin_x + {"left": 0, "center": (area_width - width) / 2, "right": area_width - width}.get(align, 0)
+            else:
+                x = origin_x + int(position_h.find(qn("wp:posOffset")).text) / EMU_PER_PT
+
+            position_v = anchor.find(qn("wp:positionV"))
+            relative_v = position_v.get("relativeFrom")
+            origin_y = {"page": 0, "margin": top_margin}.get(relative_v, y_paragraph)
+            offset = position_v.find(qn("wp:posOffset"))
+            y_top = origin_y + (int(offset.text) / EMU_PER_PT if offset is not None else 0)
+
+            image = self._get_image(doc, blip.get(qn("r:embed")))
+            image_list.append((anchor.get("behindDoc") == "1", image, x, page_height - y_top - height, width, height))
+        return image_list
+
+    def _draw_table(self, canvas, doc: Document, table: Table, x_left: float, y_top: float, text_width: float) -> float:
+        """Draw a table (cell shading, top/bottom cell borders and first paragraph of each cell).
+
+        :return height: Height of the table [pt].
+        """
+        tbl = table._tbl
+        column_width_list = [int(col.get(qn("w:w"))) / TWIPS_PER_PT for col in tbl.tblGrid.iter(qn("w:gridCol"))]
+        table_width = sum(column_width_list)
+        justification = tbl.tblPr.find(qn("w:jc"))
+        justification = justification.get(qn("w:val")) if justification is not None else "left"
+        x_table = x_left + {"center": (text_width - table_width) / 2, "right": text_width - table_width}.get(justification, 0)
+
+        y = y_top
+        for tr in tbl.iter(qn("w:tr")):
+            row_height = 0
+            row_height_element = tr.find(f"{qn('w:trPr')}/{qn('w:trHeight')}")
+            min_row_height = int(row_height_element.get(qn("w:val"))) / TWIPS_PER_PT if row_height_element is not None else 0
+
+            # Lay out the cells of the row first to know its height
+            cell_list = []
+            grid_index = 0
+            for tc in tr.iter(qn("w:tc")):
+                tc_pr = tc.tcPr
+                span = tc_pr.find(qn("w:gridSpan")) if tc_pr is not None else None
+                span = int(span.get(qn("w:val"))) if span is not None else 1
+                x_cell = x_table + sum(column_width_list[:grid_index])
+                cell_width = sum(column_width_list[grid_index:grid_index + span])
+                grid_index += span
+                paragraph = Paragraph(tc.find(qn("w:p")), table)
+                style = self.get_text_style(doc, paragraph)
+                text = "\n".join(Paragraph(p, table).text for p in tc.iter(qn("w:p")))
+                num_lines = max(1, len(simpleSplit(text, style.font_name, style.font_size, cell_width - 10.8)))
+                row_height = max(row_height, num_lines * style.line_height + style.space_before + style.space_after)
+                cell_list.append((tc_pr, x_cell, cell_width, text, style, num_lines))
+            row_height = max(row_height, min_row_height)
+
+            for tc_pr, x_cell, cell_width, text, style, num_lines in cell_list:
+                y_row_bottom = y - row_height
+                if tc_pr is not None:
+                    shading = tc_pr.find(qn("w:shd"))
+                    if shading is not None and shading.get(qn("w:fill")) not in (None, "auto"):
+                        canvas.setFillColor(HexColor(f"#{shading.get(qn('w:fill'))}"))
+                        canvas.rect(x_cell, y_row_bottom, cell_width, row_height, stroke=0, fill=1)
+                    borders = tc_pr.find(qn("w:tcBorders"))
+                    for side, y_border in (("top", y), ("bottom", y_row_bottom)):
+                        border = borders.find(qn(f"w:{side}")) if borders is not None else None
+                        if border is not None and border.get(qn("w:val")) not in ("nil", "none"):
+                            canvas.setStrokeColor(HexColor(f"#{border.get(qn('w:color'))}"))
+                            canvas.setLineWidth(int(border.get(qn("w:sz"))) / 8)
+                            canvas.line(x_cell, y_border, x_cell + cell_width, y_border)
+                    v_align = tc_pr.find(qn("w:vAlign"))
+                    v_align = v_align.get(qn("w:val")) if v_align is not None else "top"
+                else:
+                    v_align = "top"
+                text_height = num_lines * style.line_height
+                y_text_top = {"center": y - (row_height - text_height) / 2, "bottom": y_row_bottom + text_height + style.space_after}.get(v_align, y - style.space_before)
+                # Default cell margins of 0.19 cm on the left and right
+                self._draw_text_lines(canvas, text, style, x_cell + 5.4, y_text_top, cell_width - 10.8)
+            y -= row_height
+        return y_top - y
+
+    def render(self, doc: Document, pdf_path: Union[str, Path]) -> Path:
+        """Draw a filled-in invoice to a PDF file.
+
+        Pages break where Word last broke them when the template was saved
+        (`w:lastRenderedPageBreak`, e.g. before the payment slip page) or when the
+        content reaches the bottom margin.
+
+        :param doc: The filled-in `docx.Document` (see `TemplateCache.render`).
+        :param pdf_path: Path to the PDF file to write.
+        :return pdf_path: Path to the generated PDF file.
+        """
+        if not REPORTLAB_AVAILABLE:
+            raise ImportError("The native PDF renderer needs the 'reportlab' package (`pip install reportlab`).")
+
+        section = doc.sections[0]
+        page_width, page_height = section.page_width.pt, section.page_height.pt
+        left_margin, top_margin = section.left_margin.pt, section.top_margin.pt
+        bottom_limit = page_height - section.bottom_margin.pt
+        text_width = page_width - left_margin - section.right_margin.pt
+
+        # Lay out the body top-down, page by page (positions measured from the top of the page)
+        page_list = [{"behind": [], "front": [], "draw": []}]
+        y_cursor = top_margin
+        for element in doc.element.body.iterchildren():
+            if element.tag == qn("w:p"):
+                paragraph = Paragraph(element, doc)
+                style = self.get_text_style(doc, paragraph)
+                text = paragraph.text
+                num_lines = 1 if "\t" in text else max(1, len(simpleSplit(text, style.font_name, style.font_size, text_width)))
+                height = style.space_before + num_lines * style.line_height
+                if next(element.iter(qn("w:lastRenderedPageBreak")), None) is not None or y_cursor + height > bottom_limit:
+                    page_list.append({"behind": [], "front": [], "draw": []})
+                    y_cursor = top_margin
+                page = page_list[-1]
+                y_cursor += style.space_before
+                for behind, *image in self._collect_anchored_images(doc, paragraph, y_cursor, page_width, page_height, left_margin, top_margin, text_width):
+                    page["behind" if behind else "front"].append(image)
+                page["draw"].append(("paragraph", text, style, y_cursor))
+                y_cursor += num_lines * style.line_height + style.space_after
+            elif element.tag == qn("w:tbl"):
+                table = Table(element, doc)
+                # Table height is only known once drawn, measure it on a scratch canvas
+                height = self._draw_table(_NullCanvas(), doc, table, left_margin, page_height - y_cursor, text_width)
+                if y_cursor + height > bottom_limit:
+                    page_list.append({"behind": [], "front": [], "draw": []})
+                    y_cursor = top_margin
+                page_list[-1]["draw"].append(("table", table, None, y_cursor))
+                y_cursor += height
+
+        canvas = Canvas(str(pdf_path), pagesize=(page_width, page_height))
+        for page in page_list:
+            # Images placed behind the text first, then text and tables, then images in front of the text
+            for image, x, y, width, height in page["behind"]:
+                canvas.drawImage(image, x, y, width, height)
+            for kind, item, style, y_top in page["draw"]:
+                if kind == "paragraph":
+                    if style.top_border is not None:
+                        canvas.setStrokeColor(HexColor(f"#{style.top_border[1]}"))
+                        canvas.setLineWidth(style.top_border[0])
+                        canvas.line(left_margin, page_height - y_top + 1, left_margin + text_width, page_height - y_top + 1)
+                    if item:
+                        self._draw_text_lines(canvas, item, style, left_margin, page_height - y_top, text_width)
+                else:
+                    self._draw_table(canvas, doc, item, left_margin, page_height - y_top, text_width)
+            for image, x, y, width, height in page["front"]:
+                canvas.drawImage(image, x, y, width, height)
+            canvas.showPage()
+        canvas.save()
+        return Path(pdf_path)
+
+
+class _NullCanvas:
+    """Canvas ignoring all drawing operations (used to measure tables)."""
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
@@ -0,0 +1,126 @@
+from typing import Any, Dict, Tuple
+
+from catalog import Catalog, Price
+from definition import PRODUCT_TOTAL_CHECK_INTERVAL
+
+DEFAULT = "default"  # products of the catalog, priced by the catalog
+CUSTOM = "custom"  # products entered by hand, with their own price
+
+
+class ProductSelection:
+    """Products selected in the sponsor invoice form, with a running total price.
+
+    Rows are stored by kind (`DEFAULT` or `CUSTOM`) and row ID, as dictionaries
+    with keys "name" and "quantity" (and "price" for custom products). Every
+    change to a row updates the total price by the difference between the new
+    and the old subtotal of the row, so that the total never has to be
+    recomputed from all rows. Every `check_interval` changes, the total is
+    fully recomputed (see `check_total`) to catch any drift, e.g. after the
+    catalog prices have been reloaded.
+
+    Usage:
+        selection = ProductSelection(catalog)
+        selection.set_product(DEFAULT, "0", {"name": name, "quantity": "2"})
+        selection.remove_product(DEFAULT, "0")
+        total_price = selection.total_price
+
+    :param catalog: The product catalog pricing the default products.
+    :param check_interval: Number of changes between two full recomputations of the total price.
+    """
+    def __init__(self, catalog: Catalog, check_interval: int = PRODUCT_TOTAL_CHECK_INTERVAL) -> None:
+        self.catalog = catalog
+        self.check_interval = check_interval
+        self.product_dict_by_kind: Dict[str, Dict[str, Dict[str, Any]]] = {DEFAULT: {}, CUSTOM: {}}
+        self.total_price: Price = 0
+        self._subtotal_dict: Dict[Tuple[str, str], Price] = {}  # subtotal of each row, by (kind, row ID)
+        self._num_changes = 0
+
+    @property
+    def default_product_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Selected default products by row ID (to be changed through `set_product` and `remove_product` only)."""
+        return self.product_dict_by_kind[DEFAULT]
+
+    @property
+    def custom_product_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Selected custom products by row ID (to be changed through `set_product` and `remove_product` only)."""
+        return self.product_dict_by_kind[CUSTOM]
+
+    def get_subtotal(self, kind: str, product: Dict[str, Any]) -> Price:
+        """Compute the price of a row.
+
+        :param kind: Kind of product (`DEFAULT` or `CUSTOM`).
+        :param product: The row (keys "name", "quantity" and, for custom products, "price").
+        :return subtotal: Quantity times unit price [CHF].
+        """
+        unit_price = self.catalog.get_price(product["name"]) if kind == DEFAULT else int(product["price"])
+        return int(product["quantity"]) * unit_price
+
+    def _add_change(self, delta: Price) -> None:
+        """Apply the price difference of a changed row and periodically check the total.
+
+        :param delta: New minus old subtotal of the row [CHF].
+        :return: None.
+        """
+        self.total_price += delta
+        self._num_changes += 1
+        if self._num_changes % self.check_interval == 0:
+            self.check_total()
+
+    def set_product(self, kind: str, row: str, product: Dict[str, Any]) -> None:
+        """Add a row or replace it (e.g. when its quantity, product or price changes).
+
+        :param kind: Kind of product (`DEFAULT` or `CUSTOM`).
+        :param row: ID of the row (e.g. "0").
+        :param product: The row (keys "name", "quantity" and, for custom products, "price").
+        :return: None.
+        """
+        subtotal = self.get_subtotal(kind, product)
+        self.product_dict_by_kind[kind][row] = product
+        delta = subtotal - self._subtotal_dict.get((kind, row), 0)
+        self._subtotal_dict[(kind, row)] = subtotal
+        self._add_change(delta)
+
+    def remove_product(self, kind: str, row: str) -> None:
+        """Remove a row.
+
+        :param kind: Kind of product (`DEFAULT` or `CUSTOM`).
+        :param row: ID of the row.
+        :return: None.
+        """
+        self.product_dict_by_kind[kind].pop(row)
+        self._add_change(-self._subtotal_dict.pop((kind, row), 0))
+
+    def clear(self, kind: str) -> None:
+        """Remove all rows of a kind (e.g. when its frame is hidden).
+
+        :param kind: Kind of product (`DEFAULT` or `CUSTOM`).
+        :return: None.
+        """
+        for row in list(self.product_dict_by_kind[kind]):
+            self.remove_product(kind, row)
+
+    def compute_total(self) -> Price:
+        """Compute the total price from all rows (default products are priced at once, see `Catalog.get_total`).
+
+        :return total_price: Sum of the subtotals of all rows [CHF].
+        """
+        default_product_list = list(self.default_product_dict.values())
+        total_price_default_products = self.catalog.get_total(
+            name_list=[product["name"] for product in default_product_list],
+            quantity_list=[product["quantity"] for product in default_product_list],
+        )
+        total_price_custom_products = sum(self.get_subtotal(CUSTOM, product) for product in self.custom_product_dict.values())
+        return total_price_default_products + total_price_custom_products
+
+    def check_total(self) -> bool:
+        """Recompute the total price and the subtotals from all rows and fix them if they drifted.
+
+        :return is_consistent: Whether the running total was right.
+        """
+        total_price = self.compute_total()
+        self._subtotal_dict = {(kind, row): self.get_subtotal(kind, product) for kind, product_dict in self.product_dict_by_kind.items() for row, product in product_dict.items()}
+        is_consistent = total_price == self.total_price
+        if not is_consistent:
+            print(f"⚠️ Running total price {self.total_price} CHF corrected to {total_price} CHF.")
+            self.total_price = total_price
+        return is_consistent
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from definition import RENDER_CACHE_MAX_SIZE, RENDER_CACHE_PATH
+
+
+class RenderCache:
+    """Content-addressed cache of rendered invoices (DOCX and PDF).
+
+    Entries are keyed by a hash of the template file content, of the full
+    replacements dictionary and of the PDF engine, so an invoice is only taken
+    from the cache when it would be rendered exactly the same (same invoice
+    number, customer, products, dates, template and PDF engine). This makes retries of a failed batch and reprints
+    nearly free, since neither the template filling nor the PDF conversion is
+    done again.
+
+    On a hit, the cached files are hard-linked to the requested output paths
+    (copied when hard links are not supported), so output files have to be
+    removed rather than overwritten in place (see `discard`). The total size of
+    the cache is kept up to date as entries are stored, and the least recently
+    used entries are evicted once it grows beyond `max_size`.
+
+    Usage:
+        cache = RenderCache()
+        key = cache.get_key(template_hash, replacements, engine="soffice")
+        if not cache.fetch(key, docx_path, pdf_path):
+            ...  # render and convert the invoice
+            cache.store(key, docx_path, pdf_path)
+
+    :param path: Folder of the cache.
+    :param max_size: Maximum total size of the cached files [bytes].
+    """
+    def __init__(self, path: Path = RENDER_CACHE_PATH, max_size: int = RENDER_CACHE_MAX_SIZE) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.deferred_list: List[Tuple[str, str, str]] = []  # entries whose PDF is converted later (see `defer`)
+        self.num_hits = 0
+        self.num_misses = 0
+        self._size: Optional[int] = None  # total size of the cached files [bytes], measured on the first store
+
+    @staticmethod
+    def get_key(template_hash: str, replacements: Dict[str, str], engine: str) -> str:
+        """Compute the cache key of an invoice.
+
+        :param template_hash: Hash of the content of the DOCX template (see `CachedTemplate.file_hash`).
+        :param replacements: A dictionary mapping placeholders (e.g. "[TOTAL]") to their string values.
+        :param engine: Name (and version) of the engine producing the PDF invoice (e.g. "soffice", see `InvoicePdfRenderer.engine_name`).
+        :return key: Hexadecimal SHA-256 digest identifying the rendered invoice.
+        """
+        content = json.dumps([template_hash, replacements, engine], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _get_entry_path(self, key: str, suffix: str) -> Path:
+        return self.path / f"{key}{suffix}"
+
+    def _get_entry_size(self, key: str) -> int:
+        """Get the size of the cached files of a key.
+
+        :param key: Cache key of the invoice (see `get_key`).
+        :return size: Total size of the cached DOCX and PDF invoices [bytes] (0 if not cached).
+        """
+        size = 0
+        for suffix in (".docx", ".pdf"):
+            try:
+                size += self._get_entry_path(key, suffix).stat().st_size
+            except FileNotFoundError:
+                pass
+        return size
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached files [bytes] (the cache folder is only scanned the first time)."""
+        if self._size is None:
+            self._size = sum(cached_path.stat().st_size for cached_path in self.path.iterdir() if cached_path.suffix in (".docx", ".pdf"))
+        return self._size
+
+    @staticmethod
+    def _place(source_path: Path, destination_path: Union[str, Path], link: bool = True) -> None:
+        """Hard-link or copy a file to the given path, atomically replacing an existing file.
+
+        :param source_path: Path to the existing file.
+        :param destination_path: Path to create.
+        :param link: Whether to hard-link the file (it is copied if hard links are not supported).
+        :return: None.
+        """
+        destination_path = Path(destination_path)
+        tmp_path = destination_path.with_name(f"~{destination_path.name}")
+        tmp_path.unlink(missing_ok=True)
+        if link:
+            try:
+                os.link(source_path, tmp_path)
+            except OSError:
+                # E.g. cache and output folders on different file systems
+                link = False
+        if not link:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, destination_path)
+
+    def fetch(self, key: str, docx_path: Union[str, Path], pdf_path: Union[str, Path]) -> bool:
+        """Put the cached DOCX and PDF invoices of a key at the given paths.
+
+        :param key: Cache key of the invoice (see `get_key`).
+        :param docx_path: Output path of the DOCX invoice.
+        :param pdf_path: Output path of the PDF invoice.
+        :return hit: Whether both invoices were found in the cache.
+        """
+        cached_docx_path, cached_pdf_path = self._get_entry_path(key, ".docx"), self._get_entry_path(key, ".pdf")
+        if not (cached_docx_path.exists() and cached_pdf_path.exists()):
+            self.num_misses += 1
+            return False
+        self._place(cached_docx_path, docx_path)
+        self._place(cached_pdf_path, pdf_path)
+        # Mark the entry as recently used for eviction
+        for cached_path in (cached_docx_path, cached_pdf_path):
+            os.utime(cached_path)
+        self.num_hits += 1
+        return True
+
+    @staticmethod
+    def discard(*path_list: Union[str, Path]) -> None:
+        """Remove output files before rendering them again, so that files linked to cache entries are left untouched.
+
+        :param path_list: Paths to the output files.
+        :return: None.
+        """
+        for path in path_list:
+            Path(path).unlink(missing_ok=True)
+
+    def store(self, key: str, docx_path: Union[str, Path], pdf_path: Union[str, Path]) -> None:
+        """Add a rendered invoice to the cache (nothing is stored if its PDF does not exist).
+
+        :param key: Cache key of the invoice (see `get_key`).
+        :param docx_path: Path to the rendered DOCX invoice.
+        :param pdf_path: Path to the converted PDF invoice.
+        :return: None.
+        """
+        if not (Path(docx_path).exists() and Path(pdf_path).exists()):
+            return
+        size = self.size - self._get_entry_size(key)
+        # Copied rather than linked so that overwriting an output file in place never alters the cache, and the
+        # PDF is stored last since an entry only counts as cached once both files exist
+        self._place(Path(docx_path), self._get_entry_path(key, ".docx"), link=False)
+        self._place(Path(pdf_path), self._get_entry_path(key, ".pdf"), link=False)
+        self._size = size + self._get_entry_size(key)
+        if self._size > self.max_size:
+            self.evict()
+
+    def defer(self, key: str, docx_path: Union[str, Path], pdf_path: Union[str, Path]) -> None:
+        """Remember an invoice whose PDF is converted later, to be stored with `store_deferred`.
+
+        :param key: Cache key of the invoice (see `get_key`).
+        :param docx_path: Path to the rendered DOCX invoice.
+        :param pdf_path: Path of the PDF invoice once converted.
+        :return: None.
+        """
+        self.deferred_list.append((key, str(docx_path), str(pdf_path)))
+
+    def store_deferred(self) -> None:
+        """Store the deferred invoices whose PDF could be converted.
+
+        :return: None.
+        """
+        for key, docx_path, pdf_path in self.deferred_list:
+            self.store(key, docx_path, pdf_path)
+        self.deferred_list = []
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in `max_size`.
+
+        The cache folder is scanned, so this is only called when the running size
+        exceeds `max_size` and once at the end of a run (other processes may have
+        stored entries too).
+
+        :return: None.
+        """
+        entry_dict: Dict[str, List[os.stat_result]] = {}
+        for cached_path in self.path.iterdir():
+            if cached_path.suffix in (".docx", ".pdf"):
+                entry_dict.setdefault(cached_path.stem, []).append(cached_path.stat())
+        total_size = sum(stat.st_size for stat_list in entry_dict.values() for stat in stat_list)
+        if total_size > self.max_size:
+            for key, stat_list in sorted(entry_dict.items(), key=lambda item: max(stat.st_mtime for stat in item[1])):
+                for suffix in (".pdf", ".docx"):
+                    self._get_entry_path(key, suffix).unlink(missing_ok=True)
+                total_size -= sum(stat.st_size for stat in stat_list)
+                if total_size <= self.max_size:
+                    break
+        self._size = total_size
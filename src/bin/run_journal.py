@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from definition import LOG_PATH, RUN_JOURNAL_PATH
+
+# Stages of the invoice of a registrer, in the order they are normally completed (the invoice ledger being saved at
+# checkpoints, "ledger-written" may come after "db-written")
+RESERVED = "reserved"
+RENDERED = "rendered"
+CONVERTED = "converted"
+LEDGER_WRITTEN = "ledger-written"
+DB_WRITTEN = "db-written"
+EMAILED = "emailed"
+STAGE_LIST = [RESERVED, RENDERED, CONVERTED, LEDGER_WRITTEN, DB_WRITTEN, EMAILED]
+
+
+class RunJournal:
+    """Append-only journal of the stages completed for each registrer of a run.
+
+    Every completed stage is written as one JSON line (flushed and synced right
+    away) to a journal file under `LOG_PATH`, together with the invoice number
+    and, once booked, the invoice data. A run started with `--resume` reopens the
+    latest journal and continues each registrer from its last completed stage:
+    the reserved invoice number is reused (also by invoices whose rendering
+    failed, so that their number is not lost), booked invoices are neither rendered
+    nor booked again, and sent invoices are not sent twice.
+
+    Usage:
+        journal = RunJournal()  # or RunJournal(RunJournal.find_latest()) to resume
+        journal.record(email, RENDERED, invoice_number=invoice_number)
+        journal.close()
+
+    :param path: Path to the journal file (created if it does not exist, replayed otherwise).
+    """
+    def __init__(self, path: Path = RUN_JOURNAL_PATH) -> None:
+        self.path = path
+        self.state_dict: Dict[str, Dict[str, Any]] = {}
+        self._email_by_invoice_number: Dict[str, str] = {}
+        self._lock = threading.Lock()  # stages are also recorded by the email sending thread
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        self._apply(json.loads(line))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    @staticmethod
+    def find_latest(log_path: Path = LOG_PATH) -> Optional[Path]:
+        """Get the journal of the latest run.
+
+        :param log_path: Folder containing the journals.
+        :return journal_path: Path to the latest journal (None if there is none).
+        """
+        journal_path_list = sorted(log_path.glob("run_journal_*.jsonl"))
+        return journal_path_list[-1] if journal_path_list else None
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        """Update the state of a registrer with a journal event.
+
+        :param event: The journal event (see `record`).
+        :return: None.
+        """
+        state = self.state_dict.setdefault(event["email"], {"stages": set()})
+        state["stages"].add(event["stage"])
+        for key, value in event.items():
+            if key not in ("email", "stage", "time"):
+                state[key] = value
+        if "invoice_number" in event:
+            self._email_by_invoice_number[str(event["invoice_number"])] = event["email"]
+
+    def record(self, email: str, stage: str, **data: Any) -> None:
+        """Record that a stage has been completed for a registrer.
+
+        :param email: Email address of the registrer (one invoice per registrer and run).
+        :param stage: The completed stage (see `STAGE_LIST`).
+        :param data: Data needed to resume from this stage (e.g. `invoice_number`, `invoice_path`, `registrer_dict`).
+        :return: None.
+        """
+        event = {"time": datetime.now().isoformat(timespec="seconds"), "email": email, "stage": stage, **data}
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(json.loads(line))
+
+    def record_ledger_rows(self, row_value_list_list: List[List[Any]]) -> None:
+        """Record the invoices whose row has been saved to the invoice ledger (see `InvoiceLedger`'s `on_save`).
+
+        :param row_value_list_list: The saved rows (date, invoice number, name, amount, "Mail").
+        :return: None.
+        """
+        for row_value_list in row_value_list_list:
+            email = self._email_by_invoice_number.get(str(row_value_list[1]))
+            if email is not None:
+                self.record(email, LEDGER_WRITTEN)
+
+    def has_stage(self, email: str, stage: str) -> bool:
+        """Check whether a stage has been completed for a registrer.
+
+        :param email: Email address of the registrer.
+        :param stage: The stage (see `STAGE_LIST`).
+        :return: Whether the stage has been completed.
+        """
+        return stage in self.state_dict.get(email, {}).get("stages", set())
+
+    def get_state(self, email: str) -> Dict[str, Any]:
+        """Get what is known of the invoice of a registrer.
+
+        :param email: Email address of the registrer.
+        :return state: The completed stages (key "stages") and the data recorded with them (empty if unknown).
+        """
+        return self.state_dict.get(email, {"stages": set()})
+
+    def get_unfinished_emails(self) -> Set[str]:
+        """Get the registrers whose invoice has been booked but not sent yet.
+
+        :return: Email addresses of these registrers.
+        """
+        return {email for email, state in self.state_dict.items() if DB_WRITTEN in state["stages"] and EMAILED not in state["stages"]}
+
+    def get_unsaved_ledger_emails(self) -> List[str]:
+        """Get the registrers whose invoice has been booked but whose invoice ledger row has not been saved yet.
+
+        The invoice ledger being saved at checkpoints, a run stopped between two
+        checkpoints leaves booked invoices (emailed or not) without ledger row.
+
+        :return: Email addresses of these registrers, in booking order.
+        """
+        return [email for email, state in self.state_dict.items() if DB_WRITTEN in state["stages"] and LEDGER_WRITTEN not in state["stages"]]
+
+    def get_summary(self) -> Dict[str, int]:
+        """Count the registrers by last completed stage.
+
+        :return: Number of registrers per stage (see `STAGE_LIST`).
+        """
+        summary_dict = {stage: 0 for stage in STAGE_LIST}
+        for state in self.state_dict.values():
+            last_stage = max(state["stages"], key=STAGE_LIST.index)
+            summary_dict[last_stage] += 1
+        return summary_dict
+
+    def close(self) -> None:
+        """Close the journal file.
+
+        :return: None.
+        """
+        self._file.close()
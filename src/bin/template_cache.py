@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import hashlib
+from copy import deepcopy
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+from utils import PLACEHOLDER_PATTERN, PRODUCT_NUMBER_PATTERN, render_paragraph
+
+if TYPE_CHECKING:
+    # python-docx is only imported once a template is parsed, so that importing the cache keeps startup fast
+    from docx.document import Document
+    from docx.parts.document import DocumentPart
+    from docx.text.paragraph import Paragraph
+
+
+class PlaceholderLocation(NamedTuple):
+    """Location of a run containing placeholders in a parsed DOCX template.
+
+    :param paragraph_index: Index of the paragraph among all `w:p` elements of the document body.
+    :param table_index: Index of the table containing the paragraph (None for body paragraphs).
+    :param row_index: Index of the table row containing the paragraph (None for body paragraphs).
+    :param cell_index: Index of the table cell containing the paragraph (None for body paragraphs).
+    :param run_index: Index of the run among all `w:r` elements of the document body (used to resolve the location in a copy of the tree).
+    :param text: Text of the run in the template, placeholders included (e.g. "CHF [TOTAL]").
+    :param keys: Placeholders found in the run (e.g. "[TOTAL]").
+    """
+    paragraph_index: int
+    table_index: Optional[int]
+    row_index: Optional[int]
+    cell_index: Optional[int]
+    run_index: int
+    text: str
+    keys: Tuple[str, ...]
+
+
+class CachedTemplate:
+    """DOCX invoice template parsed once, with an index of where its placeholders live.
+
+    When the template is loaded, the placeholders spread over several runs are
+    merged into a single run and the font and bold styles that `render_paragraph`
+    would apply are applied once to the parsed tree. Each call to `render` then
+    works on a deep copy of this lxml tree and only rewrites the text of the
+    indexed runs, so that neither the zip decompression, the XML parsing nor the
+    formatting happens again for every invoice.
+
+    Each rendered document gets its own document part and package, so that
+    documents rendered one after the other (or from several threads) never
+    change each other. The other parts of the template (styles, images,
+    numbering, etc.) are not modified by `render` and are shared.
+
+    :param path: Path to the DOCX template.
+    """
+    def __init__(self, path: Path) -> None:
+        import docx
+
+        self.path = path
+        self.file_hash = hashlib.sha256(path.read_bytes()).hexdigest()  # identifies the template content (see "render_cache.py")
+        self._doc = docx.Document(path)
+        self._part = self._doc.part
+        self._element = self._part.element
+        self.placeholder_locations: List[PlaceholderLocation] = []
+        self._build_index()
+
+    def _build_index(self) -> None:
+        """Normalize the template once and record the location of every placeholder.
+
+        :return: None.
+        """
+        from docx.oxml.ns import qn
+        from docx.text.paragraph import Paragraph
+
+        # Merge split placeholders and apply formatting in document order since bold is partly applied at style level
+        def normalize_paragraph(paragraph: Paragraph, table_index=None, row_index=None, cell_index=None):
+            keys = PLACEHOLDER_PATTERN.findall(paragraph.text)
+            if keys:
+                render_paragraph(paragraph=paragraph, replacements={key: key for key in keys})
+                paragraph_location_list.append((paragraph._p, table_index, row_index, cell_index))
+            elif table_index is not None and PRODUCT_NUMBER_PATTERN.fullmatch(paragraph.text):
+                # Make sure product number "01", "02", etc. (under the column "NO" in the invoice template) are not bold
+                paragraph.style.font.bold = False
+                for run in paragraph.runs:
+                    run.bold = False
+
+        paragraph_location_list = []
+        for paragraph in self._doc.paragraphs:
+            normalize_paragraph(paragraph)
+        for table_index, table in enumerate(self._doc.tables):
+            for row_index, row in enumerate(table.rows):
+                seen_cell_list = []
+                for cell_index, cell in enumerate(row.cells):
+                    # Merged cells are returned once per grid column, only process them once
+                    if cell._tc in seen_cell_list:
+                        continue
+                    seen_cell_list.append(cell._tc)
+                    for paragraph in cell.paragraphs:
+                        normalize_paragraph(paragraph, table_index, row_index, cell_index)
+
+        # Index the runs now holding whole placeholders
+        paragraph_index_dict = {p: idx for idx, p in enumerate(self._element.body.iter(qn("w:p")))}
+        run_index_dict = {r: idx for idx, r in enumerate(self._element.body.iter(qn("w:r")))}
+        for p, table_index, row_index, cell_index in paragraph_location_list:
+            for run in Paragraph(p, self._doc).runs:
+                keys = tuple(PLACEHOLDER_PATTERN.findall(run.text))
+                if keys:
+                    self.placeholder_locations.append(PlaceholderLocation(
+                        paragraph_index_dict[p], table_index, row_index, cell_index,
+                        run_index_dict[run._r], run.text, keys))
+
+    def _new_part(self, element) -> DocumentPart:
+        """Create a document part holding a copy of the document tree, in a package of its own.
+
+        The relationships of the template document part and package are copied with
+        their IDs (the document tree refers to them), pointing to the same other parts.
+
+        :param element: The copy of the `w:document` element of the template.
+        :return part: The new document part.
+        """
+        from docx.opc.constants import RELATIONSHIP_TYPE as RT
+        from docx.package import Package
+        from docx.parts.document import DocumentPart
+
+        package = Package()
+        part = DocumentPart(self._part.partname, self._part.content_type, element, package)
+        for rId, rel in self._part.rels.items():
+            part.load_rel(rel.reltype, rel.target_ref if rel.is_external else rel.target_part, rId, rel.is_external)
+        for rId, rel in self._part.package.rels.items():
+            if rel.reltype == RT.OFFICE_DOCUMENT:
+                target = part
+            else:
+                target = rel.target_ref if rel.is_external else rel.target_part
+            package.load_rel(rel.reltype, target, rId, rel.is_external)
+        return part
+
+    @property
+    def keys(self) -> List[str]:
+        """All placeholders found in the template."""
+        return [key for location in self.placeholder_locations for key in location.keys]
+
+    def render(self, replacements: Dict[str, str]) -> Document:
+        """Create a filled-in copy of the template.
+
+        The returned document is independent of the documents rendered before
+        (see `_new_part`). Placeholders missing from `replacements` are left untouched.
+
+        :param replacements: A dictionary mapping placeholders (e.g. "[TOTAL]") to their string values.
+        :return doc: The filled-in `docx.Document` object, ready to be saved.
+        """
+        from docx.document import Document
+        from docx.oxml.ns import qn
+        from docx.text.run import Run
+
+        element = deepcopy(self._element)
+        doc = Document(element, self._new_part(element))
+
+        run_element_list = list(element.body.iter(qn("w:r")))
+        for location in self.placeholder_locations:
+            text = PLACEHOLDER_PATTERN.sub(lambda match: replacements.get(match.group(0), match.group(0)), location.text)
+            Run(run_element_list[location.run_index], doc).text = text
+
+        return doc
+
+
+class TemplateCache:
+    """Cache parsing each invoice model of a folder at most once per process.
+
+    :param models_path: Path to the folder containing the DOCX invoice models.
+    """
+    def __init__(self, models_path: Path) -> None:
+        self.models_path = models_path
+        self._template_dict: Dict[str, CachedTemplate] = {}
+
+    def get(self, template_name: str) -> CachedTemplate:
+        """Get a parsed template, parsing it on first use.
+
+        :param template_name: File name of the DOCX template (e.g. "InvoiceModel_CH95_DefaultProducts_1_sports.docx").
+        :return: The corresponding `CachedTemplate`.
+        """
+        if template_name not in self._template_dict:
+            self._template_dict[template_name] = CachedTemplate(self.models_path / template_name)
+        return self._template_dict[template_name]
+
+    def preload(self, pattern: str = "*.docx") -> None:
+        """Parse all templates of the models folder matching the given pattern up front.
+
+        :param pattern: Glob pattern of the templates to parse.
+        :return: None.
+        """
+        for template_path in sorted(self.models_path.glob(pattern)):
+            self.get(template_path.name)
+
+    def render(self, template_name: str, replacements: Dict[str, str]) -> Document:
+        """Create a filled-in copy of a template (see `CachedTemplate.render`).
+
+        :param template_name: File name of the DOCX template.
+        :param replacements: A dictionary mapping placeholders (e.g. "[TOTAL]") to their string values.
+        :return: The filled-in `docx.Document` object, ready to be saved.
+        """
+        return self.get(template_name).render(replacements)
@@ -1,10 +1,14 @@
 import sys
-import os
-import pandas as pd
+import re
+from bisect import bisect_right
 from pathlib import Path
 from datetime import datetime, timedelta
 
-from definition import SPONSOR_DATABASE_PATH, SHEET_NAME
+from invoice_store import InvoiceStore
+
+PLACEHOLDER_PATTERN = re.compile(r"\[[A-Z0-9-]+\]")  # matches template keys like "[TOTAL]" or "[QT-1]"
+PRODUCT_NUMBER_PATTERN = re.compile(r"0[1-5]")  # matches product numbers "01", "02", etc. of the invoice templates
+BOLD_PLACEHOLDER_LIST = ["[TOTAL]", "[COMPANY]"]
 
 class DualLogger:
     """Class to log messages to both terminal and a file.
@@ -49,49 +53,116 @@ def get_deadline_formatted_date(date: datetime) -> str:
     return in_30_days_formatted
 
 def get_invoice_number() -> str:
-        """Retrieve latest invoice number from Excel file and increment it by 1
-        in order to get current invoice number.
+        """Reserve the current invoice number in the invoice store.
 
         :return invoice_number: A string containing the computed current invoice number.
         """
-        current_year = str(datetime.now().year)
-        first_invoice_number = f"{current_year}0000"
+        invoice_number = reserve_invoice_numbers(1)[0]
+
+        return invoice_number
+
+def reserve_invoice_numbers(num_invoices: int) -> list:
+    """Reserve consecutive invoice numbers up front for a whole batch of invoices.
+
+    The numbers are taken atomically from the per-year sequence of the invoice
+    store, so that invoices generated in parallel never get the same number.
+    "main.py" reserves the number of each sponsor invoice from the same
+    sequence when generating it, so it never reuses these numbers either.
+
+    :param num_invoices: Number of invoice numbers to reserve.
+    :return invoice_number_list: A list of strings containing the reserved invoice numbers.
+    """
+    store = InvoiceStore()
+    try:
+        invoice_number_list = store.reserve_invoice_numbers(num_invoices)
+    finally:
+        store.close()
+    return invoice_number_list
+
+def render_paragraph(paragraph, replacements: dict) -> bool:
+    """Replace all placeholders of a paragraph in a single pass while keeping run-level formatting.
+
+    The text of the runs is concatenated once, every "[KEY]" token is found with
+    the precompiled `PLACEHOLDER_PATTERN` and the replacement value is written in
+    the run where the token starts (parts of the token spread over the following
+    runs are removed), so that the runs themselves and their formatting are kept.
+
+    :param paragraph: The `docx.text.paragraph.Paragraph` object to fill in.
+    :param replacements: A dictionary mapping placeholders (e.g. "[TOTAL]") to their string values.
+    :return: True if at least one placeholder has been replaced, False otherwise.
+    """
+    runs = paragraph.runs
+    run_text_list = [run.text for run in runs]
+    full_text = "".join(run_text_list)
+    if "[" not in full_text:
+        return False
+    match_list = [match for match in PLACEHOLDER_PATTERN.finditer(full_text) if match.group(0) in replacements]
+    if not match_list:
+        return False
+
+    # Start offset of each run in the concatenated paragraph text
+    run_offset_list = []
+    offset = 0
+    for run_text in run_text_list:
+        run_offset_list.append(offset)
+        offset += len(run_text)
 
-        if not os.path.exists(SPONSOR_DATABASE_PATH):
-            invoice_number = first_invoice_number
+    # Replace matches from the end of the paragraph so that the offsets of the runs located before each match stay valid
+    changed_run_indices = set()
+    for match in reversed(match_list):
+        start, end = match.span()
+        first_idx = bisect_right(run_offset_list, start) - 1
+        last_idx = bisect_right(run_offset_list, end - 1) - 1
+        head = run_text_list[first_idx][:start - run_offset_list[first_idx]]
+        if first_idx == last_idx:
+            tail = run_text_list[first_idx][end - run_offset_list[first_idx]:]
+            run_text_list[first_idx] = head + replacements[match.group(0)] + tail
         else:
-            existing_data_df = pd.read_excel(SPONSOR_DATABASE_PATH, sheet_name=SHEET_NAME)
-            latest_invoice_number = str(existing_data_df["Invoice Number"].max())
-            latest_invoice_year = latest_invoice_number[:4]
-            if latest_invoice_year != current_year:
-                # Set invoice number as first invoice number of the year
-                invoice_number = first_invoice_number
-            else:
-                # Increment latest invoice number by 1
-                invoice_number = str(int(latest_invoice_number) + 1)
+            run_text_list[first_idx] = head + replacements[match.group(0)]
+            for idx in range(first_idx + 1, last_idx):
+                run_text_list[idx] = ""
+            run_text_list[last_idx] = run_text_list[last_idx][end - run_offset_list[last_idx]:]
+            changed_run_indices.update(range(first_idx + 1, last_idx + 1))
+        changed_run_indices.add(first_idx)
 
-        return invoice_number
+    for idx in changed_run_indices:
+        runs[idx].text = run_text_list[idx]
 
-def replace_text(paragraph, old_text, new_text):
-        """Replaces old_text with new_text in the given paragraph while keeping the original font and bold style.
-        """
-        if old_text in paragraph.text:
-            bold_text_list = ["[TOTAL]", "[COMPANY]"]
-            bold = False
-            # Capture the fact that text has to be bold for the "TOTAL" text
-            if any(keyword in paragraph.text for keyword in bold_text_list):
-                bold = True
-            # Replace the text
-            paragraph.text = paragraph.text.replace(old_text, new_text)
-            # Apply font style
-            paragraph.style.font.name = "Times New Roman"
-            # Apply bold
-            if bold:
-                paragraph.style.font.bold = True
-            else:
-                paragraph.style.font.bold = False
-                for run in paragraph.runs:
-                    run.bold = False
-            # if DEBUG_MODE:
-            #     print(f"---\nparagraph.text: {paragraph.text}")
-            #     print(f"paragraph.style.font.bold: {paragraph.style.font.bold}")
\ No newline at end of file
+    # Capture the fact that text has to be bold (e.g. for the "TOTAL" text)
+    bold = any(match.group(0) in BOLD_PLACEHOLDER_LIST for match in match_list)
+    # Apply font style (only touch the XML where the value actually differs)
+    style_font = paragraph.style.font
+    if style_font.name != "Times New Roman":
+        style_font.name = "Times New Roman"
+    # Apply bold
+    if style_font.bold != bold:
+        style_font.bold = bold
+    for run in runs:
+        if run.bold != bold:
+            run.bold = bold
+
+    return True
+
+
+def render_document(doc, replacements: dict) -> None:
+    """Fill in all placeholders of a DOCX document (paragraphs and table cells) in a single pass.
+
+    :param doc: The `docx.Document` object to fill in.
+    :param replacements: A dictionary mapping placeholders (e.g. "[TOTAL]") to their string values.
+    :return: None.
+    """
+    # Make replacements in the paragraphs of the DOCX document (i.e., info and invoice data)
+    for paragraph in doc.paragraphs:
+        render_paragraph(paragraph=paragraph, replacements=replacements)
+
+    # Make replacements in the tables of the DOCX document (i.e., product data)
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for paragraph in cell.paragraphs:
+                    render_paragraph(paragraph=paragraph, replacements=replacements)
+                    # Make sure product number "01", "02", etc. (under the column "NO" in the invoice template) are not bold
+                    if PRODUCT_NUMBER_PATTERN.fullmatch(paragraph.text):
+                        paragraph.style.font.bold = False
+                        for run in paragraph.runs:
+                            run.bold = False
@@ -0,0 +1,38 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The scripts of "src/bin" are run from the project root (see "definition.py")
+PROJECT_PATH = Path(__file__).resolve().parent.parent
+os.chdir(PROJECT_PATH)
+sys.path.insert(0, str(PROJECT_PATH / "src" / "bin"))
+
+LEDGER_SHEET_NAME = "Facturation"
+
+
+@pytest.fixture
+def ledger_sheet_name():
+    return LEDGER_SHEET_NAME
+
+
+@pytest.fixture
+def make_ledger_file():
+    """Factory writing an invoice ledger workbook with the given invoice rows (and optionally a formatted but empty row)."""
+    from openpyxl import Workbook
+
+    def make(path, row_value_list_list=(), formatted_empty_row=None):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.title = LEDGER_SHEET_NAME
+        sheet.append(["Date", "N° facture", "Nom", "Montant", "Envoi"])
+        for row_value_list in row_value_list_list:
+            sheet.append(row_value_list)
+        if formatted_empty_row is not None:
+            sheet.cell(row=formatted_empty_row, column=1).number_format = "@"
+            sheet.cell(row=formatted_empty_row, column=3, value="note")
+        workbook.save(path)
+        return path
+
+    return make
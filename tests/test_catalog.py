@@ -0,0 +1,44 @@
+import json
+import os
+
+import pytest
+
+from catalog import Catalog
+
+
+def write_catalog(path, item_dict, mtime_ns):
+    path.write_text(json.dumps(item_dict), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_lookups(tmp_path):
+    path = tmp_path / "catalog.json"
+    write_catalog(path, {"1": {"name": "Volley Mixte", "price": 60}, "2": {"name": "Pétanque", "price": 40}}, 10**18)
+    catalog = Catalog(path)
+    assert catalog.get_price("Pétanque") == 40
+    assert catalog.get_item(1)["name"] == "Volley Mixte"
+    assert catalog.get_total(["Pétanque", "Volley Mixte", "Pétanque"], ["1", "2", 1]) == 200
+    with pytest.raises(KeyError):
+        catalog.get_price("Curling")
+
+
+def test_invalid_catalog_is_rejected(tmp_path):
+    path = tmp_path / "catalog.json"
+    write_catalog(path, {"1": {"name": "Pétanque"}}, 10**18)
+    with pytest.raises(ValueError):
+        Catalog(path)
+
+
+def test_failed_reload_keeps_last_valid_catalog(tmp_path, capsys):
+    path = tmp_path / "catalog.json"
+    write_catalog(path, {"1": {"name": "Pétanque", "price": 40}}, 10**18)
+    catalog = Catalog(path, reload_interval=0)
+
+    # Half-saved file
+    path.write_text('{"1": {"name": "Pétanque", "pri', encoding="utf-8")
+    assert catalog.get_price("Pétanque") == 40
+    assert "could not be reloaded" in capsys.readouterr().out
+
+    # Retried at the next check once the file is valid again
+    write_catalog(path, {"1": {"name": "Pétanque", "price": 45}}, 2 * 10**18)
+    assert catalog.get_price("Pétanque") == 45
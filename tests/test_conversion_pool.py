@@ -0,0 +1,165 @@
+import importlib.util
+import os
+import stat
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import conversion_pool
+from conversion_pool import ConversionPool, SofficeWorker, convert_docx_batch
+
+
+class FakeWorker:
+    """Stand-in for `SofficeWorker` whose conversions fail a given number of times."""
+    def __init__(self, worker_id, num_failures=0, is_healthy=True):
+        self.worker_id = worker_id
+        self.num_failures = num_failures
+        self.healthy = is_healthy
+        self.num_conversions = 0
+        self.num_restarts = 0
+        self.call_list = []
+
+    def is_healthy(self):
+        return self.healthy
+
+    def restart(self):
+        self.num_restarts += 1
+        self.healthy = True
+
+    def convert(self, docx_path, out_dir):
+        self.call_list.append(docx_path)
+        if self.num_failures > 0:
+            self.num_failures -= 1
+            raise RuntimeError("LibreOffice instance crashed")
+        self.num_conversions += 1
+        return out_dir / f"{docx_path}.pdf"
+
+    def stop(self):
+        pass
+
+
+def make_pool(tmp_path, worker_list):
+    pool = ConversionPool(num_workers=0, profiles_path=tmp_path)
+    pool.num_workers = len(worker_list)
+    pool.workers = worker_list
+    for worker in worker_list:
+        pool._idle_workers.put(worker)
+    return pool
+
+
+def test_warm_worker_is_reused(tmp_path):
+    worker = FakeWorker(0)
+    pool = make_pool(tmp_path, [worker])
+    assert [pool.convert(name, tmp_path) for name in ("a", "b", "c")] == [tmp_path / "a.pdf", tmp_path / "b.pdf", tmp_path / "c.pdf"]
+    assert worker.num_conversions == 3 and worker.num_restarts == 0
+
+
+def test_unhealthy_worker_is_restarted_before_the_job(tmp_path):
+    worker = FakeWorker(0, is_healthy=False)
+    pool = make_pool(tmp_path, [worker])
+    assert pool.convert("a", tmp_path) == tmp_path / "a.pdf"
+    assert worker.num_restarts == 1 and worker.call_list == ["a"]
+
+
+def test_failed_job_is_retried_once_on_a_restarted_worker(tmp_path):
+    worker = FakeWorker(0, num_failures=1)
+    pool = make_pool(tmp_path, [worker])
+    assert pool.convert("a", tmp_path) == tmp_path / "a.pdf"
+    assert worker.num_restarts == 1 and worker.call_list == ["a", "a"]
+    assert pool.num_failures == 0
+
+
+def test_job_failing_twice_is_reported_and_worker_released(tmp_path):
+    worker = FakeWorker(0, num_failures=2)
+    pool = make_pool(tmp_path, [worker])
+    result_dict = pool.convert_many(["a", "b"], tmp_path)
+    assert isinstance(result_dict["a"], RuntimeError) and result_dict["b"] == tmp_path / "b.pdf"
+    assert pool.num_failures == 1 and pool._idle_workers.qsize() == 1
+
+
+@pytest.mark.skipif(importlib.util.find_spec("uno") is not None, reason="the 'uno' module is available")
+def test_start_fails_at_once_without_uno(tmp_path):
+    worker = SofficeWorker(worker_id=0, port=2002, profile_path=tmp_path / "worker_0")
+    time_start = time.perf_counter()
+    with pytest.raises(ImportError):
+        worker.start()
+    assert time.perf_counter() - time_start < 5
+    assert worker.process is None
+
+
+class HungProcess:
+    """Stand-in for the `soffice` process, whose UNO calls block until it is killed."""
+    def __init__(self):
+        self.killed_event = threading.Event()
+
+    def poll(self):
+        return -9 if self.killed_event.is_set() else None
+
+    def kill(self):
+        self.killed_event.set()
+
+
+def test_hung_conversion_times_out(tmp_path, monkeypatch):
+    # Minimal `uno` modules (only used to build URLs and properties)
+    monkeypatch.setitem(sys.modules, "uno", types.SimpleNamespace(systemPathToFileUrl=lambda path: f"file://{path}"))
+    monkeypatch.setitem(sys.modules, "com", types.ModuleType("com"))
+    monkeypatch.setitem(sys.modules, "com.sun", types.ModuleType("com.sun"))
+    monkeypatch.setitem(sys.modules, "com.sun.star", types.ModuleType("com.sun.star"))
+    monkeypatch.setitem(sys.modules, "com.sun.star.beans", types.SimpleNamespace(PropertyValue=types.SimpleNamespace))
+
+    process = HungProcess()
+
+    def load_component(*args):
+        process.killed_event.wait(timeout=10)
+        raise RuntimeError("UNO bridge disposed")
+
+    worker = SofficeWorker(worker_id=0, port=2002, profile_path=tmp_path, conversion_timeout=0.2)
+    worker.process = process
+    worker.desktop = types.SimpleNamespace(loadComponentFromURL=load_component)
+    time_start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        worker.convert(tmp_path / "a.docx", tmp_path)
+    assert time.perf_counter() - time_start < 5
+    assert process.killed_event.is_set() and not worker.is_healthy()
+
+
+FAKE_SOFFICE = """#!{python}
+import sys
+from pathlib import Path
+
+argument_list = sys.argv[1:]
+out_dir = Path(argument_list[argument_list.index("--outdir") + 1])
+for argument in argument_list:
+    if argument.endswith(".docx") and "broken" not in argument:
+        (out_dir / Path(argument).with_suffix(".pdf").name).write_text("%PDF")
+sys.exit(1 if any("broken" in argument for argument in argument_list) else 0)
+"""
+
+
+def test_convert_docx_batch_maps_pdfs_back_to_documents(tmp_path, monkeypatch):
+    soffice_path = tmp_path / "soffice"
+    soffice_path.write_text(FAKE_SOFFICE.format(python=sys.executable))
+    soffice_path.chmod(soffice_path.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(conversion_pool, "SOFFICE_BINARY_PATH", soffice_path)
+
+    docx_dir, out_dir = tmp_path / "docx", tmp_path / "out"
+    docx_dir.mkdir()
+    out_dir.mkdir()
+    name_list = ["a", "b", "broken_c", "d", "e", "broken_f", "g"]
+    docx_path_list = [str(docx_dir / f"{name}.docx") for name in name_list]
+    # Leftover PDF of a previous run must not count as converted
+    stale_pdf_path = out_dir / "broken_f.pdf"
+    stale_pdf_path.write_text("%PDF")
+    os.utime(stale_pdf_path, (time.time() - 3600, time.time() - 3600))
+
+    result_dict = convert_docx_batch(docx_path_list, out_dir, num_shards=2, chunk_size=2, profiles_path=tmp_path / "profiles")
+    assert list(result_dict) == docx_path_list
+    for name, docx_path in zip(name_list, docx_path_list):
+        if name.startswith("broken"):
+            assert isinstance(result_dict[docx_path], RuntimeError)
+            assert "exited with code 1" in str(result_dict[docx_path])
+        else:
+            assert result_dict[docx_path] == out_dir / f"{name}.pdf"
@@ -0,0 +1,69 @@
+import socket
+
+import pytest
+
+from email_transport import EmailTransport, SmtpTransport
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.peer_list = []  # client address of the connection of each received message
+
+    async def handle_DATA(self, server, session, envelope):
+        self.peer_list.append(session.peer)
+        return "250 Message accepted for delivery"
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def attachment_path(tmp_path):
+    path = tmp_path / "Facture N° 20250101.pdf"
+    path.write_bytes(b"%PDF-1.4\n")
+    return str(path)
+
+
+def send(transport, attachment_path, index):
+    return transport.send(recipient=f"registrer{index}@example.com", subject=f"Facture {index}", body="Bonjour", attachment_path=attachment_path)
+
+
+def test_base_transport_is_abstract():
+    with pytest.raises(TypeError):
+        EmailTransport()
+
+
+def test_messages_share_one_connection_and_reconnect_after_drop(attachment_path):
+    port = get_free_port()
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    transport = SmtpTransport(host="127.0.0.1", port=port, username="", security="none", timeout=5)
+    try:
+        transport.connect()
+        assert all(send(transport, attachment_path, index) for index in range(3))
+        assert len(handler.peer_list) == 3 and len(set(handler.peer_list)) == 1
+        assert transport.num_connections == 1
+
+        # The server drops the connection (e.g. restart or idle timeout)
+        controller.stop()
+        controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=port)
+        controller.start()
+        assert send(transport, attachment_path, 3)
+        assert transport.num_connections == 2
+        assert len(handler.peer_list) == 4 and handler.peer_list[3] != handler.peer_list[0]
+    finally:
+        transport.close()
+        controller.stop()
+
+
+def test_failed_connection_is_not_kept():
+    transport = SmtpTransport(host="127.0.0.1", port=get_free_port(), username="", security="none", timeout=5)
+    with pytest.raises(OSError):
+        transport.connect()
+    assert transport.smtp is None
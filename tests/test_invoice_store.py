@@ -0,0 +1,53 @@
+import pytest
+
+from invoice_store import REGISTRANT, SPONSOR, InvoiceStore
+
+
+def make_registrer_dict(invoice_number):
+    return {
+        "date": "22.06.2025",
+        "invoice number": invoice_number,
+        "company": "",
+        "title": "",
+        "first name": "",
+        "last name": "Doe",
+        "address": "Rue 1",
+        "postcode": "1426",
+        "city": "Concise",
+        "phone": "+41791234567",
+        "email": "doe@example.com",
+        "default product": "",
+        "custom product": [{"Pétanque": {"description": "Pétanque (2 équipes)", "num teams": 2, "price": 80}}],
+        "total price": 80,
+        "comment": "",
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = InvoiceStore(tmp_path / "invoice_store.sqlite")
+    yield store
+    store.close()
+
+
+def test_fields_are_stored_by_key_whatever_their_order(store):
+    registrer_dict = make_registrer_dict("20250101")
+    store.add_invoice(dict(reversed(list(registrer_dict.items()))), kind=REGISTRANT, entry_id_list=[7])
+    row = store.connection.execute("SELECT invoice_number, last_name, email, total_price FROM invoices").fetchone()
+    assert row == ("20250101", "Doe", "doe@example.com", 80)
+    assert store.connection.execute("SELECT name, quantity, unit_price FROM line_items").fetchall() == [("Pétanque", 2, 40.0)]
+    assert store.get_processed_entry_ids() == {"7"}
+
+
+def test_missing_field_is_rejected(store):
+    registrer_dict = make_registrer_dict("20250101")
+    del registrer_dict["total price"]
+    with pytest.raises(ValueError, match="total price"):
+        store.add_invoice(registrer_dict, kind=SPONSOR)
+    assert store.count_invoices() == 0
+
+
+def test_stored_numbers_are_never_reserved_again(store):
+    store.add_invoice(make_registrer_dict("20250101"))
+    assert store.reserve_invoice_numbers(2, year=2025) == ["20250102", "20250103"]
+    assert store.has_invoice("20250101") and not store.has_invoice("20250102")
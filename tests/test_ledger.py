@@ -0,0 +1,33 @@
+from openpyxl import load_workbook
+
+import ledger
+from ledger import InvoiceLedger
+
+LEDGER_ROW_LIST = [["20/06/2025", "20250101", "Doe (sports)", "40", "Mail"], ["21/06/2025", "20250102", "Roe (sports)", "60", "Mail"]]
+
+
+def test_append_below_last_filled_row(tmp_path, monkeypatch, make_ledger_file, ledger_sheet_name):
+    path = tmp_path / "ledger.xlsx"
+    make_ledger_file(path, LEDGER_ROW_LIST, formatted_empty_row=6)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the ledger file must only be read once when writing")
+
+    monkeypatch.setattr(ledger, "get_last_filled_row", fail)
+    invoice_ledger = InvoiceLedger(path=path, sheet_name=ledger_sheet_name, save_interval=0)
+    assert invoice_ledger.append(["22/06/2025", "20250103", "Poe (sports)", "40", "Mail"]) == 4
+    invoice_ledger.close()
+
+    sheet = load_workbook(path)[ledger_sheet_name]
+    assert [row[1] for row in sheet.iter_rows(min_row=2, max_row=4, values_only=True)] == ["20250101", "20250102", "20250103"]
+
+
+def test_dry_run_leaves_ledger_untouched(tmp_path, make_ledger_file, ledger_sheet_name):
+    path = tmp_path / "ledger.xlsx"
+    make_ledger_file(path, LEDGER_ROW_LIST, formatted_empty_row=6)
+    content = path.read_bytes()
+    invoice_ledger = InvoiceLedger(path=path, sheet_name=ledger_sheet_name, dry_run=True)
+    assert invoice_ledger.append(["22/06/2025", "20250103", "Poe (sports)", "40", "Mail"]) == 4
+    assert invoice_ledger.diff() == ["+ row 4: ['22/06/2025', '20250103', 'Poe (sports)', '40', 'Mail']"]
+    invoice_ledger.close()
+    assert path.read_bytes() == content
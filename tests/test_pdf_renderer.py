@@ -0,0 +1,61 @@
+import re
+
+import pytest
+
+pytest.importorskip("reportlab")
+pypdf = pytest.importorskip("pypdf")
+
+from definition import INVOICE_MODELS_FOLDER_NAME, LIB_PATH, SOFFICE_BINARY_PATH
+from pdf_renderer import InvoicePdfRenderer
+from template_cache import TemplateCache
+
+TEMPLATE_NAME = "InvoiceModel_CH95_DefaultProducts_2_sports.docx"
+REPLACEMENTS = {"[INVOICE-NUMBER]": "20250101", "[ISSUE-DATE]": "01.01.2025", "[DEADLINE-DATE]": "31.01.2025",
+                "[COMPANY]": "FSG Concise", "[PRODUCT-DESCRIPTION-1]": "Soutien Bronze", "[TOTAL]": "150.00"}
+
+
+@pytest.fixture(scope="module")
+def rendered_doc():
+    return TemplateCache(LIB_PATH / INVOICE_MODELS_FOLDER_NAME).render(TEMPLATE_NAME, REPLACEMENTS)
+
+
+def get_tokens(text):
+    return set(re.findall(r"\S+", text))
+
+
+def get_docx_tokens(doc):
+    """Tokens of the body paragraphs and table cells (the text boxes of the footer are not drawn by the native renderer)."""
+    text_list = [paragraph.text for paragraph in doc.paragraphs]
+    text_list += [cell.text for table in doc.tables for row in table.rows for cell in row.cells]
+    return get_tokens("\n".join(text_list))
+
+
+def get_pdf_tokens(pdf_path):
+    return get_tokens("\n".join(page.extract_text() for page in pypdf.PdfReader(pdf_path).pages))
+
+
+def test_native_pdf_contains_the_invoice_text(rendered_doc, tmp_path):
+    pdf_path = InvoicePdfRenderer().render(rendered_doc, tmp_path / "native.pdf")
+    pdf_tokens = get_pdf_tokens(pdf_path)
+    assert get_docx_tokens(rendered_doc) <= pdf_tokens
+    assert {"20250101", "01.01.2025", "31.01.2025", "Concise", "Bronze", "150.00"} <= pdf_tokens
+    assert "[INVOICE-NUMBER]" not in pdf_tokens
+
+    # One page per rendered page break of the template
+    num_page_breaks = len(rendered_doc.element.body.xpath(".//w:lastRenderedPageBreak"))
+    assert len(pypdf.PdfReader(pdf_path).pages) == 1 + num_page_breaks
+
+
+@pytest.mark.skipif(not SOFFICE_BINARY_PATH.exists(), reason="LibreOffice is not installed")
+def test_native_pdf_matches_soffice_pdf(rendered_doc, tmp_path):
+    from conversion_pool import convert_docx_batch
+
+    docx_path = tmp_path / "invoice.docx"
+    rendered_doc.save(docx_path)
+    soffice_pdf_path = convert_docx_batch([docx_path], tmp_path / "soffice", num_shards=1, profiles_path=tmp_path / "profiles")[str(docx_path)]
+    assert not isinstance(soffice_pdf_path, Exception)
+    native_pdf_path = InvoicePdfRenderer().render(rendered_doc, tmp_path / "native.pdf")
+
+    assert len(pypdf.PdfReader(native_pdf_path).pages) == len(pypdf.PdfReader(soffice_pdf_path).pages)
+    # soffice also draws the footer text boxes, the native PDF must not miss anything else
+    assert get_pdf_tokens(native_pdf_path) <= get_pdf_tokens(soffice_pdf_path)
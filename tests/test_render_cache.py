@@ -0,0 +1,33 @@
+from render_cache import RenderCache
+
+REPLACEMENTS = {"[INVOICE-NUMBER]": "20250101", "[TOTAL]": "40.00"}
+
+
+def write_invoice(tmp_path, name, size):
+    docx_path, pdf_path = tmp_path / f"{name}.docx", tmp_path / f"{name}.pdf"
+    docx_path.write_bytes(b"d" * size)
+    pdf_path.write_bytes(b"p" * size)
+    return docx_path, pdf_path
+
+
+def test_key_depends_on_pdf_engine():
+    soffice_key = RenderCache.get_key("template", REPLACEMENTS, engine="soffice")
+    assert soffice_key == RenderCache.get_key("template", dict(REPLACEMENTS), engine="soffice")
+    assert soffice_key != RenderCache.get_key("template", REPLACEMENTS, engine="reportlab-4.0/renderer-1")
+
+
+def test_running_size_and_eviction(tmp_path):
+    cache = RenderCache(path=tmp_path / "cache", max_size=250)
+    for name in ("a", "b"):
+        cache.store(name, *write_invoice(tmp_path, name, 50))
+    assert cache.size == 200
+
+    # Storing an entry again replaces its size instead of adding to it
+    cache.store("a", *write_invoice(tmp_path, "a", 50))
+    assert cache.size == 200
+
+    # Going beyond the maximum size evicts the least recently used entries
+    cache.store("c", *write_invoice(tmp_path, "c", 50))
+    assert cache.size <= 250
+    assert cache.fetch("c", tmp_path / "out.docx", tmp_path / "out.pdf")
+    assert cache.size == sum(path.stat().st_size for path in (tmp_path / "cache").iterdir())
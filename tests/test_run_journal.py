@@ -0,0 +1,75 @@
+from openpyxl import load_workbook
+
+import generate_and_send_sport_invoices as invoices
+from ledger import InvoiceLedger
+from run_journal import DB_WRITTEN, EMAILED, RENDERED, RunJournal
+
+def book_invoice(journal, ledger, invoice_number):
+    email = f"registrer{invoice_number}@example.com"
+    registrer_dict = {"email": email, "date": "22.06.2025", "invoice number": str(invoice_number), "last name": f"Doe{invoice_number}", "total price": 40}
+    journal.record(email, RENDERED, invoice_number=invoice_number, invoice_path=f"{invoice_number}.pdf")
+    journal.record(email, DB_WRITTEN, registrer_dict=registrer_dict)
+    ledger.append(invoices.get_ledger_row(registrer_dict))
+    journal.record(email, EMAILED)
+
+
+def test_resume_restores_ledger_rows_lost_between_two_saves(tmp_path, monkeypatch, make_ledger_file, ledger_sheet_name):
+    ledger_path = tmp_path / "ledger.xlsx"
+    journal_path = tmp_path / "run_journal.jsonl"
+    make_ledger_file(ledger_path)
+
+    # First run: the ledger is saved after 2 invoices, then the run crashes after the 3rd invoice has been emailed
+    journal = RunJournal(journal_path)
+    ledger = InvoiceLedger(path=ledger_path, sheet_name=ledger_sheet_name, save_interval=2, on_save=journal.record_ledger_rows)
+    for invoice_number in (20250101, 20250102, 20250103):
+        book_invoice(journal, ledger, invoice_number)
+    journal.close()
+    assert journal.get_unfinished_emails() == set()
+    assert journal.get_unsaved_ledger_emails() == ["registrer20250103@example.com"]
+
+    # Resumed run
+    journal = RunJournal(journal_path)
+    ledger = InvoiceLedger(path=ledger_path, sheet_name=ledger_sheet_name, save_interval=2, on_save=journal.record_ledger_rows)
+    monkeypatch.setattr(invoices, "JOURNAL", journal)
+    monkeypatch.setattr(invoices, "LEDGER", ledger)
+    assert invoices.restore_unsaved_ledger_rows() == 1
+    ledger.close()
+    assert journal.get_unsaved_ledger_emails() == []
+    journal.close()
+
+    sheet = load_workbook(ledger_path)[ledger_sheet_name]
+    assert [row[1] for row in sheet.iter_rows(min_row=2, values_only=True)] == ["20250101", "20250102", "20250103"]
+
+    # Resuming again writes nothing twice
+    journal = RunJournal(journal_path)
+    monkeypatch.setattr(invoices, "JOURNAL", journal)
+    assert invoices.restore_unsaved_ledger_rows() == 0
+    journal.close()
+
+
+def test_resume_reuses_the_numbers_of_failed_renders(tmp_path, monkeypatch):
+    import pandas as pd
+
+    journal_path = tmp_path / "run_journal.jsonl"
+    df_sanitized = pd.DataFrame({"Email": ["a@example.com", "b@example.com"]})
+    reserved_count_list = []
+
+    def reserve_invoice_numbers(num_invoices):
+        reserved_count_list.append(num_invoices)
+        return [str(20250101 + len(reserved_count_list) * 10 + i) for i in range(num_invoices)]
+
+    monkeypatch.setattr(invoices, "reserve_invoice_numbers", reserve_invoice_numbers)
+
+    # First run: the invoice of the second registrer fails to render
+    journal = RunJournal(journal_path)
+    monkeypatch.setattr(invoices, "JOURNAL", journal)
+    assert invoices.assign_invoice_numbers(df_sanitized) == ["20250111", "20250112"]
+    journal.record("a@example.com", RENDERED, invoice_number="20250111", invoice_path="20250111.pdf")
+    journal.close()
+
+    # Resumed run: both registrers get their reserved number back, nothing is reserved again
+    journal = RunJournal(journal_path)
+    monkeypatch.setattr(invoices, "JOURNAL", journal)
+    assert invoices.assign_invoice_numbers(df_sanitized) == ["20250111", "20250112"]
+    assert reserved_count_list == [2, 0]
+    journal.close()
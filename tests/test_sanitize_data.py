@@ -0,0 +1,96 @@
+import random
+import sys
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import generate_and_send_sport_invoices as invoices
+
+SPORT_LIST = ["Volley Mixte", "Pétanque", "Tir à la Corde"]
+
+
+def sanitize_data_loop(df):
+    """Original implementation of `sanitize_data` (one pass over the rows per registrer), used as reference."""
+    email_unique_list = df["E-mail"].unique().tolist()
+    num_registrers = len(email_unique_list)
+    registered_sports_list = []
+    for email in email_unique_list:
+        df_registrer = df[df["E-mail"] == email]
+        global_sport_dict = {}
+        for sport in df_registrer["Sport"].unique().tolist():
+            sport_df = df_registrer[df_registrer["Sport"] == sport]
+            global_sport_dict.update({sport: sport_df["Nom d'équipe"].tolist()})
+        registered_sports_list.append(global_sport_dict)
+
+    date_obj_list = [datetime.now() for _ in range(num_registrers)]
+    date_list = [invoices.get_today_formatted_date() for _ in range(num_registrers)]
+    date_deadline_list = [invoices.get_deadline_formatted_date(date_obj) for date_obj in date_obj_list]
+
+    df_first = df[df["E-mail"].isin(email_unique_list)].drop_duplicates(subset="E-mail", keep="first")
+    address_unique_list = df_first["Adresse"].tolist()
+    street_list = [address.split(",")[0].strip() for address in address_unique_list]
+    postcode_list = [address.split(",")[2].strip() for address in address_unique_list]
+    city_list = [address.split(",")[1].strip() for address in address_unique_list]
+    for i in range(len(postcode_list)):
+        postcode, city = postcode_list[i], city_list[i]
+        if postcode.isalpha() and city.isdigit():
+            postcode_list[i], city_list[i] = city_list[i], postcode_list[i]
+        elif (postcode.isalpha() and city.isalpha()) or (postcode.isdigit() and city.isdigit()):
+            sys.exit(1)
+
+    phone_list_adjusted = []
+    for phone in [str(phone) for phone in df_first["Téléphone"].tolist()]:
+        if phone.startswith("0"):
+            phone = "+41" + phone[1:]
+        if phone.startswith("41"):
+            phone = "+" + phone
+        if phone == "nan":
+            phone = ""
+        phone_list_adjusted.append(phone)
+
+    df_sanitized = df_first[["Entry ID", "Nom complet", "Téléphone", "E-mail"]].rename(columns={"Nom complet": "Name", "Téléphone": "Phone", "E-mail": "Email"})
+    df_sanitized["Registered Sports"] = registered_sports_list
+    df_sanitized["Date"] = date_list
+    df_sanitized["Deadline"] = date_deadline_list
+    df_sanitized["Street"] = street_list
+    df_sanitized["Postcode"] = postcode_list
+    df_sanitized["City"] = city_list
+    df_sanitized["Phone"] = phone_list_adjusted
+    return df_sanitized.reset_index(drop=True)
+
+
+def make_registrations(num_rows, num_registrers, phone_kind, seed=0):
+    """Synthetic registration export (several registrations per registrer, addresses in both postcode/city orders)."""
+    rng = random.Random(seed)
+    registrer_list = []
+    for i in range(num_registrers):
+        postcode, city = str(1000 + i), f"Ville{chr(65 + i % 26)}"
+        address = f"Rue {i}, {city}, {postcode}" if rng.random() < 0.5 else f"Rue {i} , {postcode} , {city} "
+        phone = {"int": 791234500 + i, "str": rng.choice(["0791234567", "41791234567", "+41791234567"]), "float": rng.choice([791234567.0, float("nan")])}[phone_kind]
+        registrer_list.append((f"registrer{i}@example.com", f"Nom {i}", address, phone))
+    row_list = []
+    for entry_id in range(num_rows):
+        email, name, address, phone = registrer_list[entry_id % num_registrers] if entry_id < num_registrers else rng.choice(registrer_list)
+        row_list.append({"Entry ID": entry_id, "Nom complet": name, "Téléphone": phone, "E-mail": email, "Adresse": address, "Sport": rng.choice(SPORT_LIST), "Nom d'équipe": f"Équipe {entry_id}"})
+    return pd.DataFrame(row_list)
+
+
+@pytest.mark.parametrize("phone_kind", ["int", "str", "float"])
+def test_vectorized_sanitize_data_matches_loop(phone_kind):
+    df = make_registrations(num_rows=300, num_registrers=60, phone_kind=phone_kind)
+    df_sanitized = invoices.sanitize_data(df)
+    assert_frame_equal(df_sanitized.drop(columns="Entry IDs"), sanitize_data_loop(df))
+    for email, entry_id_list in zip(df_sanitized["Email"], df_sanitized["Entry IDs"]):
+        assert entry_id_list == df.loc[df["E-mail"] == email, "Entry ID"].tolist()
+
+
+@pytest.mark.parametrize("address", ["Rue 1, Concise, Grandson", "Rue 1, 1426, 1400"])
+def test_invalid_postcode_and_city_stop(address):
+    df = make_registrations(num_rows=3, num_registrers=3, phone_kind="str")
+    df.loc[1, "Adresse"] = address
+    with pytest.raises(SystemExit):
+        sanitize_data_loop(df)
+    with pytest.raises(SystemExit):
+        invoices.sanitize_data(df)
@@ -0,0 +1,55 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import docx
+import pytest
+
+from definition import INVOICE_MODELS_FOLDER_NAME, LIB_PATH
+from template_cache import TemplateCache
+
+TEMPLATE_NAME = "InvoiceModel_CH95_DefaultProducts_1_sports.docx"
+
+
+@pytest.fixture(scope="module")
+def template_cache():
+    return TemplateCache(LIB_PATH / INVOICE_MODELS_FOLDER_NAME)
+
+
+def get_text(doc):
+    return "\n".join(paragraph.text for paragraph in doc.paragraphs) + "\n".join(cell.text for table in doc.tables for row in table.rows for cell in row.cells)
+
+
+def test_rendered_documents_are_independent(template_cache, tmp_path):
+    first_doc = template_cache.render(TEMPLATE_NAME, {"[INVOICE-NUMBER]": "20250101", "[TOTAL]": "40.00"})
+    second_doc = template_cache.render(TEMPLATE_NAME, {"[INVOICE-NUMBER]": "20250102", "[TOTAL]": "60.00"})
+    assert first_doc.part is not second_doc.part and first_doc.part.package is not second_doc.part.package
+
+    # The first document is saved after the second one has been rendered
+    first_path, second_path = tmp_path / "first.docx", tmp_path / "second.docx"
+    first_doc.save(first_path)
+    second_doc.save(second_path)
+    first_text, second_text = get_text(docx.Document(first_path)), get_text(docx.Document(second_path))
+    assert "20250101" in first_text and "20250102" not in first_text
+    assert "20250102" in second_text and "20250101" not in second_text
+
+    # Images and styles of the template are kept
+    template_doc = docx.Document(LIB_PATH / INVOICE_MODELS_FOLDER_NAME / TEMPLATE_NAME)
+    assert len(docx.Document(first_path).inline_shapes) == len(template_doc.inline_shapes)
+    assert {part.partname for part in docx.Document(first_path).part.package.iter_parts()} == {part.partname for part in template_doc.part.package.iter_parts()}
+
+
+def test_render_from_several_threads(template_cache, tmp_path):
+    barrier = threading.Barrier(4)
+
+    def render(index):
+        doc = template_cache.render(TEMPLATE_NAME, {"[INVOICE-NUMBER]": f"2025010{index}"})
+        barrier.wait()  # all documents are rendered before any is saved
+        path = tmp_path / f"{index}.docx"
+        doc.save(path)
+        return get_text(docx.Document(path))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        text_list = list(executor.map(render, range(4)))
+    for index, text in enumerate(text_list):
+        assert f"2025010{index}" in text
+        assert all(f"2025010{other}" not in text for other in range(4) if other != index)